@@ -0,0 +1,29 @@
+# app/api/admin.py
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.models.user import User
+from app.schemas.admin import BatchPlanRequest
+from app.services import batch_planning
+from app.utils.security import get_admin_user
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.post("/batch-plans", status_code=202)
+def start_batch_plans(payload: BatchPlanRequest, admin: User = Depends(get_admin_user)):
+    """
+    Re-plan the saved plans of all users (or `user_ids`) in the background,
+    across a process pool. Poll GET /admin/batch-plans/{job_id} for progress.
+    """
+    job = batch_planning.start_job(**payload.dict())
+    if job is None:
+        raise HTTPException(status_code=409, detail="A batch planning job is already running")
+    return job
+
+
+@router.get("/batch-plans/{job_id}")
+def batch_plans_status(job_id: int, admin: User = Depends(get_admin_user)):
+    job = batch_planning.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
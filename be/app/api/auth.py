@@ -3,30 +3,19 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
 
-from app.utils.security import verify_password, create_access_token, get_db
+from app.utils.security import verify_password, create_access_token
 from app.config import settings
+from app.db.session import get_db
 from sqlalchemy.orm import Session
 from app.models.user import User
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-def get_db_local():
-    db = next(get_db())
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/token")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     # form_data.username is the email in our flow
-    db = next(get_db())
-    try:
-        user = db.query(User).filter(User.email == form_data.username).first()
-    finally:
-        db.close()
+    user = db.query(User).filter(User.email == form_data.username).first()
 
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
@@ -36,7 +25,7 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email},
+        data={"sub": user.email, "uid": user.id},
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
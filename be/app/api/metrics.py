@@ -0,0 +1,52 @@
+# app/api/metrics.py
+from anyio import to_thread
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.db.session import get_engine
+from app.services.metrics import REGISTRY, cache_collector
+from app.services.result_cache import get_result_cache
+from app.services.usda_client import get_usda_cache, get_usda_search_cache
+from app.utils.security import principal_cache
+
+router = APIRouter(tags=["metrics"])
+
+
+def _caches() -> dict:
+    return {
+        "usda": get_usda_cache(),
+        "usda_search": get_usda_search_cache(),
+        "result": get_result_cache(),
+        "auth": principal_cache(),
+    }
+
+
+def _db_pool() -> list:
+    pool = get_engine().pool
+    out = []
+    for state in ("size", "checkedout", "overflow"):
+        fn = getattr(pool, state, None)
+        if callable(fn):
+            out.append(("db_pool_connections", {"state": state}, fn()))
+    return out
+
+
+def _threadpool() -> list:
+    # the limiter sync routes and run_in_threadpool share; must be read on the event loop
+    limiter = to_thread.current_default_thread_limiter()
+    return [
+        ("threadpool_threads", {"state": "busy"}, limiter.borrowed_tokens),
+        ("threadpool_threads", {"state": "limit"}, limiter.total_tokens),
+    ]
+
+
+REGISTRY.collector("cache_lookups_total", "counter", "Cache lookups by result", cache_collector(_caches))
+REGISTRY.collector("db_pool_connections", "gauge", "SQLAlchemy connection pool usage", _db_pool)
+REGISTRY.collector("threadpool_threads", "gauge", "Worker threads used by sync routes and run_in_threadpool",
+                   _threadpool)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
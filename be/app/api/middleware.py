@@ -0,0 +1,70 @@
+# app/api/middleware.py
+"""
+Per-request instrumentation as plain ASGI middleware: they only look at the
+response start message on its way out, so bodies are passed through
+unbuffered and the endpoint runs in the request's own task (no
+BaseHTTPMiddleware stream/task hop per layer).
+"""
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.session import QueryStats, query_stats
+from app.services.metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS
+
+
+class QueryReportMiddleware:
+    """Adds X-DB-Queries / Server-Timing with the number and time of the queries run before the response starts."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+
+        async def send_with_report(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Queries"] = str(stats.count)
+                headers["Server-Timing"] = f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'
+            await send(message)
+
+        token = query_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_with_report)
+        finally:
+            query_stats.reset(token)
+
+
+class RequestMetricsMiddleware:
+    """Requests in flight and request latency by method, route template and status."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # label by route template (/pantry/{item_id}), not raw path, to bound cardinality
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"],
+                                         route=getattr(route, "path", "unmatched"), status=status)
@@ -1,139 +1,415 @@
 # app/api/pantry.py
-from fastapi import APIRouter, Depends, HTTPException, Query
+import base64
+import hashlib
+import math
+from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, insert, tuple_
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
-from app.schemas.pantry import PantryItemCreate, PantryItemOut
+from app.db.session import get_db
+from app.schemas.pantry import (PantryEventOut, PantryItemCreate, PantryItemFields, PantryItemOut, PantryItemUpdate,
+                                PlanDayUpdate, StockChange)
 from app.models.pantry import PantryItem
-from app.services.usda_client import USDAClient
-from typing import List, Optional
-from rapidfuzz import fuzz, process
+from app.models.user import User
+from app.services.usda_client import AsyncUSDAClient
+from typing import Dict, List, Optional, Tuple
 
-from app.services.nutrition_planner import aggregate_pantry_nutrients, plan_daily_from_targets
-from app.utils.security import get_current_user
+from app.api.usda import get_async_usda_client
+from app.config import settings
+from app.models.food import FoodSnapshot
+from app.services import enrichment, pantry_search
+from app.services.enrichment import get_enrichment_worker, snapshot_fields
+from app.services.food_snapshots import load_snapshots, refresh_snapshots, upsert_snapshots
+from app.services.meal_plans import (MAX_PLAN_DAYS, DayAlreadyAccepted, accepted_days, load_plan, saved_fields,
+                                     update_plan)
+from app.services.nutrition_matrix import PantryMatrix, aggregate_matrix, plan_matrix
+from app.services.nutrition_planner import aggregate_from_nutrients, plan_daily_from_targets
+from app.services import pantry_ledger
+from app.services.pantry_import import parse_rows, validate_rows
+from app.services.pantry_versions import bump_version, get_version
+from app.services.result_cache import get_result_cache, result_key
+from app.utils.security import get_admin_user, get_current_user_id
 
 router = APIRouter(prefix="/pantry", tags=["pantry"])
-client = USDAClient()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _load_pantry(db: Session, user_id: int) -> List[PantryItem]:
+    # stable order: saved plans refer to pantry rows by position
+    return db.query(PantryItem).filter(PantryItem.user_id == user_id).order_by(PantryItem.id).all()
 
 
-@router.post("/", response_model=PantryItemOut)
-def add_pantry_item(payload: PantryItemCreate, current_user = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Ensure user matches authenticated user
-    if payload.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You can only add items to your own pantry")
+def _load_user(db: Session, user_id: int) -> Optional[User]:
+    return db.query(User).filter(User.id == user_id).first()
 
-    # Optionally fetch USDA data snapshot (silent if network unreachable)
-    description = payload.description
-    category = payload.category
-    try:
-        usda = client.get_food(payload.fdc_id)
-        if usda:
-            description = usda.get("description") or description
-            category = usda.get("foodCategory") or category
-    except Exception:
-        # swallow; use given description/category
-        pass
-
-    item = PantryItem(
-        user_id=payload.user_id,
-        fdc_id=payload.fdc_id,
-        description=description,
-        category=category,
-        quantity=payload.quantity,
-        unit_name=payload.unit_name
-    )
+
+def _user_targets(db: Session, user_id: int, goal: Optional[str]) -> Optional[dict]:
+    """Nutrition targets from the user's profile via pyhealthify (None if the user doesn't exist)."""
+    user = _load_user(db, user_id)
+    if not user:
+        return None
+    return _profile_targets(user, goal)
+
+
+def _profile_targets(user: User, goal: Optional[str]) -> dict:
+    from app.services.pyhealthify import nutrition_profile_from_user, profile_from_user
+
+    return nutrition_profile_from_user(profile_from_user(user), goal=goal)
+
+
+def _insert_item(db: Session, item: PantryItem) -> PantryItem:
+    snap = db.get(FoodSnapshot, item.fdc_id)
+    if snap is not None:
+        # food already known: enrich from the stored snapshot, no USDA round trip
+        for key, value in snapshot_fields(snap).items():
+            setattr(item, key, value)
+    else:
+        item.enrichment_status = "pending"
+        enrichment.enqueue(db, [item.fdc_id])
     db.add(item)
+    db.flush()
+    pantry_ledger.items_added(db, item.user_id, [(item.fdc_id, item.quantity)], after_id=item.id - 1)
+    bump_version(db, item.user_id)
     db.commit()
     db.refresh(item)
+    pantry_search.index_item(item)
+    return item
+
+
+def _store_snapshots(db: Session, foods: dict) -> dict:
+    return {fdc_id: snap.to_nutrients() for fdc_id, snap in upsert_snapshots(db, foods).items()}
+
+
+async def _pantry_nutrients(db: Session, pantry: List[PantryItem], client: AsyncUSDAClient,
+                            background_tasks: BackgroundTasks) -> Tuple[List[PantryItem], Dict[int, dict], dict]:
+    """
+    Nutrients of the pantry foods from stored snapshots; only items without
+    one go to USDA (and get snapshotted). Old snapshots are refreshed after the response.
+
+    Degrades instead of failing: items whose lookup failed upstream or that
+    USDA doesn't know are left out. Returns (items covered, {fdc_id: nutrients},
+    gaps), where gaps lists those fdc_ids ({} when every item is covered).
+    """
+    nutrients, missing, stale = await run_in_threadpool(load_snapshots, db, [p.fdc_id for p in pantry])
+    unavailable = set()
+    retry_after = None
+    if missing:
+        foods, failed = await client.get_foods_partial(missing)
+        nutrients.update(await run_in_threadpool(_store_snapshots, db, foods))
+        for chunk, error in failed:
+            unavailable.update(chunk)
+            retry_after = getattr(error, "retry_after", None) or retry_after
+    if stale:
+        background_tasks.add_task(refresh_snapshots, stale)
+
+    covered = [p for p in pantry if p.fdc_id in nutrients]
+    gaps = {}
+    if unavailable:
+        gaps["unavailable_fdc_ids"] = sorted(unavailable)
+    unknown = sorted({p.fdc_id for p in pantry if p.fdc_id not in nutrients} - unavailable)
+    if unknown:
+        gaps["unknown_fdc_ids"] = unknown
+    if not covered:
+        if unavailable:
+            raise HTTPException(status_code=503, detail="USDA is unavailable; try again shortly",
+                                headers={"Retry-After": str(math.ceil(retry_after or settings.USDA_BREAKER_RESET))})
+        raise HTTPException(status_code=400, detail="None of the pantry foods were found in USDA.")
+    return covered, nutrients, gaps
+
+
+async def _pantry_matrix(db: Session, pantry: List[PantryItem], client: AsyncUSDAClient,
+                         background_tasks: BackgroundTasks) -> Tuple[PantryMatrix, List[PantryItem], dict]:
+    """_pantry_nutrients as a nutrient matrix: (matrix, items in it, gaps)."""
+    covered, nutrients, gaps = await _pantry_nutrients(db, pantry, client, background_tasks)
+    return PantryMatrix.from_nutrients(covered, nutrients), covered, gaps
+
+
+def _use_matrix(items: List[PantryItem]) -> bool:
+    return len(items) >= settings.PANTRY_MATRIX_MIN_ITEMS
+
+
+def _with_gaps(result: dict, gaps: dict) -> dict:
+    """Flag a result computed without some pantry items."""
+    if gaps:
+        result.update(gaps, partial=True)
+    return result
+
+
+@router.post("/", response_model=PantryItemOut)
+async def add_pantry_item(payload: PantryItemCreate, current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    # Ensure user matches authenticated user
+    if payload.user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="You can only add items to your own pantry")
+
+    # stored with the given description/category; USDA enrichment (description,
+    # category, nutrient snapshot) happens in the background unless the food is known
+    item = await run_in_threadpool(_insert_item, db, PantryItem(**_item_fields(payload)))
+    if item.enrichment_status == "pending":
+        get_enrichment_worker().notify()
     return item
 
 
-@router.get("/", response_model=List[PantryItemOut])
-def list_pantry(user_id: int = Query(...), current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+def _item_fields(payload: PantryItemCreate) -> dict:
+    return {
+        "user_id": payload.user_id,
+        "fdc_id": payload.fdc_id,
+        "description": payload.description,
+        "category": payload.category,
+        "quantity": payload.quantity,
+        "unit_name": payload.unit_name,
+    }
+
+
+def _insert_items(db: Session, user_id: int, payloads: List[PantryItemCreate], foods: dict,
+                  usda_failed: bool) -> List[str]:
+    """
+    Insert all rows in one transaction with one executemany (the driver sends
+    multi-row INSERTs). Rows are enriched from stored or just-fetched
+    snapshots; if the USDA lookup failed they are queued for the background
+    worker. Returns each row's enrichment_status.
+    """
+    ids = {p.fdc_id for p in payloads}
+    snaps = {s.fdc_id: s for s in db.query(FoodSnapshot).filter(FoodSnapshot.fdc_id.in_(ids))}
+    snaps.update(upsert_snapshots(db, foods, commit=False))
+    rows = []
+    queued = set()
+    for payload in payloads:
+        row = _item_fields(payload)
+        snap = snaps.get(payload.fdc_id)
+        if snap is not None:
+            row.update(snapshot_fields(snap))
+        elif usda_failed:
+            row["enrichment_status"] = "pending"
+            queued.add(payload.fdc_id)
+        else:
+            row["enrichment_status"] = "failed"  # USDA doesn't know this food
+        rows.append(row)
+    after_id = db.query(func.max(PantryItem.id)).filter(PantryItem.user_id == user_id).scalar() or 0
+    db.execute(insert(PantryItem), rows)
+    pantry_ledger.items_added(db, user_id, [(row["fdc_id"], row["quantity"]) for row in rows], after_id)
+    enrichment.enqueue(db, queued)
+    bump_version(db, user_id)
+    db.commit()
+    # rebuilt from the DB on the next search
+    pantry_search.evict(user_id)
+    return [row["enrichment_status"] for row in rows]
+
+
+def _known_foods(db: Session, fdc_ids: List[int]) -> set:
+    return {row[0] for row in db.query(FoodSnapshot.fdc_id).filter(FoodSnapshot.fdc_id.in_(set(fdc_ids)))}
+
+
+@router.post("/bulk")
+async def bulk_add_pantry_items(request: Request, all_or_nothing: bool = Query(False),
+                                current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db),
+                                client: AsyncUSDAClient = Depends(get_async_usda_client)):
+    """
+    Add many items at once: a JSON list of PantryItemCreate, NDJSON
+    (application/x-ndjson) or CSV (text/csv) with a header row. Every row is
+    validated first; foods without a stored snapshot are fetched from USDA in
+    one deduplicated batch and all valid rows are inserted in a single
+    transaction. Returns a status per row. With all_or_nothing=true nothing
+    is inserted if any row is invalid (422).
+    """
+    try:
+        rows = parse_rows(request.headers.get("content-type"), await request.body())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read items: {e}")
+    valid, results = validate_rows(rows, current_user_id)
+    failed = len(rows) - len(valid)
+    if failed and all_or_nothing:
+        raise HTTPException(status_code=422, detail={"created": 0, "failed": failed, "results": results})
+    if not valid:
+        return {"created": 0, "failed": failed, "results": results}
+
+    payloads = [item for _row, item in valid]
+    known = await run_in_threadpool(_known_foods, db, [p.fdc_id for p in payloads])
+    foods = {}
+    usda_failed = False
+    unknown = [p.fdc_id for p in payloads if p.fdc_id not in known]
+    if unknown:
+        try:
+            foods = await client.get_foods(unknown)
+        except RuntimeError:  # USDA failed (incl. UpstreamUnavailable)
+            # rows are still inserted; the background worker retries the lookup
+            usda_failed = True
+    statuses = await run_in_threadpool(_insert_items, db, current_user_id, payloads, foods, usda_failed)
+    if "pending" in statuses:
+        get_enrichment_worker().notify()
+    for (row_no, _item), status in zip(valid, statuses):
+        results[row_no - 1].update(status="created", enrichment_status=status)
+    return {"created": len(payloads), "failed": failed, "results": results}
+
+
+LIST_FIELDS = tuple(PantryItemOut.__fields__)
+
+
+def _encode_cursor(added_at, item_id: int) -> str:
+    raw = f"{added_at.isoformat() if added_at else ''}|{item_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        added_at, item_id = raw.rsplit("|", 1)
+        return (datetime.fromisoformat(added_at) if added_at else None), int(item_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/", response_model=List[PantryItemFields], response_model_exclude_unset=True)
+def list_pantry(request: Request, response: Response, user_id: int = Query(...), limit: Optional[int] = Query(None, ge=1, le=500),
+                cursor: Optional[str] = None, fields: Optional[str] = None,
+                current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    """
+    Items ordered by (added_at, id). With `limit`, one page is returned and the
+    cursor for the next one is in the X-Next-Cursor header (absent on the last
+    page). `fields` is a comma-separated subset of the item fields. Responses
+    carry an ETag from the pantry version; a matching If-None-Match gets 304.
+    """
     # allow only owner to fetch their pantry
-    if user_id != current_user.id:
+    if user_id != current_user_id:
         raise HTTPException(status_code=403, detail="You can only list your own pantry")
-    items = db.query(PantryItem).filter(PantryItem.user_id == user_id).all()
-    return items
+    selected = LIST_FIELDS
+    if fields:
+        selected = tuple(f for f in LIST_FIELDS if f in {f.strip() for f in fields.split(",")})
+        if not selected:
+            raise HTTPException(status_code=400, detail=f"fields must be among: {', '.join(LIST_FIELDS)}")
+
+    version = get_version(db, user_id)
+    variant = hashlib.sha1(f"{limit}|{cursor}|{','.join(selected)}".encode()).hexdigest()[:12]
+    etag = f'W/"{user_id}-{version}-{variant}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    columns = [getattr(PantryItem, f) for f in selected]
+    extra = [c for c in (PantryItem.added_at, PantryItem.id) if c.key not in selected]
+    query = (db.query(*columns, *extra)
+             .filter(PantryItem.user_id == user_id)
+             .order_by(PantryItem.added_at, PantryItem.id))
+    if cursor:
+        after_added, after_id = _decode_cursor(cursor)
+        query = query.filter(tuple_(PantryItem.added_at, PantryItem.id) > (after_added, after_id))
+    rows = query.limit(limit + 1).all() if limit else query.all()
+
+    response.headers["ETag"] = etag
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.added_at, last.id)
+    return [{f: getattr(row, f) for f in selected} for row in rows]
 
 
 @router.get("/search")
-def search_pantry(user_id: int = Query(...), q: str = Query(..., min_length=1), current_user = Depends(get_current_user), db: Session = Depends(get_db)):
-    if user_id != current_user.id:
+def search_pantry(user_id: int = Query(...), q: str = Query(..., min_length=1),
+                  field: str = Query("description", regex="^(description|category|all)$"),
+                  current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    if user_id != current_user_id:
         raise HTTPException(status_code=403, detail="You can only search your own pantry")
-    # simple fuzzy search over pantry descriptions (local items)
-    items = db.query(PantryItem).filter(PantryItem.user_id == user_id).all()
-    choices = {str(i.id): i for i in items}
-    texts = {str(i.id): i.description for i in items}
-    # use rapidfuzz to get best matches
-    results = process.extract(q, texts, scorer=fuzz.WRatio, limit=25)
-    out = []
-    for key, score, _index in results:
-        if score < 30:
-            continue
-        out.append({"item": choices[key], "score": score})
-    # return cleaned
-    return [{"id": o["item"].id, "description": o["item"].description, "fdc_id": o["item"].fdc_id, "category": o["item"].category, "quantity": o["item"].quantity, "unit_name": o["item"].unit_name, "score": o["score"]} for o in out]
+    # fuzzy search over pantry descriptions (and/or categories) using the worker's cached index
+    index = pantry_search.get_index(user_id, lambda: _load_pantry(db, user_id))
+    fields = ("description", "category") if field == "all" else (field,)
+    return index.search(q, fields=fields, limit=25, min_score=30)
 
 
 @router.get("/aggregate")
-def aggregate_user_pantry(user_id: int = Query(...), current_user = Depends(get_current_user), db: Session = Depends(get_db)):
-    if user_id != current_user.id:
+async def aggregate_user_pantry(background_tasks: BackgroundTasks, user_id: int = Query(...), current_user_id: int = Depends(get_current_user_id),
+                                breakdown: bool = Query(True),
+                                db: Session = Depends(get_db), client: AsyncUSDAClient = Depends(get_async_usda_client)):
+    if user_id != current_user_id:
         raise HTTPException(status_code=403, detail="You can only aggregate your own pantry")
     """
     Aggregate estimated nutrients across all pantry items for the given user.
-    Returns totals and a breakdown per item (estimates).
+    Returns totals and a breakdown per item (estimates). With breakdown=false
+    only the totals are returned, read from the user's materialized totals
+    (kept up to date by every stock change) instead of aggregating the items.
     """
-    pantry = db.query(PantryItem).filter(PantryItem.user_id == user_id).all()
+    if not breakdown:
+        totals = await run_in_threadpool(pantry_ledger.get_totals, db, user_id)
+        if not totals["items"]:
+            raise HTTPException(status_code=400, detail="Pantry is empty.")
+        return totals
+    cache = get_result_cache()
+    version = await run_in_threadpool(get_version, db, user_id)
+    key = result_key("aggregate", user_id, version)
+    cached, _stale = cache.get(key, allow_stale=False)
+    if cached is not None:
+        return JSONResponse(cached, headers={"X-Result-Cache": "hit"})
+
+    pantry = await run_in_threadpool(_load_pantry, db, user_id)
     if not pantry:
         raise HTTPException(status_code=400, detail="Pantry is empty.")
-    aggregation = aggregate_pantry_nutrients(pantry, client)
-    return aggregation
+    covered, nutrients, gaps = await _pantry_nutrients(db, pantry, client, background_tasks)
+    if _use_matrix(covered):
+        result = aggregate_matrix(PantryMatrix.from_nutrients(covered, nutrients))
+    else:
+        result = aggregate_from_nutrients(covered, nutrients)
+    _with_gaps(result, gaps)
+    if "unavailable_fdc_ids" not in gaps:
+        # don't pin a result degraded by an outage
+        cache.set(key, result)
+    return JSONResponse(result, headers={"X-Result-Cache": "miss"})
 
 
 @router.get("/weekly-diet")
-def weekly_diet(user_id: int = Query(...), goal: Optional[str] = "maintain", current_user = Depends(get_current_user), db: Session = Depends(get_db)):
-    if user_id != current_user.id:
+async def weekly_diet(background_tasks: BackgroundTasks, user_id: int = Query(...), goal: Optional[str] = "maintain",
+                      planner: str = Query("greedy", regex="^(greedy|optimize)$"),
+                      tolerance: float = Query(0.1, gt=0, le=0.5),
+                      current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db),
+                      client: AsyncUSDAClient = Depends(get_async_usda_client)):
+    if user_id != current_user_id:
         raise HTTPException(status_code=403, detail="You can only request a plan for your own pantry")
     """
     Improved weekly diet planner:
      - computes user nutrition targets via pyhealthify (same as before)
      - aggregates pantry nutrients
      - uses a simple greedy planner to propose a 7-day plan and estimate per-day totals
+     - planner=optimize instead fits calories and protein/fat/carbs per day within
+       `tolerance`, split into meals (falls back to greedy if it cannot solve)
+    Results are cached by pantry version, profile and parameters.
     """
-    from app.models.user import User
-    from app.services.pyhealthify import nutrition_profile_from_user
-
-    user = db.query(User).filter(User.id == user_id).first()
+    # the profile is read from the DB, not the auth cache: another worker may hold an older copy
+    user = await run_in_threadpool(_load_user, db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    profile = {
-        "weight_kg": user.weight_kg,
-        "height_cm": user.height_cm,
-        "age": user.age or 30,
-        "gender": user.gender or "male",
-        "activity_level": user.activity_level or "sedentary"
-    }
-    profile_nut = nutrition_profile_from_user(profile, goal=goal)
+    cache = get_result_cache()
+    version = await run_in_threadpool(get_version, db, user_id)
+    key = result_key("weekly-diet", user_id, version, profile=user, goal=goal, planner=planner,
+                     tolerance=tolerance)
+    cached, _stale = cache.get(key, allow_stale=False)
+    if cached is not None:
+        return JSONResponse(cached, headers={"X-Result-Cache": "hit"})
 
-    pantry = db.query(PantryItem).filter(PantryItem.user_id == user_id).all()
+    profile_nut = _profile_targets(user, goal)
+
+    pantry = await run_in_threadpool(_load_pantry, db, user_id)
     if not pantry:
         raise HTTPException(status_code=400, detail="Pantry is empty. Add some items first.")
 
-    aggregation = aggregate_pantry_nutrients(pantry, client)
-    pantry_breakdown = aggregation["breakdown"]
-    totals = aggregation["totals"]
+    covered, nutrients, gaps = await _pantry_nutrients(db, pantry, client, background_tasks)
+    if planner == "optimize" or _use_matrix(covered):
+        matrix = PantryMatrix.from_nutrients(covered, nutrients)
+        # the response carries totals only, so skip building the per-item breakdown
+        totals = aggregate_matrix(matrix, breakdown=False)["totals"]
+    else:
+        aggregated = aggregate_from_nutrients(covered, nutrients)
+        totals = aggregated["totals"]
 
-    planner_result = plan_daily_from_targets(profile_nut, pantry_breakdown, meals_per_day=3)
+    if planner == "optimize":
+        # imported here: scipy is the slowest import in the app and only this planner needs it
+        from app.services.meal_optimizer import plan_optimized
 
-    return {
+        planner_result = await run_in_threadpool(plan_optimized, profile_nut, matrix, meals_per_day=3,
+                                                 tolerance=tolerance)
+    elif _use_matrix(covered):
+        planner_result = await run_in_threadpool(plan_matrix, profile_nut, matrix, meals_per_day=3)
+    else:
+        planner_result = await run_in_threadpool(plan_daily_from_targets, profile_nut, aggregated["breakdown"],
+                                                 meals_per_day=3)
+
+    result = {
         "targets": profile_nut,
         "pantry_totals": totals,
         "planner": planner_result,
@@ -141,8 +417,154 @@ def weekly_diet(user_id: int = Query(...), goal: Optional[str] = "maintain", cur
             "assumptions": [
                 "USDA nutrient values are interpreted per 100g when portion information is unavailable.",
                 "Pantry 'quantity' is treated as number of portions when USDA portion gramWeight exists, otherwise as number of 100g units.",
-                "Planner uses a greedy allocation and does not persist changes to pantry quantities.",
+                "Planner uses a greedy allocation (or whole-portion optimization with planner=optimize) and does not persist changes to pantry quantities.",
                 "Some USDA items may not report all nutrients; missing values are shown as null and will affect accuracy."
             ]
         }
     }
+    _with_gaps(result, gaps)
+    if "unavailable_fdc_ids" not in gaps:
+        cache.set(key, result)
+    return JSONResponse(result, headers={"X-Result-Cache": "miss"})
+
+
+@router.get("/ledger", response_model=List[PantryEventOut])
+def list_ledger(user_id: int = Query(...), limit: int = Query(100, ge=1, le=500), before: Optional[int] = None,
+                current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    """Stock changes of the pantry, newest first; pass the last event id as `before` for the next page."""
+    if user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="You can only read your own pantry ledger")
+    return pantry_ledger.list_events(db, user_id, limit, before)
+
+
+@router.get("/result-cache")
+def result_cache_stats(admin: User = Depends(get_admin_user)):
+    """Hit/miss counters of this worker's aggregate/weekly-diet result cache (admins only)."""
+    return get_result_cache().stats()
+
+
+@router.patch("/{item_id}", response_model=PantryItemOut)
+def update_pantry_item(item_id: int, payload: PantryItemUpdate, current_user_id: int = Depends(get_current_user_id),
+                       db: Session = Depends(get_db)):
+    item = db.query(PantryItem).filter(PantryItem.id == item_id).first()
+    if not item or item.user_id != current_user_id:
+        raise HTTPException(status_code=404, detail="Pantry item not found")
+    if payload.quantity is not None:
+        pantry_ledger.change_quantities(db, item.user_id, [(item, payload.quantity)], "adjust")
+    if payload.unit_name is not None:
+        item.unit_name = payload.unit_name
+    bump_version(db, item.user_id)
+    db.commit()
+    db.refresh(item)
+    pantry_search.index_item(item)
+    return item
+
+
+@router.post("/{item_id}/stock", response_model=PantryItemOut)
+def change_stock(item_id: int, payload: StockChange, current_user_id: int = Depends(get_current_user_id),
+                 db: Session = Depends(get_db)):
+    """Restock or consume some of an item (in its units); recorded in the pantry ledger."""
+    item = db.query(PantryItem).filter(PantryItem.id == item_id).first()
+    if not item or item.user_id != current_user_id:
+        raise HTTPException(status_code=404, detail="Pantry item not found")
+    current = 1.0 if item.quantity is None else item.quantity
+    if payload.kind == "consume":
+        if payload.quantity > current + pantry_ledger.EPSILON:
+            raise HTTPException(status_code=400, detail=f"Only {current:g} {item.unit_name} in stock")
+        quantity = max(current - payload.quantity, 0.0)
+    else:
+        quantity = current + payload.quantity
+    pantry_ledger.change_quantities(db, item.user_id, [(item, quantity)], payload.kind)
+    bump_version(db, item.user_id)
+    db.commit()
+    db.refresh(item)
+    pantry_search.index_item(item)
+    return item
+
+
+async def _refresh_plan(db: Session, user_id: int, goal: str, days: int, client: AsyncUSDAClient,
+                        background_tasks: BackgroundTasks, lock_day: Optional[int] = None,
+                        lock_items: Optional[list] = None, accept_day: Optional[int] = None) -> dict:
+    profile_nut = await run_in_threadpool(_user_targets, db, user_id, goal)
+    if not profile_nut:
+        raise HTTPException(status_code=404, detail="User not found")
+    pantry = await run_in_threadpool(_load_pantry, db, user_id)
+    if not pantry:
+        raise HTTPException(status_code=400, detail="Pantry is empty. Add some items first.")
+    # a plan saved without some items is re-planned in full once they are back (the signature changes)
+    matrix, covered, gaps = await _pantry_matrix(db, pantry, client, background_tasks)
+    daily_cal = profile_nut["nutrition"]["calories"]
+    plan = await run_in_threadpool(update_plan, db, user_id, covered, matrix, daily_cal, days, goal,
+                                   lock_day, lock_items, accept_day)
+    if accept_day is not None:
+        pantry_search.evict(user_id)  # indexed quantities changed
+    return _with_gaps({"targets": profile_nut, "goal": goal, "planner": plan}, gaps)
+
+
+@router.get("/plan")
+async def get_plan(background_tasks: BackgroundTasks, user_id: int = Query(...),
+                   days: int = Query(30, ge=1, le=MAX_PLAN_DAYS), goal: Optional[str] = "maintain",
+                   current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db),
+                   client: AsyncUSDAClient = Depends(get_async_usda_client)):
+    """
+    Multi-day plan (up to MAX_PLAN_DAYS) from the greedy planner, saved per
+    user. Later calls reuse the saved plan and only re-plan days affected by
+    pantry changes since; a different goal or pantry items re-plan everything.
+    """
+    if user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="You can only request a plan for your own pantry")
+    return await _refresh_plan(db, user_id, goal, days, client, background_tasks)
+
+
+async def _saved_plan(db: Session, user_id: int, day: int):
+    plan = await run_in_threadpool(load_plan, db, user_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="No saved plan. Request /pantry/plan first.")
+    if not 1 <= day <= plan.days:
+        raise HTTPException(status_code=400, detail=f"Day must be between 1 and {plan.days}")
+    if str(day - 1) in accepted_days(saved_fields(plan)):
+        raise HTTPException(status_code=409, detail=f"Day {day} was already accepted")
+    return plan
+
+
+@router.put("/plan/days/{day}")
+async def lock_plan_day(day: int, payload: PlanDayUpdate, background_tasks: BackgroundTasks,
+                        user_id: int = Query(...), current_user_id: int = Depends(get_current_user_id),
+                        db: Session = Depends(get_db), client: AsyncUSDAClient = Depends(get_async_usda_client)):
+    """Fix a day of the saved plan to the given foods; following days are re-planned as needed."""
+    if user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="You can only edit your own plan")
+    plan = await _saved_plan(db, user_id, day)
+    items = [{"fdc_id": i.fdc_id, "grams": i.grams} for i in payload.items if i.grams > 0]
+    return await _refresh_plan(db, user_id, plan.goal, plan.days, client, background_tasks,
+                               lock_day=day - 1, lock_items=items)
+
+
+@router.delete("/plan/days/{day}")
+async def unlock_plan_day(day: int, background_tasks: BackgroundTasks, user_id: int = Query(...),
+                          current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db),
+                          client: AsyncUSDAClient = Depends(get_async_usda_client)):
+    """Hand a fixed day back to the planner."""
+    if user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="You can only edit your own plan")
+    plan = await _saved_plan(db, user_id, day)
+    return await _refresh_plan(db, user_id, plan.goal, plan.days, client, background_tasks,
+                               lock_day=day - 1, lock_items=None)
+
+
+@router.post("/plan/days/{day}/accept")
+async def accept_plan_day(day: int, background_tasks: BackgroundTasks, user_id: int = Query(...),
+                          current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db),
+                          client: AsyncUSDAClient = Depends(get_async_usda_client)):
+    """
+    Mark a day of the saved plan as eaten: its foods are consumed from the
+    pantry (recorded in the ledger) and the day is kept as it was planned.
+    """
+    if user_id != current_user_id:
+        raise HTTPException(status_code=403, detail="You can only edit your own plan")
+    plan = await _saved_plan(db, user_id, day)
+    try:
+        return await _refresh_plan(db, user_id, plan.goal, plan.days, client, background_tasks,
+                                   accept_day=day - 1)
+    except DayAlreadyAccepted as e:  # accepted by a concurrent request since _saved_plan
+        raise HTTPException(status_code=409, detail=str(e))
@@ -1,19 +1,59 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse
 from app.api.users import router as users_router
 from app.api.usda import router as usda_router
 from app.api.pantry import router as pantry_router
 from app.api.auth import router as auth_router
+from app.api.metrics import router as metrics_router
+from app.api.admin import router as admin_router
+from app.api.middleware import QueryReportMiddleware, RequestMetricsMiddleware
+from app.config import settings
 from app.db.session import init_db
+from app.services.enrichment import get_enrichment_worker
+from app.services.usda_client import AsyncUSDAClient
+from app.utils import fastjson
+from app.utils.compression import CompressionMiddleware
 
-app = FastAPI(title="Nutrition Backend")
 
-# init DB (create tables)
-init_db()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_CREATE_SCHEMA:
+        await run_in_threadpool(init_db)
+    # one pooled async USDA client per worker
+    app.state.usda_client = AsyncUSDAClient()
+    worker = get_enrichment_worker() if settings.ENRICHMENT_ENABLED else None
+    if worker is not None:
+        worker.start()
+    try:
+        yield
+    finally:
+        if worker is not None:
+            worker.stop()
+        await app.state.usda_client.aclose()
+
+
+app = FastAPI(title="Nutrition Backend", lifespan=lifespan,
+              default_response_class=ORJSONResponse if fastjson.available() else JSONResponse)
+
+if settings.DB_QUERY_REPORT:
+    app.add_middleware(QueryReportMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
+    app.include_router(metrics_router)
+
+if settings.RESPONSE_COMPRESSION:
+    # added last, so it wraps everything above and compresses the final body
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.RESPONSE_COMPRESSION_MIN_SIZE,
+                       gzip_level=settings.RESPONSE_GZIP_LEVEL, brotli_quality=settings.RESPONSE_BROTLI_QUALITY)
 
 app.include_router(users_router)
 app.include_router(usda_router)
 app.include_router(pantry_router)
 app.include_router(auth_router)
+app.include_router(admin_router)
 
 @app.get("/health")
 def health():
@@ -1,23 +1,74 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.services.usda_client import USDAClient
+import math
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from app.config import settings
+from app.services.resilience import UpstreamUnavailable
+from app.services.usda_client import AsyncUSDAClient
+from app.services.usda_fields import parse_fields, shape_food, shape_search
+from app.utils import fastjson
 
 router = APIRouter(prefix="/usda", tags=["usda"])
-client = USDAClient()
+
+
+def get_async_usda_client(request: Request) -> AsyncUSDAClient:
+    # created/closed by the app lifespan (see app.api.routes)
+    return request.app.state.usda_client
+
+
+def _unavailable(e: UpstreamUnavailable) -> HTTPException:
+    retry_after = math.ceil(e.retry_after or settings.USDA_BREAKER_RESET)
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(retry_after)})
+
+
+def _shape(fields: Optional[str], fmt: str):
+    """(field tree, abridged), or None when the upstream document is returned as is."""
+    try:
+        tree = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    abridged = fmt == "abridged"
+    return None if tree is None and not abridged else (tree, abridged)
+
+
+def _json(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+FIELDS_QUERY = Query(None, description="Comma-separated keys to return; dotted for nested keys "
+                                       "(e.g. fdcId,description,foodNutrients.amount)")
+FORMAT_QUERY = Query("full", alias="format", regex="^(full|abridged)$")
 
 
 @router.get("/search")
-def search_usda(q: str = Query(..., min_length=1), pageSize: int = 25, pageNumber: int = 1):
+async def search_usda(q: str = Query(..., min_length=1), pageSize: int = 25, pageNumber: int = 1,
+                      fields: Optional[str] = FIELDS_QUERY, fmt: str = FORMAT_QUERY,
+                      client: AsyncUSDAClient = Depends(get_async_usda_client)):
+    shape = _shape(fields, fmt)
     try:
-        data = client.search_foods(q, page_size=pageSize, page_number=pageNumber)
-        return data
+        if shape is None:
+            # cached pages go out as stored, without a decode/re-encode
+            return _json(await client.search_foods(q, page_size=pageSize, page_number=pageNumber, raw=True))
+        data = await client.search_foods(q, page_size=pageSize, page_number=pageNumber)
+        return _json(fastjson.dumps(shape_search(data, *shape)))
+    except UpstreamUnavailable as e:
+        raise _unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/food/{fdc_id}")
-def get_food(fdc_id: int):
+async def get_food(fdc_id: int, fields: Optional[str] = FIELDS_QUERY, fmt: str = FORMAT_QUERY,
+                   client: AsyncUSDAClient = Depends(get_async_usda_client)):
+    shape = _shape(fields, fmt)
     try:
-        data = client.get_food(fdc_id)
-        return data
+        if shape is None:
+            return _json(await client.get_food(fdc_id, raw=True))
+        data = await client.get_food(fdc_id)
+        return _json(fastjson.dumps(shape_food(data, *shape)))
+    except UpstreamUnavailable as e:
+        raise _unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
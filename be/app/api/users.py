@@ -1,7 +1,7 @@
 # app/api/users.py
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from app.db.session import get_db
 from app.schemas.user import UserCreate, UserOut
 from app.models.user import User
 from app.utils.security import get_current_user  # no need for hash_password
@@ -9,14 +9,6 @@ from app.utils.security import get_current_user  # no need for hash_password
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/", response_model=UserOut)
 def create_user(payload: UserCreate, db: Session = Depends(get_db)):
     existing = db.query(User).filter(User.email == payload.email).first()
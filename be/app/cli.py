@@ -0,0 +1,98 @@
+# app/cli.py
+# maintenance commands: python -m app.cli <command> ...
+import argparse
+import time
+
+from app.config import settings
+
+
+def cmd_upgrade_db(args):
+    from app.db.session import get_engine
+    from app.db.upgrade import plan_upgrade, upgrade_schema
+
+    statements = plan_upgrade(get_engine()) if args.sql else upgrade_schema(get_engine())
+    for statement in statements:
+        print(f"{statement};")
+    if not args.sql:
+        print(f"applied {len(statements)} statements" if statements else "schema is up to date")
+
+
+def cmd_import_fdc(args):
+    from app.services.fdc_local import LocalFoodStore, import_fdc_dump
+
+    store = LocalFoodStore(args.db or settings.USDA_LOCAL_DB)
+    started = time.perf_counter()
+    count = import_fdc_dump(args.path, store)
+    elapsed = time.perf_counter() - started
+    print(f"imported {count} foods into {store.path} in {elapsed:.1f}s ({store.count()} total)")
+
+
+def cmd_plan_all(args):
+    from app.services.batch_planning import run_batch
+
+    def progress(stats):
+        print(f"  {stats.get('users', 0)} users, {stats.get('planned', 0)} plans written", flush=True)
+
+    stats = run_batch(goal=args.goal, days=args.days, user_ids=args.user_ids, workers=args.workers,
+                      chunk_size=args.chunk_size, progress=progress)
+    errors = stats.pop("errors")
+    print(" ".join(f"{k}={v}" for k, v in sorted(stats.items())))
+    for e in errors:
+        print(f"  user {e['user_id']}: {e['error']}")
+
+
+def cmd_rebuild_pantry(args):
+    from sqlalchemy import select
+
+    from app.db.session import SessionLocal
+    from app.models.pantry import PantryEvent, PantryItem
+    from app.services.pantry_ledger import rebuild
+
+    db = SessionLocal()
+    try:
+        user_ids = args.user_ids or sorted(set(db.execute(select(PantryItem.user_id).distinct()).scalars())
+                                           | set(db.execute(select(PantryEvent.user_id).distinct()).scalars()))
+        opened = corrected = 0
+        for user_id in user_ids:
+            result = rebuild(db, user_id)
+            opened += result["opened"]
+            corrected += result["corrected"]
+            if result["opened"] or result["corrected"]:
+                print(f"  user {user_id}: {result['opened']} items opened, {result['corrected']} quantities corrected")
+    finally:
+        db.close()
+    print(f"rebuilt {len(user_ids)} pantries: {opened} items opened in the ledger, {corrected} quantities corrected")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("upgrade-db", help="add the tables, columns and indexes an existing database is missing")
+    p.add_argument("--sql", action="store_true", help="only print the DDL, don't run it")
+    p.set_defaults(func=cmd_upgrade_db)
+
+    p = sub.add_parser("import-fdc", help="load an FDC JSON file or CSV directory into the local food DB")
+    p.add_argument("path", help="FDC JSON download, JSON list of foods, or CSV download directory")
+    p.add_argument("--db", help=f"SQLite path (default: USDA_LOCAL_DB={settings.USDA_LOCAL_DB})")
+    p.set_defaults(func=cmd_import_fdc)
+
+    p = sub.add_parser("plan-all", help="re-plan the saved meal plans of all users across a process pool")
+    p.add_argument("--goal", help="override each user's saved goal (maintain/lose/gain)")
+    p.add_argument("--days", type=int, help="override each user's saved plan length (default for new plans: 7)")
+    p.add_argument("--user-ids", type=int, nargs="+", help="only these users")
+    p.add_argument("--workers", type=int,
+                   help="planner processes (default: BATCH_PLAN_WORKERS or one per CPU; 0 = in-process)")
+    p.add_argument("--chunk-size", type=int, help=f"users per step (default: {settings.BATCH_PLAN_CHUNK_SIZE})")
+    p.set_defaults(func=cmd_plan_all)
+
+    p = sub.add_parser("rebuild-pantry", help="repair pantry quantities from the stock ledger and recompute totals")
+    p.add_argument("--user-ids", type=int, nargs="+", help="only these users")
+    p.set_defaults(func=cmd_rebuild_pantry)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,30 @@
+from typing import Optional
+
 from pydantic import BaseSettings
 
 
 class Settings(BaseSettings):
-    DB_USER: str
-    DB_PASSWORD: str
+    # only checked when the first DB connection / USDA call is made, so the app
+    # imports (and tests collect) without them
+    DB_USER: Optional[str] = None
+    DB_PASSWORD: Optional[str] = None
     DB_HOST: str = "127.0.0.1"
     DB_PORT: int = 3306
-    DB_NAME: str
-    FDC_API_KEY: str
+    DB_NAME: Optional[str] = None
+    FDC_API_KEY: Optional[str] = None
+    # full SQLAlchemy URL; overrides the DB_* parts (e.g. "sqlite:///./nutri.db" for local/test)
+    DATABASE_URL: Optional[str] = None
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a connection before failing
+    DB_POOL_RECYCLE: int = 1800  # below MySQL's wait_timeout so idle connections aren't dropped under us
+    DB_POOL_PRE_PING: bool = True
+    # run create_all at startup; turn off where the schema is managed separately
+    # so booting a worker doesn't issue DDL against the database. create_all never
+    # alters existing tables: upgrade those with `python -m app.cli upgrade-db`
+    DB_CREATE_SCHEMA: bool = True
+    # adds X-DB-Queries / Server-Timing headers with the request's query count and time
+    DB_QUERY_REPORT: bool = True
 
     # FastAPI / run
     HOST: str = "127.0.0.1"
@@ -17,6 +34,107 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "changeme_replacethis_with_a_long_random_secret_please"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    # authenticated-user cache (per worker); updates through this worker invalidate immediately
+    AUTH_CACHE_TTL: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    # comma-separated emails of users allowed on the /admin endpoints
+    ADMIN_EMAILS: str = ""
+
+    # USDA response cache: "memory" (per process LRU), "sqlite" (file shared by
+    # all workers, survives restarts) or "tiered" (memory in front of sqlite)
+    USDA_CACHE_BACKEND: str = "memory"
+    USDA_CACHE_PATH: str = ".cache/usda_cache.sqlite3"
+    USDA_CACHE_TTL: int = 60 * 60 * 24  # FDC records rarely change
+    USDA_CACHE_STALE_TTL: int = 60 * 60 * 24 * 7  # serve stale + revalidate in background
+    USDA_CACHE_MAX_ENTRIES: int = 5000
+    USDA_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    USDA_CACHE_DISK_MAX_ENTRIES: int = 200000
+    USDA_CACHE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024
+    USDA_BATCH_CONCURRENCY: int = 8  # parallel /foods chunk requests
+
+    # USDA search result cache (keys are normalized query + paging)
+    USDA_SEARCH_CACHE_BACKEND: str = "memory"
+    USDA_SEARCH_CACHE_TTL: int = 60 * 60 * 6
+    USDA_SEARCH_CACHE_STALE_TTL: int = 60 * 60 * 24
+    USDA_SEARCH_CACHE_MAX_ENTRIES: int = 20000
+    USDA_SEARCH_CACHE_MAX_BYTES: int = 128 * 1024 * 1024
+    USDA_SEARCH_CACHE_PATH: str = ".cache/usda_search_cache.sqlite3"
+    USDA_SEARCH_CACHE_DISK_MAX_ENTRIES: int = 200000
+    USDA_SEARCH_CACHE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024
+
+    # FoodData Central API root (point at a local stand-in for benchmarks)
+    USDA_BASE_URL: str = "https://api.nal.usda.gov/fdc/v1"
+    # per-endpoint read timeouts (s); a call takes at most ~(USDA_RETRIES + 1) x timeout + backoff
+    USDA_CONNECT_TIMEOUT: float = 2.0
+    USDA_TIMEOUT_SEARCH: float = 4.0
+    USDA_TIMEOUT_FOOD: float = 3.0
+    USDA_TIMEOUT_FOODS: float = 5.0
+    # retries of timeouts / connection errors / 429 / 5xx, with full-jitter exponential backoff
+    USDA_RETRIES: int = 2
+    USDA_RETRY_BACKOFF_BASE: float = 0.1
+    USDA_RETRY_BACKOFF_MAX: float = 1.0
+    # retries allowed per first attempt, plus a floor per second
+    USDA_RETRY_BUDGET_RATIO: float = 0.2
+    USDA_RETRY_BUDGET_MIN_PER_SEC: float = 1.0
+    # circuit breaker per endpoint: open after N consecutive failures, probe again after RESET s
+    USDA_BREAKER_FAILURES: int = 5
+    USDA_BREAKER_RESET: float = 30.0
+
+    # Offline FDC database (see `python -m app.cli import-fdc`)
+    # USDA_MODE: "remote" (API only), "local_first" (local DB, API on misses) or "local" (no API)
+    USDA_MODE: str = "remote"
+    USDA_LOCAL_DB: str = ".cache/fdc_local.sqlite3"
+
+    # stored per-food nutrient snapshots older than this are refreshed in the background
+    FOOD_SNAPSHOT_MAX_AGE_DAYS: int = 30
+
+    # Computed /pantry/aggregate and /pantry/weekly-diet results, keyed by pantry
+    # version + profile + parameters (same backends as the USDA cache)
+    RESULT_CACHE_BACKEND: str = "memory"
+    RESULT_CACHE_TTL: int = 60 * 60 * 24  # also bounds staleness after background snapshot refreshes
+    RESULT_CACHE_STALE_TTL: int = 0
+    RESULT_CACHE_MAX_ENTRIES: int = 2000
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESULT_CACHE_PATH: str = ".cache/result_cache.sqlite3"
+    RESULT_CACHE_DISK_MAX_ENTRIES: int = 50000
+    RESULT_CACHE_DISK_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Per-worker pantry search indexes (LRU over users, rebuilt after the TTL)
+    PANTRY_SEARCH_MAX_USERS: int = 256
+    PANTRY_SEARCH_TTL: int = 300
+
+    # Async USDA connection pool (one per worker, managed by the app lifespan)
+    USDA_MAX_CONNECTIONS: int = 200
+    USDA_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    USDA_KEEPALIVE_EXPIRY: float = 30.0
+    USDA_HTTP2: bool = True  # used only when the optional `h2` package is installed
+
+    # Prometheus-format GET /metrics and per-route latency histograms
+    METRICS_ENABLED: bool = True
+
+    # gzip (or brotli, with the optional `brotli` package) for responses of at least MIN_SIZE bytes
+    RESPONSE_COMPRESSION: bool = True
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 6  # 9 costs much more CPU for a few % smaller bodies
+    RESPONSE_BROTLI_QUALITY: int = 4
+
+    # Background USDA enrichment of new pantry items (a worker thread per app process)
+    ENRICHMENT_ENABLED: bool = True
+    ENRICHMENT_WORKERS: int = 4  # concurrent USDA batch lookups
+    ENRICHMENT_POLL_INTERVAL: float = 5.0
+    ENRICHMENT_MAX_ATTEMPTS: int = 6
+    ENRICHMENT_BACKOFF_BASE: float = 2.0
+    ENRICHMENT_BACKOFF_MAX: float = 600.0
+    ENRICHMENT_LOCK_TIMEOUT: int = 300  # "running" jobs older than this are reclaimed
+
+    # /pantry/aggregate and greedy /pantry/weekly-diet switch from the dict implementations to the
+    # NumPy matrix engine at this many items; below it building the arrays costs more than it saves
+    # (python -m benchmarks.bench_nutrition_matrix --sizes 10 100 1000 2000)
+    PANTRY_MATRIX_MIN_ITEMS: int = 1000
+
+    # Batch re-planning of saved plans (`python -m app.cli plan-all`, POST /admin/batch-plans)
+    BATCH_PLAN_WORKERS: Optional[int] = None  # planner processes; default: one per CPU
+    BATCH_PLAN_CHUNK_SIZE: int = 500  # users read, planned and written per step
 
     class Config:
         env_file = ".env"
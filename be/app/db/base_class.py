@@ -1,3 +1,2 @@
-from sqlalchemy.orm import declarative_base
-
-Base = declarative_base()
+# kept for existing imports: every model shares the one declarative Base
+from app.db.base import Base  # noqa: F401
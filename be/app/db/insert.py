@@ -0,0 +1,31 @@
+from typing import List
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def insert_ignore(db: Session, model, rows: List[dict]):
+    """
+    Insert `rows` in the caller's transaction, skipping those whose primary key
+    already exists (e.g. a concurrent writer inserted it first).
+    """
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite.insert(model).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(model).on_conflict_do_nothing()
+    elif dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(model).prefix_with("IGNORE")
+    else:
+        # no portable conflict clause: insert the keys not there yet
+        keys = list(model.__table__.primary_key.columns)
+        wanted = {tuple(row[c.name] for c in keys): row for row in rows}
+        found = db.execute(select(*keys).where(tuple_(*keys).in_(list(wanted)))).all()
+        rows = [row for key, row in wanted.items() if key not in {tuple(f) for f in found}]
+        if not rows:
+            return
+        stmt = insert(model)
+    db.execute(stmt, rows)
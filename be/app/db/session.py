@@ -1,17 +1,112 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
 from .base import Base
 from app.config import settings
+from app.services.metrics import DB_QUERY_SECONDS
+
+
+def database_url() -> str:
+    if settings.DATABASE_URL:
+        return settings.DATABASE_URL
+    missing = [name for name in ("DB_USER", "DB_PASSWORD", "DB_NAME") if not getattr(settings, name)]
+    if missing:
+        raise RuntimeError(f"Database not configured: set DATABASE_URL or {', '.join(missing)}")
+    return (
+        f"mysql+pymysql://{settings.DB_USER}:{settings.DB_PASSWORD}@"
+        f"{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+    )
+
+
+def _engine_kwargs(url: str) -> dict:
+    if url.startswith("sqlite"):
+        # local/test database; SQLAlchemy picks the right pool for file vs :memory:
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+# created on first use, so importing the app (workers, reloads, test collection)
+# needs neither a database nor its configuration
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = database_url()
+                engine = create_engine(url, echo=False, future=True, **_engine_kwargs(url))
+                event.listen(engine, "before_cursor_execute", _query_started)
+                event.listen(engine, "after_cursor_execute", _query_finished)
+                _engine = engine
+    return _engine
+
+
+def dispose_inherited_engine():
+    """
+    For forked worker processes: forget the connections pooled by the parent
+    (without closing them under it); the child opens its own on first use.
+    """
+    if _engine is not None:
+        _engine.dispose(close=False)
 
-DATABASE_URL = (
-    f"mysql+pymysql://{settings.DB_USER}:{settings.DB_PASSWORD}@"
-    f"{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
-)
 
-engine = create_engine(DATABASE_URL, echo=False, future=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def SessionLocal() -> Session:
+    """A new session on the (lazily created) engine."""
+    return _session_factory(bind=get_engine())
+
+
+def get_db():
+    """FastAPI dependency: one session per request, always closed."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
 
 
 def init_db():
     # Create tables
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
+
+
+# -------------------------
+# Per-request query stats
+# -------------------------
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# set by the request middleware; copied into threadpool workers with the context
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    DB_QUERY_SECONDS.observe(elapsed)
+    stats = query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
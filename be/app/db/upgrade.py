@@ -0,0 +1,95 @@
+# app/db/upgrade.py
+"""
+Bring an existing database up to the current models (python -m app.cli upgrade-db).
+
+create_all only creates missing tables, so a database created by an older
+release keeps its old tables as they were. This adds what newer releases
+need, and only what is missing, so it is safe to run on every deploy:
+
+- tables that don't exist yet (food_snapshots, meal_plans, pantry_versions,
+  enrichment_jobs, pantry_events, pantry_totals, ...)
+- columns added to existing tables, backfilled for the rows already there
+  (pantry_items.enrichment_status, meal_plans.consumed, ...)
+- indexes added to existing tables (ix_pantry_items_user_fdc,
+  ix_pantry_items_user_added, ...), and drops the ones they replace
+
+Run it before starting app processes with DB_CREATE_SCHEMA=false; then run
+`rebuild-pantry` once so pantries that predate the stock ledger get their
+opening events and totals.
+"""
+import importlib
+import pkgutil
+from typing import List
+
+from sqlalchemy import MetaData, Table, inspect, literal
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex, CreateTable, DropIndex, Index
+
+import app.models
+from app.db.base import Base
+
+# value for the rows already there when a NOT NULL column is added; otherwise the column's default is used
+BACKFILL = {
+    # items stored before background enrichment were looked up synchronously: there is nothing left to do
+    ("pantry_items", "enrichment_status"): "done",
+}
+
+# (table, index) superseded by an index of the current models
+DROPPED_INDEXES = [
+    ("pantry_items", "ix_pantry_items_user_id"),  # covered by ix_pantry_items_user_fdc / _user_added
+]
+
+
+def _load_models():
+    for module in pkgutil.iter_modules(app.models.__path__):
+        importlib.import_module(f"app.models.{module.name}")
+
+
+def _add_column_ddl(engine: Engine, table, column) -> str:
+    dialect = engine.dialect
+    ddl = f"ALTER TABLE {dialect.identifier_preparer.format_table(table)} ADD COLUMN " \
+          f"{dialect.identifier_preparer.format_column(column)} {column.type.compile(dialect=dialect)}"
+    value = BACKFILL.get((table.name, column.name))
+    if value is None and column.default is not None and column.default.is_scalar:
+        value = column.default.arg
+    if value is not None:
+        ddl += " DEFAULT " + str(literal(value, column.type).compile(dialect=dialect,
+                                                                      compile_kwargs={"literal_binds": True}))
+    if not column.nullable:
+        if value is None:
+            raise RuntimeError(f"{table.name}.{column.name}: NOT NULL column without a default to backfill")
+        ddl += " NOT NULL"
+    return ddl
+
+
+def plan_upgrade(engine: Engine) -> List[str]:
+    """The DDL statements that bring the database at `engine` up to the models (empty when it is current)."""
+    _load_models()
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            statements.append(str(CreateTable(table).compile(dialect=engine.dialect)).strip())
+            statements += [str(CreateIndex(index).compile(dialect=engine.dialect)) for index in table.indexes]
+            continue
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        statements += [_add_column_ddl(engine, table, c) for c in table.columns if c.name not in columns]
+        indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        statements += [str(CreateIndex(index).compile(dialect=engine.dialect))
+                       for index in table.indexes if index.name not in indexes]
+        for table_name, name in DROPPED_INDEXES:
+            if table_name == table.name and name in indexes:
+                # a detached copy of the table, so the dropped index isn't added to the models' metadata
+                index = Index(name, _table=Table(table.name, MetaData()))
+                statements.append(str(DropIndex(index).compile(dialect=engine.dialect)).strip())
+    return statements
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """Apply plan_upgrade() in one transaction (where the backend supports transactional DDL); returns it."""
+    statements = plan_upgrade(engine)
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.exec_driver_sql(statement)
+    return statements
@@ -0,0 +1,21 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from app.db.base import Base
+
+class EnrichmentJob(Base):
+    """
+    Pending USDA enrichment for one fdc_id (deduplicated: every pantry item
+    with that food is enriched by the same job). Claimed by the background
+    worker, retried with backoff on USDA errors.
+    """
+    __tablename__ = "enrichment_jobs"
+    __table_args__ = (
+        Index("ix_enrichment_jobs_status_due", "status", "next_attempt_at"),
+    )
+
+    fdc_id = Column(Integer, primary_key=True, autoincrement=False)
+    status = Column(String(16), nullable=False, default="pending")  # pending | running | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
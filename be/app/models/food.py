@@ -0,0 +1,33 @@
+import json
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from app.db.base import Base
+
+class FoodSnapshot(Base):
+    """
+    Extracted per-100g nutrients for one USDA food, shared by every pantry item
+    with that fdc_id so aggregation never needs the full USDA record.
+    """
+    __tablename__ = "food_snapshots"
+
+    fdc_id = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(512), nullable=True)
+    category = Column(String(255), nullable=True)
+    calories = Column(Float, nullable=True)  # kcal per 100 g
+    protein_g = Column(Float, nullable=True)
+    fat_g = Column(Float, nullable=True)
+    carbs_g = Column(Float, nullable=True)
+    portion_gram = Column(Float, default=100.0)
+    micronutrients = Column(Text, nullable=True)  # JSON {key: per-100g value} of nutrients.MICRONUTRIENTS
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_nutrients(self) -> dict:
+        out = json.loads(self.micronutrients) if self.micronutrients else {}
+        out.update({
+            "calories": self.calories,
+            "protein_g": self.protein_g,
+            "fat_g": self.fat_g,
+            "carbs_g": self.carbs_g,
+            "portion_gram": self.portion_gram,
+        })
+        return out
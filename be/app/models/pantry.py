@@ -1,17 +1,72 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Index, Boolean
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
 from app.db.base import Base
 
 class PantryItem(Base):
     __tablename__ = "pantry_items"
+    __table_args__ = (
+        # every pantry query filters by user; these also serve per-food lookups and date ordering
+        Index("ix_pantry_items_user_fdc", "user_id", "fdc_id"),
+        Index("ix_pantry_items_user_added", "user_id", "added_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True, nullable=False)
+    user_id = Column(Integer, nullable=False)
     fdc_id = Column(Integer, nullable=False)  # USDA FDC ID
     description = Column(String(512), nullable=False)
     category = Column(String(255), nullable=True)  # USDA category name
     quantity = Column(Float, default=1.0)  # user stored quantity (units flexible)
     unit_name = Column(String(64), default="unit")
-    added_at = Column(DateTime(timezone=True), server_default=func.now())
+    # set by the app (UTC) so keyset cursors compare like-for-like on every backend
+    added_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     extra = Column(Text, nullable=True)  # JSON string for nutrient snapshot if desired
+    enrichment_status = Column(String(16), nullable=False, default="pending")  # pending | done | failed
+
+
+class PantryVersion(Base):
+    """Per-user counter bumped by every pantry write (drives ETags and cache keys)."""
+    __tablename__ = "pantry_versions"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class PantryEvent(Base):
+    """
+    Stock ledger: one row per change of a pantry item's quantity (signed, in
+    the item's units). An item's quantity is the sum of its events.
+    """
+    __tablename__ = "pantry_events"
+    __table_args__ = (
+        Index("ix_pantry_events_user", "user_id", "id"),
+        Index("ix_pantry_events_item", "item_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    item_id = Column(Integer, nullable=False)
+    fdc_id = Column(Integer, nullable=False)
+    kind = Column(String(16), nullable=False)  # stock (item added) | restock | consume | adjust (quantity set)
+    quantity = Column(Float, nullable=False)
+    plan_day = Column(Integer, nullable=True)  # 1-based day of the saved plan a consumption was accepted from
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PantryTotals(Base):
+    """
+    Per-user nutrient totals of the whole pantry, maintained incrementally by
+    every stock change (see services/pantry_ledger). `stale` rows are
+    recomputed from the items on their next read.
+    """
+    __tablename__ = "pantry_totals"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    calories = Column(Float, nullable=False, default=0.0)
+    protein_g = Column(Float, nullable=False, default=0.0)
+    fat_g = Column(Float, nullable=False, default=0.0)
+    carbs_g = Column(Float, nullable=False, default=0.0)
+    items = Column(Integer, nullable=False, default=0)
+    valued_items = Column(Integer, nullable=False, default=0)  # items with a nutrient snapshot
+    stale = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
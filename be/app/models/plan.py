@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from app.db.base import Base
+
+class MealPlan(Base):
+    """
+    A user's saved multi-day plan. `state` holds the per-day picks of the
+    planner (JSON) so a pantry or day edit only re-plans the days it affects.
+    """
+    __tablename__ = "meal_plans"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, unique=True, index=True, nullable=False)
+    goal = Column(String(16), nullable=False, default="maintain")
+    days = Column(Integer, nullable=False)
+    daily_calories = Column(Float, nullable=False)
+    signature = Column(String(64), nullable=False)  # pantry items + nutrients the plan was built on
+    quantities = Column(Text, nullable=False)  # JSON list, per pantry item, at planning time
+    locks = Column(Text, nullable=True)  # JSON {day: [{"fdc_id", "grams"}]} user-fixed days
+    state = Column(Text, nullable=False)  # JSON list of planned days
+    consumed = Column(Text, nullable=True)  # JSON {day: rendered day} of accepted (eaten) days
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
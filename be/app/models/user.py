@@ -1,17 +1,17 @@
 from sqlalchemy import Column, Integer, String
-from app.db.base_class import Base
+from app.db.base import Base
 
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
-    full_name = Column(String, nullable=False)
+    email = Column(String(255), unique=True, index=True, nullable=False)
+    full_name = Column(String(255), nullable=False)
     age = Column(Integer, nullable=True)
-    gender = Column(String, nullable=True)
+    gender = Column(String(16), nullable=True)
     height_cm = Column(Integer, nullable=True)
     weight_kg = Column(Integer, nullable=True)
-    activity_level = Column(String, nullable=True)
+    activity_level = Column(String(32), nullable=True)
 
     # Remove or comment out:
     # hashed_password = Column(String, nullable=False)
@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from app.services.meal_plans import MAX_PLAN_DAYS
+
+
+class BatchPlanRequest(BaseModel):
+    # None keeps each user's saved plan settings
+    goal: Optional[str] = None
+    days: Optional[int] = Field(None, ge=1, le=MAX_PLAN_DAYS)
+    user_ids: Optional[List[int]] = None  # default: every user
+    workers: Optional[int] = Field(None, ge=0)
+    chunk_size: Optional[int] = Field(None, ge=1, le=10000)
@@ -1,12 +1,13 @@
-from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class PantryItemCreate(BaseModel):
     user_id: int
-    fdc_id: int
+    fdc_id: int = Field(..., gt=0)
     description: str
     category: Optional[str] = None
-    quantity: float = 1.0
+    quantity: float = Field(1.0, ge=0)
     unit_name: str = "unit"
 
 class PantryItemOut(BaseModel):
@@ -17,6 +18,45 @@ class PantryItemOut(BaseModel):
     category: Optional[str]
     quantity: float
     unit_name: str
+    enrichment_status: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class PantryItemFields(BaseModel):
+    """PantryItemOut restricted to the fields picked with GET /pantry?fields=... (the others are left out)."""
+    id: Optional[int]
+    user_id: Optional[int]
+    fdc_id: Optional[int]
+    description: Optional[str]
+    category: Optional[str]
+    quantity: Optional[float]
+    unit_name: Optional[str]
+    enrichment_status: Optional[str]
+
+class PantryItemUpdate(BaseModel):
+    quantity: Optional[float] = Field(None, ge=0)
+    unit_name: Optional[str] = None
+
+class PlanDayItem(BaseModel):
+    fdc_id: int
+    grams: float
+
+class PlanDayUpdate(BaseModel):
+    items: List[PlanDayItem]
+
+class StockChange(BaseModel):
+    kind: str = Field(..., regex="^(restock|consume)$")
+    quantity: float = Field(..., gt=0)  # in the item's units
+
+class PantryEventOut(BaseModel):
+    id: int
+    item_id: int
+    fdc_id: int
+    kind: str
+    quantity: float
+    plan_day: Optional[int] = None
+    created_at: datetime
 
     class Config:
         orm_mode = True
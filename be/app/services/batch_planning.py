@@ -0,0 +1,284 @@
+# app/services/batch_planning.py
+"""
+Re-plan every user's saved plan (see meal_plans) in one batch instead of one
+/pantry/plan request per user, e.g. from a nightly job
+(`python -m app.cli plan-all`) or POST /admin/batch-plans.
+
+The parent process streams user ids in id-ordered chunks. For each chunk it
+finds the foods in those pantries that have no stored snapshot yet and looks
+them up in USDA with one deduplicated call, remembering the outcome for the
+rest of the run, so every fdc_id is fetched at most once. It then splits the
+chunk into slices for a process pool. Each worker reads its slice's users,
+pantries, saved plans and snapshots with a few IN queries, computes the
+nutrition targets and plans, and writes the plans with one bulk UPDATE and
+one bulk INSERT. DB reads, planning and writes all run in the workers, and
+the parent prepares the next chunk meanwhile. Throughput therefore grows
+with the number of workers until the database becomes the bottleneck.
+"""
+import os
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db.session import SessionLocal, dispose_inherited_engine
+from app.models.food import FoodSnapshot
+from app.models.pantry import PantryItem
+from app.models.plan import MealPlan
+from app.models.user import User
+from app.services.food_snapshots import load_snapshots, upsert_snapshots
+from app.services.meal_plans import MAX_PLAN_DAYS, PLAN_FIELDS, replan
+from app.services.nutrition_matrix import PantryMatrix
+from app.services.pyhealthify import nutrition_profile_from_user, profile_from_user
+
+DEFAULT_DAYS = 7
+MAX_ERRORS_REPORTED = 20
+
+# the pantry row fields the planner reads
+PantryRow = namedtuple("PantryRow", "id fdc_id description quantity")
+
+
+# -------------------------
+# Worker side
+# -------------------------
+def _plan_user(user, pantry: List[PantryRow], saved: Optional[dict], nutrients: Dict[int, dict],
+               goal: str, days: int) -> dict:
+    """Targets from the profile, then replan() the saved plan on the foods with known nutrients."""
+    try:
+        targets = nutrition_profile_from_user(profile_from_user(user), goal=goal)
+        covered = [p for p in pantry if p.fdc_id in nutrients]
+        if not covered:
+            return {"user_id": user.id, "status": "no_foods"}
+        matrix = PantryMatrix.from_nutrients(covered, nutrients)
+        fields, _entries, _avail, replanned = replan(saved, covered, matrix, targets["nutrition"]["calories"],
+                                                     days, goal)
+    except Exception as e:
+        return {"user_id": user.id, "status": "error", "error": f"{type(e).__name__}: {e}"}
+    return {"user_id": user.id, "status": "planned", "fields": fields, "replanned": replanned,
+            "partial": len(covered) < len(pantry)}
+
+
+def _write_plans(db: Session, planned: List[dict]):
+    now = datetime.utcnow()
+    # plan ids read just before writing, so plans created meanwhile are updated rather than duplicated
+    existing = dict(db.execute(select(MealPlan.user_id, MealPlan.id)
+                               .where(MealPlan.user_id.in_([r["user_id"] for r in planned]))).all())
+    updates = [dict(r["fields"], id=existing[r["user_id"]], updated_at=now)
+               for r in planned if r["user_id"] in existing]
+    inserts = [dict(r["fields"], user_id=r["user_id"], updated_at=now)
+               for r in planned if r["user_id"] not in existing]
+    if updates:
+        db.execute(update(MealPlan), updates)
+    if inserts:
+        db.execute(insert(MealPlan), inserts)
+    db.commit()
+
+
+def plan_users(user_ids: List[int], goal: Optional[str], days: Optional[int]) -> List[dict]:
+    """
+    Plan and save a slice of users (runs in a pool worker). `goal`/`days`
+    default to each user's saved plan settings. Returns one outcome per user
+    (without the plan itself).
+    """
+    db = SessionLocal()
+    try:
+        users = db.execute(select(User.id, User.weight_kg, User.height_cm, User.age, User.gender,
+                                  User.activity_level).where(User.id.in_(user_ids))).all()
+        pantries = defaultdict(list)
+        # same order as _load_pantry: saved plans refer to pantry rows by position
+        for row in db.execute(select(PantryItem.user_id, PantryItem.id, PantryItem.fdc_id, PantryItem.description,
+                                     PantryItem.quantity).where(PantryItem.user_id.in_(user_ids))
+                              .order_by(PantryItem.user_id, PantryItem.id)):
+            pantries[row.user_id].append(PantryRow(*row[1:]))
+        saved = {
+            row.user_id: dict(zip(PLAN_FIELDS, row[1:]))
+            for row in db.execute(select(MealPlan.user_id, *(getattr(MealPlan, f) for f in PLAN_FIELDS))
+                                  .where(MealPlan.user_id.in_(user_ids)))
+        }
+        nutrients, _missing, _stale = load_snapshots(db, {p.fdc_id for rows in pantries.values() for p in rows})
+
+        results = []
+        for user in users:
+            pantry = pantries.get(user.id)
+            if not pantry:
+                results.append({"user_id": user.id, "status": "empty"})
+                continue
+            plan = saved.get(user.id)
+            results.append(_plan_user(
+                user, pantry, plan, nutrients,
+                goal or (plan["goal"] if plan else "maintain"),
+                min(days or (plan["days"] if plan else DEFAULT_DAYS), MAX_PLAN_DAYS),
+            ))
+        planned = [r for r in results if r["status"] == "planned"]
+        if planned:
+            _write_plans(db, planned)
+        for r in planned:
+            del r["fields"]
+        return results
+    finally:
+        db.close()
+
+
+# -------------------------
+# Parent side
+# -------------------------
+class _FoodResolver:
+    """Fetches and snapshots foods no pantry row has a snapshot for yet; each fdc_id once per run."""
+
+    def __init__(self, db: Session, usda_client):
+        self.db = db
+        self.usda_client = usda_client
+        self.seen = set()
+        self.usda_lookups = 0
+        self.unresolved = 0  # unknown to USDA or unavailable
+
+    def resolve(self, user_ids: List[int]):
+        unsnapshotted = self.db.execute(
+            select(PantryItem.fdc_id).distinct()
+            .where(PantryItem.user_id.in_(user_ids))
+            .where(PantryItem.fdc_id.not_in(select(FoodSnapshot.fdc_id)))
+        ).scalars().all()
+        wanted = [i for i in unsnapshotted if i not in self.seen]
+        if not wanted:
+            return
+        self.seen.update(wanted)
+        # ids USDA can't have (rows stored before fdc_id was validated) would fail the whole lookup
+        valid = [i for i in wanted if i > 0]
+        self.unresolved += len(wanted) - len(valid)
+        if not valid:
+            return
+        self.usda_lookups += len(valid)
+        foods, _failed = self.usda_client.get_foods_partial(valid)
+        upsert_snapshots(self.db, foods)
+        self.unresolved += len(valid) - len(foods)
+
+
+def _user_id_chunks(db: Session, chunk_size: int, user_ids: Optional[List[int]]) -> Iterator[List[int]]:
+    last_id = 0
+    while True:
+        q = select(User.id).where(User.id > last_id)
+        if user_ids:
+            q = q.where(User.id.in_(user_ids))
+        ids = db.execute(q.order_by(User.id).limit(chunk_size)).scalars().all()
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield ids
+
+
+def _init_worker():
+    dispose_inherited_engine()
+
+
+def run_batch(goal: Optional[str] = None, days: Optional[int] = None, user_ids: Optional[List[int]] = None,
+              workers: Optional[int] = None, chunk_size: Optional[int] = None, mp_context: Optional[str] = None,
+              usda_client=None, progress=None) -> dict:
+    """
+    Re-plan the saved plans of all users (or `user_ids`) with a non-empty
+    pantry. `goal`/`days` default to each user's saved plan settings
+    ("maintain", DEFAULT_DAYS for users without one). `workers=0` plans in
+    this process. `progress(stats)` is called after every chunk.
+    Returns run statistics.
+    """
+    from app.services.usda_client import get_usda_client
+
+    workers = settings.BATCH_PLAN_WORKERS if workers is None else workers
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunk_size = chunk_size or settings.BATCH_PLAN_CHUNK_SIZE
+    stats: Counter = Counter()
+    errors: list = []
+    started = time.perf_counter()
+
+    def collect(slices):
+        for results in slices:
+            for r in results:
+                stats["users"] += 1
+                stats[r["status"]] += 1
+                if r["status"] == "planned":
+                    stats["partial"] += r["partial"]
+                    stats["replanned_days"] += r["replanned"]
+                elif r["status"] == "error" and len(errors) < MAX_ERRORS_REPORTED:
+                    errors.append({"user_id": r["user_id"], "error": r["error"]})
+        if progress is not None:
+            progress(dict(stats))
+
+    db = SessionLocal()
+    pool = None
+    try:
+        resolver = _FoodResolver(db, usda_client if usda_client is not None else get_usda_client())
+        if workers > 0:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       mp_context=get_context(mp_context) if mp_context else None)
+        pending = None
+        for ids in _user_id_chunks(db, chunk_size, user_ids):
+            resolver.resolve(ids)
+            db.commit()  # end the read transaction so workers see fresh snapshots and plans
+            if pool is not None:
+                # several slices per worker so uneven pantries balance out
+                step = max(1, -(-len(ids) // (workers * 4)))
+                slices = [ids[i:i + step] for i in range(0, len(ids), step)]
+                batch = pool.map(plan_users, slices, [goal] * len(slices), [days] * len(slices))
+            else:
+                batch = [plan_users(ids, goal, days)]
+            if pending is not None:
+                collect(pending)
+            pending = batch
+        if pending is not None:
+            collect(pending)
+        stats["usda_lookups"] = resolver.usda_lookups
+        stats["usda_unresolved"] = resolver.unresolved
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        db.close()
+    elapsed = time.perf_counter() - started
+    out = dict(stats)
+    out.update({"workers": workers, "seconds": round(elapsed, 2),
+                "users_per_sec": round(stats["users"] / elapsed, 1) if elapsed else None, "errors": errors})
+    return out
+
+
+# -------------------------
+# Background jobs (admin endpoint)
+# -------------------------
+_jobs: Dict[int, dict] = {}
+_jobs_lock = threading.Lock()
+
+
+def start_job(**kwargs) -> Optional[dict]:
+    """Run run_batch in a background thread; None while another job of this process is still running."""
+    with _jobs_lock:
+        if any(j["status"] == "running" for j in _jobs.values()):
+            return None
+        job = {"id": len(_jobs) + 1, "status": "running", "started_at": datetime.utcnow().isoformat(),
+               "params": kwargs, "progress": {}, "result": None}
+        _jobs[job["id"]] = job
+
+    def progress(stats):
+        job["progress"] = stats
+
+    def run():
+        try:
+            # spawned workers: forking a multi-threaded server process can copy held locks into the children
+            job["result"] = run_batch(mp_context="spawn", progress=progress, **kwargs)
+            job["status"] = "done"
+        except Exception:
+            job["result"] = {"error": traceback.format_exc(limit=5)}
+            job["status"] = "failed"
+        job["finished_at"] = datetime.utcnow().isoformat()
+
+    threading.Thread(target=run, name=f"batch-plan-{job['id']}", daemon=True).start()
+    return job
+
+
+def get_job(job_id: int) -> Optional[dict]:
+    return _jobs.get(job_id)
@@ -0,0 +1,395 @@
+# app/services/cache.py
+"""
+Pluggable key/value caches used by the USDA client (and anything else that
+wants TTL caching of JSON-serializable values).
+
+Every backend exposes the same small interface:
+    get(key, allow_stale=True, count=True) -> (value, is_stale)   value is None on a miss
+    get_raw(...)                               -> (JSON bytes, is_stale), for pass-through responses
+    set(key, value, ttl=None)
+    delete(key) / clear() / stats()
+
+Entries carry their own TTL plus a "stale window": after the TTL expires the
+value may still be served (flagged as stale) until the window closes, so the
+caller can return it immediately and revalidate in the background.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from app.config import settings
+from app.utils import fastjson
+
+
+def _sizeof(value: Any) -> int:
+    try:
+        return len(fastjson.dumps(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+class BaseCache:
+    def __init__(self, default_ttl: float = 3600, stale_ttl: float = 0):
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _count(self, field: str, n: int = 1, count: bool = True):
+        if not count:
+            return
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def _deadlines(self, ttl: Optional[float]) -> Tuple[float, float]:
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        return expires_at, expires_at + self.stale_ttl
+
+    def get(self, key: str, allow_stale: bool = True, count: bool = True) -> Tuple[Optional[Any], bool]:
+        """`count=False` is for speculative probes that should not skew hit/miss counters."""
+        raise NotImplementedError
+
+    def get_raw(self, key: str, allow_stale: bool = True, count: bool = True) -> Tuple[Optional[bytes], bool]:
+        """Like get(), but the value serialized as JSON; backends override it to skip the re-encode."""
+        value, stale = self.get(key, allow_stale=allow_stale, count=count)
+        return (None, False) if value is None else (fastjson.dumps(value), stale)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "entries": len(self),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class MemoryCache(BaseCache):
+    """
+    In-process LRU bounded by number of entries and (approximate) serialized size.
+    The JSON form of an entry is built on its first get_raw() and kept with it.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 default_ttl: float = 3600, stale_ttl: float = 0):
+        super().__init__(default_ttl, stale_ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, allow_stale, count) -> Tuple[Optional[list], bool]:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                _value, expires_at, stale_until, size, _raw = entry
+                if now <= expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += count
+                    return entry, False
+                if now <= stale_until:
+                    if allow_stale:
+                        self._data.move_to_end(key)
+                        self.stale_hits += count
+                        return entry, True
+                else:
+                    self._data.pop(key)
+                    self._bytes -= size
+            self.misses += count
+        return None, False
+
+    def get(self, key, allow_stale=True, count=True):
+        entry, stale = self._lookup(key, allow_stale, count)
+        return (None, False) if entry is None else (entry[0], stale)
+
+    def get_raw(self, key, allow_stale=True, count=True):
+        entry, stale = self._lookup(key, allow_stale, count)
+        if entry is None:
+            return None, False
+        raw = entry[4]
+        if raw is None:
+            # encoded outside the lock; a racing reader at worst encodes the same value twice
+            raw = entry[4] = fastjson.dumps(entry[0])
+        return raw, stale
+
+    def set(self, key, value, ttl=None):
+        expires_at, stale_until = self._deadlines(ttl)
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[3]
+            self._data[key] = [value, expires_at, stale_until, size, None]
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _k, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted[3]
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[3]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        out = super().stats()
+        out.update({"bytes": self._bytes, "max_entries": self.max_entries, "max_bytes": self.max_bytes})
+        return out
+
+
+class SQLiteCache(BaseCache):
+    """
+    On-disk cache shared by every process pointing at the same file (e.g. all
+    uvicorn workers), and surviving restarts. Uses WAL so readers don't block
+    the writer. Eviction is approximately-LRU on `accessed_at`, which is only
+    refreshed when it is older than `touch_interval` to keep reads cheap.
+
+    Writes don't count the table: each process keeps a running estimate of
+    entries and bytes (counting its own writes), and only measures the table
+    when the estimate reaches the limits or every `check_every` writes, which
+    picks up what other processes wrote.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, max_bytes: int = 512 * 1024 * 1024,
+                 default_ttl: float = 3600, stale_ttl: float = 0, touch_interval: float = 60,
+                 check_every: int = 100):
+        super().__init__(default_ttl, stale_ttl)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.check_every = check_every
+        self._local = threading.local()
+        self._size_lock = threading.Lock()
+        self._estimate: Optional[list] = None  # [entries, bytes] as of the last measure, plus writes since
+        self._unchecked = 0  # writes since the table was last measured
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL,"
+            " stale_until REAL NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _lookup(self, key, allow_stale, count) -> Tuple[Optional[str], bool]:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at, stale_until, accessed_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._count("misses", count=count)
+            return None, False
+        raw, expires_at, stale_until, accessed_at = row
+        if now > stale_until:
+            conn.execute("DELETE FROM cache WHERE key = ? AND stale_until < ?", (key, now))
+            self._count("misses", count=count)
+            return None, False
+        stale = now > expires_at
+        if stale and not allow_stale:
+            self._count("misses", count=count)
+            return None, False
+        if now - accessed_at > self.touch_interval:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count("stale_hits" if stale else "hits", count=count)
+        return raw, stale
+
+    def get(self, key, allow_stale=True, count=True):
+        raw, stale = self._lookup(key, allow_stale, count)
+        return (None, False) if raw is None else (fastjson.loads(raw), stale)
+
+    def get_raw(self, key, allow_stale=True, count=True):
+        # stored as JSON text already
+        raw, stale = self._lookup(key, allow_stale, count)
+        return (None, False) if raw is None else (raw.encode(), stale)
+
+    def set(self, key, value, ttl=None):
+        expires_at, stale_until = self._deadlines(ttl)
+        raw = fastjson.dumps(value).decode()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, stale_until, size, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, raw, expires_at, stale_until, len(raw), time.time()),
+        )
+        with self._size_lock:
+            self._unchecked += 1
+            if self._estimate is not None:
+                # a replaced key is counted again: the estimate only errs towards measuring early
+                self._estimate[0] += 1
+                self._estimate[1] += len(raw)
+            check = (self._estimate is None or self._unchecked >= self.check_every
+                     or self._estimate[0] > self.max_entries or self._estimate[1] > self.max_bytes)
+        if check:
+            self._evict(conn)
+
+    def _measure(self, conn: sqlite3.Connection) -> Tuple[int, int]:
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        with self._size_lock:
+            self._estimate = [count, total]
+            self._unchecked = 0
+        return count, total
+
+    def _evict(self, conn: sqlite3.Connection):
+        count, total = self._measure(conn)
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        if conn.execute("DELETE FROM cache WHERE stale_until < ?", (time.time(),)).rowcount:
+            count, total = self._measure(conn)
+        # drop least recently used rows in batches until we are back under 90% of the limits
+        while count > 0 and (count > self.max_entries * 0.9 or total > self.max_bytes * 0.9):
+            batch = max(1, count // 10)
+            removed = conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)", (batch,)
+            ).rowcount
+            if not removed:
+                break
+            self._count("evictions", removed)
+            count, total = self._measure(conn)
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+        with self._size_lock:
+            self._estimate = [0, 0]
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class TieredCache(BaseCache):
+    """
+    Memory LRU in front of a shared store: hot keys are served from the process,
+    everything else from the shared file, and misses populate both.
+    """
+
+    def __init__(self, l1: BaseCache, l2: BaseCache):
+        super().__init__(l2.default_ttl, l2.stale_ttl)
+        self.l1 = l1
+        self.l2 = l2
+
+    def get(self, key, allow_stale=True, count=True):
+        value, stale = self.l1.get(key, allow_stale=False, count=count)
+        if value is not None:
+            self._count("hits", count=count)
+            return value, False
+        value, stale = self.l2.get(key, allow_stale=allow_stale, count=count)
+        if value is None:
+            self._count("misses", count=count)
+            return None, False
+        if not stale:
+            self.l1.set(key, value)
+        self._count("stale_hits" if stale else "hits", count=count)
+        return value, stale
+
+    def get_raw(self, key, allow_stale=True, count=True):
+        raw, stale = self.l1.get_raw(key, allow_stale=False, count=count)
+        if raw is not None:
+            self._count("hits", count=count)
+            return raw, False
+        raw, stale = self.l2.get_raw(key, allow_stale=allow_stale, count=count)
+        if raw is None:
+            self._count("misses", count=count)
+            return None, False
+        if not stale:
+            self.l1.set(key, fastjson.loads(raw))
+        self._count("stale_hits" if stale else "hits", count=count)
+        return raw, stale
+
+    def set(self, key, value, ttl=None):
+        self.l1.set(key, value, ttl)
+        self.l2.set(key, value, ttl)
+
+    def delete(self, key):
+        self.l1.delete(key)
+        self.l2.delete(key)
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def __len__(self):
+        return len(self.l2)
+
+    def stats(self):
+        out = super().stats()
+        out.update({"l1": self.l1.stats(), "l2": self.l2.stats()})
+        return out
+
+
+def build_cache(backend: str, prefix: str = "USDA_CACHE") -> BaseCache:
+    """
+    Build a cache from settings. `prefix` selects the settings group, e.g.
+    USDA_CACHE_TTL / USDA_CACHE_STALE_TTL / USDA_CACHE_MAX_ENTRIES ..., and
+    the sqlite tier's USDA_CACHE_PATH / USDA_CACHE_DISK_MAX_ENTRIES / ...
+    """
+    ttl = getattr(settings, f"{prefix}_TTL")
+    stale_ttl = getattr(settings, f"{prefix}_STALE_TTL")
+    max_entries = getattr(settings, f"{prefix}_MAX_ENTRIES")
+    max_bytes = getattr(settings, f"{prefix}_MAX_BYTES")
+    backend = (backend or "memory").lower()
+
+    def memory():
+        return MemoryCache(max_entries=max_entries, max_bytes=max_bytes, default_ttl=ttl, stale_ttl=stale_ttl)
+
+    def sqlite():
+        return SQLiteCache(getattr(settings, f"{prefix}_PATH"),
+                           max_entries=getattr(settings, f"{prefix}_DISK_MAX_ENTRIES"),
+                           max_bytes=getattr(settings, f"{prefix}_DISK_MAX_BYTES"),
+                           default_ttl=ttl, stale_ttl=stale_ttl)
+
+    if backend == "memory":
+        return memory()
+    if backend == "sqlite":
+        return sqlite()
+    if backend == "tiered":
+        return TieredCache(memory(), sqlite())
+    raise ValueError(f"Unknown cache backend: {backend}")
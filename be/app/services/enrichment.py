@@ -0,0 +1,263 @@
+# app/services/enrichment.py
+"""
+Background USDA enrichment of pantry items.
+
+Pantry writes commit straight away with what the user sent
+(enrichment_status="pending") and queue one EnrichmentJob per fdc_id. A
+worker thread in each app process claims due jobs in batches (an
+UPDATE ... WHERE status = 'pending' per job, so several processes can share
+the table), looks the foods up with one batched USDA call on a bounded thread
+pool, then writes the nutrient snapshot and copies description, category and
+the snapshot (JSON in `extra`) onto every pending item with that fdc_id.
+USDA errors are retried with jittered exponential backoff up to
+ENRICHMENT_MAX_ATTEMPTS; foods USDA doesn't know fail immediately. Jobs left
+"running" by a crashed process are reclaimed after ENRICHMENT_LOCK_TIMEOUT.
+"""
+import json
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db.insert import insert_ignore
+from app.db.session import SessionLocal
+from app.models.enrichment import EnrichmentJob
+from app.models.food import FoodSnapshot
+from app.models.pantry import PantryItem
+from app.services import pantry_search
+from app.services.food_snapshots import upsert_snapshots
+from app.services.pantry_versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20  # one USDA /foods chunk
+
+
+def snapshot_fields(snap: FoodSnapshot) -> dict:
+    """Pantry item columns filled in from a food snapshot."""
+    fields = {
+        "extra": json.dumps(dict(snap.to_nutrients(), updated_at=snap.updated_at.isoformat())),
+        "enrichment_status": "done",
+    }
+    if snap.description:
+        fields["description"] = snap.description
+    if snap.category:
+        fields["category"] = snap.category
+    return fields
+
+
+def enqueue(db: Session, fdc_ids: Iterable[int]):
+    """Queue enrichment for these foods in the caller's transaction (idempotent per fdc_id)."""
+    ids = sorted(set(fdc_ids))
+    if not ids:
+        return
+    now = datetime.utcnow()
+    # concurrent writers may queue the same food: ignore duplicates instead of failing their insert
+    insert_ignore(db, EnrichmentJob, [{"fdc_id": i, "status": "pending", "attempts": 0, "next_attempt_at": now,
+                                       "updated_at": now} for i in ids])
+    # finished jobs are re-armed for the new items, and so are running ones: their batch may have read the
+    # items before these were committed, and run() only finishes jobs that are still "running"
+    db.query(EnrichmentJob).filter(EnrichmentJob.fdc_id.in_(ids), EnrichmentJob.status != "pending").update(
+        {EnrichmentJob.status: "pending", EnrichmentJob.attempts: 0, EnrichmentJob.next_attempt_at: now,
+         EnrichmentJob.last_error: None, EnrichmentJob.updated_at: now},
+        synchronize_session=False,
+    )
+
+
+def _finish_items(db: Session, fdc_ids: List[int], snapshots: Dict[int, FoodSnapshot]) -> Set[int]:
+    """Enrich (or mark failed, when there is no snapshot) the unfinished items; returns the users touched."""
+    users = set()
+    items = db.query(PantryItem).filter(PantryItem.fdc_id.in_(fdc_ids), PantryItem.enrichment_status != "done")
+    for item in items:
+        snap = snapshots.get(item.fdc_id)
+        if snap is None:
+            item.enrichment_status = "failed"
+        else:
+            for key, value in snapshot_fields(snap).items():
+                setattr(item, key, value)
+        users.add(item.user_id)
+    for user_id in users:
+        bump_version(db, user_id)
+    return users
+
+
+def _finish_jobs(db: Session, fdc_ids: List[int], values: dict) -> int:
+    """Update the jobs still running; those re-armed by enqueue() meanwhile stay pending for another run."""
+    return db.query(EnrichmentJob).filter(EnrichmentJob.fdc_id.in_(fdc_ids), EnrichmentJob.status == "running").update(
+        values, synchronize_session=False
+    )
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(settings.ENRICHMENT_BACKOFF_MAX, settings.ENRICHMENT_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.5)
+
+
+class EnrichmentWorker:
+    def __init__(self, client=None, workers: Optional[int] = None, poll_interval: Optional[float] = None):
+        self._client = client
+        self.workers = workers or settings.ENRICHMENT_WORKERS
+        self.poll_interval = poll_interval if poll_interval is not None else settings.ENRICHMENT_POLL_INTERVAL
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.Semaphore(self.workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from app.services.usda_client import get_usda_client
+            self._client = get_usda_client()
+        return self._client
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="enrichment")
+        self._thread = threading.Thread(target=self._loop, name="enrichment-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self._pool.shutdown(wait=wait)
+        self._pool = None
+
+    def notify(self):
+        """New jobs were committed: claim now instead of at the next poll."""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._slots.acquire()
+            try:
+                claimed = self.claim(BATCH_SIZE)
+            except Exception:
+                logger.exception("enrichment: claiming jobs failed")
+                claimed = []
+            if claimed:
+                self._pool.submit(self._run_slot, claimed)
+                continue
+            self._slots.release()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _run_slot(self, fdc_ids: List[int]):
+        try:
+            self.run(fdc_ids)
+        except Exception:
+            logger.exception("enrichment: batch %s failed", fdc_ids)
+        finally:
+            self._slots.release()
+
+    def claim(self, limit: int) -> List[int]:
+        """Mark up to `limit` due jobs as running for this process; returns their fdc_ids."""
+        now = datetime.utcnow()
+        abandoned = now - timedelta(seconds=settings.ENRICHMENT_LOCK_TIMEOUT)
+        claimable = or_(
+            and_(EnrichmentJob.status == "pending", EnrichmentJob.next_attempt_at <= now),
+            and_(EnrichmentJob.status == "running", EnrichmentJob.updated_at < abandoned),
+        )
+        db = SessionLocal()
+        try:
+            due = [row[0] for row in db.query(EnrichmentJob.fdc_id).filter(claimable)
+                   .order_by(EnrichmentJob.next_attempt_at).limit(limit)]
+            claimed = []
+            for fdc_id in due:
+                won = db.query(EnrichmentJob).filter(EnrichmentJob.fdc_id == fdc_id, claimable).update(
+                    {EnrichmentJob.status: "running", EnrichmentJob.updated_at: now}, synchronize_session=False
+                )
+                if won:
+                    claimed.append(fdc_id)
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def run(self, fdc_ids: List[int]):
+        """Enrich one claimed batch."""
+        # ids USDA can't have fail on their own instead of failing the lookup of the whole batch
+        invalid = [i for i in fdc_ids if i <= 0]
+        valid = [i for i in fdc_ids if i > 0]
+        foods = {}
+        if valid:
+            try:
+                foods = self.client.get_foods(valid)
+            except Exception as e:
+                self._retry(valid, e)
+                fdc_ids = invalid
+                if not fdc_ids:
+                    return
+        db = SessionLocal()
+        try:
+            snapshots = upsert_snapshots(db, foods, commit=False)
+            users = _finish_items(db, fdc_ids, snapshots)
+            missing = [i for i in fdc_ids if i not in foods and i > 0]
+            now = datetime.utcnow()
+            outcomes = [([i for i in fdc_ids if i in foods], "done", None),
+                        (missing, "failed", "Food not found in USDA")]
+            outcomes += [([i], "failed", f"Invalid FDC ID: {i}") for i in fdc_ids if i <= 0]
+            for ids, status, error in outcomes:
+                if ids:
+                    _finish_jobs(db, ids, {EnrichmentJob.status: status, EnrichmentJob.last_error: error,
+                                           EnrichmentJob.attempts: EnrichmentJob.attempts + 1,
+                                           EnrichmentJob.updated_at: now})
+            db.commit()
+        finally:
+            db.close()
+        if missing:
+            logger.info("enrichment: fdc_ids not found in USDA: %s", missing)
+        for user_id in users:
+            pantry_search.evict(user_id)
+
+    def _retry(self, fdc_ids: List[int], error: Exception):
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            exhausted = []
+            jobs = db.query(EnrichmentJob.fdc_id, EnrichmentJob.attempts).filter(
+                EnrichmentJob.fdc_id.in_(fdc_ids), EnrichmentJob.status == "running"
+            ).all()
+            for fdc_id, attempts in jobs:
+                attempts += 1
+                values = {EnrichmentJob.attempts: attempts, EnrichmentJob.last_error: str(error)[:1000],
+                          EnrichmentJob.updated_at: now}
+                if attempts >= settings.ENRICHMENT_MAX_ATTEMPTS:
+                    values[EnrichmentJob.status] = "failed"
+                else:
+                    values[EnrichmentJob.status] = "pending"
+                    values[EnrichmentJob.next_attempt_at] = now + timedelta(seconds=_backoff(attempts))
+                if _finish_jobs(db, [fdc_id], values) and attempts >= settings.ENRICHMENT_MAX_ATTEMPTS:
+                    exhausted.append(fdc_id)
+            if exhausted:
+                _finish_items(db, exhausted, {})
+            db.commit()
+        finally:
+            db.close()
+        logger.warning("enrichment: USDA lookup for %s failed (%s); will retry", fdc_ids, error)
+
+
+_worker: Optional[EnrichmentWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_enrichment_worker() -> EnrichmentWorker:
+    """Process-wide worker; started/stopped by the app lifespan."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = EnrichmentWorker()
+    return _worker
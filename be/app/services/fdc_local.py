@@ -0,0 +1,245 @@
+# app/services/fdc_local.py
+"""
+Local FoodData Central store: an SQLite database (FTS5 full-text index on
+descriptions) loaded from the FDC download files, so searches and lookups can
+be answered without calling api.nal.usda.gov.
+
+Supported inputs for `import_fdc_dump`:
+  - FDC JSON downloads ({"FoundationFoods": [...]}, {"SRLegacyFoods": [...]},
+    {"BrandedFoods": [...]}, ...) or a plain JSON list of food records
+    (e.g. fe/public/data/foods.json)
+  - an FDC CSV download directory (food.csv, nutrient.csv, food_nutrient.csv,
+    optional food_category.csv / food_portion.csv)
+"""
+import csv
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from app.services.nutrients import nutrients_dict, parse_nutrients
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS foods (
+    fdc_id INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    data_type TEXT,
+    category TEXT,
+    calories REAL,
+    protein_g REAL,
+    fat_g REAL,
+    carbs_g REAL,
+    portion_gram REAL,
+    raw TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS foods_fts USING fts5(
+    description, category,
+    content='foods', content_rowid='fdc_id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS foods_ai AFTER INSERT ON foods BEGIN
+    INSERT INTO foods_fts (rowid, description, category) VALUES (new.fdc_id, new.description, new.category);
+END;
+CREATE TRIGGER IF NOT EXISTS foods_ad AFTER DELETE ON foods BEGIN
+    INSERT INTO foods_fts (foods_fts, rowid, description, category) VALUES ('delete', old.fdc_id, old.description, old.category);
+END;
+"""
+
+
+def _category_name(food: dict) -> Optional[str]:
+    cat = food.get("foodCategory")
+    if isinstance(cat, dict):
+        return cat.get("description")
+    return cat or food.get("brandedFoodCategory")
+
+
+def _fts_query(query: str) -> Optional[str]:
+    # every token must match, as a prefix, so "chick bre" finds "Chicken breast"
+    tokens = ["".join(ch for ch in t if ch.isalnum()) for t in query.casefold().split()]
+    tokens = [t for t in tokens if t]
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+class LocalFoodStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def import_foods(self, foods: Iterable[dict], batch_size: int = 2000) -> int:
+        """Insert (or replace) food records; returns the number imported."""
+        conn = self._conn()
+        count = 0
+        batch = []
+
+        def flush():
+            ids = [(row[0],) for row in batch]
+            # delete first so the FTS delete trigger fires for replaced rows
+            conn.executemany("DELETE FROM foods WHERE fdc_id = ?", ids)
+            conn.executemany(
+                "INSERT INTO foods (fdc_id, description, data_type, category, calories, protein_g, fat_g,"
+                " carbs_g, portion_gram, raw) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            conn.commit()
+            batch.clear()
+
+        for food in foods:
+            fdc_id = food.get("fdcId")
+            if fdc_id is None or not food.get("description"):
+                continue
+            # not memoized: a dump is read once and would only evict the hot entries
+            n = nutrients_dict(*parse_nutrients(food))
+            batch.append((
+                int(fdc_id), food["description"], food.get("dataType"), _category_name(food),
+                n.get("calories"), n.get("protein_g"), n.get("fat_g"), n.get("carbs_g"), n.get("portion_gram"),
+                json.dumps(food, separators=(",", ":")),
+            ))
+            count += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        return count
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM foods").fetchone()[0]
+
+    def get_food(self, fdc_id: int) -> Optional[dict]:
+        row = self._conn().execute("SELECT raw FROM foods WHERE fdc_id = ?", (fdc_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_foods(self, fdc_ids: List[int]) -> Dict[int, dict]:
+        found = {}
+        conn = self._conn()
+        for i in range(0, len(fdc_ids), 500):
+            chunk = fdc_ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for fdc_id, raw in conn.execute(f"SELECT fdc_id, raw FROM foods WHERE fdc_id IN ({marks})", chunk):
+                found[fdc_id] = json.loads(raw)
+        return found
+
+    def search(self, query: str, page_size: int = 25, page_number: int = 1) -> Optional[dict]:
+        """
+        Full-text search in the FDC /foods/search response shape, best matches
+        first. Returns None when nothing matches so callers can fall back.
+        """
+        match = _fts_query(query)
+        if not match:
+            return None
+        conn = self._conn()
+        total = conn.execute("SELECT COUNT(*) FROM foods_fts WHERE foods_fts MATCH ?", (match,)).fetchone()[0]
+        if not total:
+            return None
+        rows = conn.execute(
+            "SELECT f.fdc_id, f.description, f.data_type, f.category, f.raw"
+            " FROM foods_fts JOIN foods f ON f.fdc_id = foods_fts.rowid"
+            " WHERE foods_fts MATCH ? ORDER BY bm25(foods_fts, 10.0, 1.0), length(f.description)"
+            " LIMIT ? OFFSET ?",
+            (match, page_size, max(0, page_number - 1) * page_size),
+        ).fetchall()
+        foods = []
+        for fdc_id, description, data_type, category, raw in rows:
+            foods.append({
+                "fdcId": fdc_id,
+                "description": description,
+                "dataType": data_type,
+                "foodCategory": category,
+                "foodNutrients": json.loads(raw).get("foodNutrients") or [],
+            })
+        return {
+            "totalHits": total,
+            "currentPage": page_number,
+            "totalPages": (total + page_size - 1) // page_size,
+            "foods": foods,
+        }
+
+
+# -------------------------
+# Dump readers
+# -------------------------
+def _iter_json_foods(path: str) -> Iterator[dict]:
+    with open(path, "rb") as fh:
+        data = json.load(fh)
+    if isinstance(data, list):
+        yield from data
+        return
+    for value in data.values():
+        if isinstance(value, list):
+            yield from value
+
+
+def _read_csv(directory: str, name: str) -> Iterator[dict]:
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return
+    with open(path, newline="", encoding="utf-8") as fh:
+        yield from csv.DictReader(fh)
+
+
+def _iter_csv_foods(directory: str) -> Iterator[dict]:
+    nutrients = {
+        row["id"]: {"id": int(row["id"]), "number": row.get("nutrient_nbr"), "name": row["name"],
+                    "unitName": row.get("unit_name")}
+        for row in _read_csv(directory, "nutrient.csv")
+    }
+    categories = {row["id"]: row["description"] for row in _read_csv(directory, "food_category.csv")}
+    food_nutrients: Dict[str, list] = {}
+    for row in _read_csv(directory, "food_nutrient.csv"):
+        nutrient = nutrients.get(row["nutrient_id"])
+        if nutrient is None or row.get("amount") in (None, ""):
+            continue
+        food_nutrients.setdefault(row["fdc_id"], []).append({"nutrient": nutrient, "amount": float(row["amount"])})
+    portions: Dict[str, list] = {}
+    for row in _read_csv(directory, "food_portion.csv"):
+        if row.get("gram_weight"):
+            portions.setdefault(row["fdc_id"], []).append({
+                "gramWeight": float(row["gram_weight"]),
+                "portionDescription": row.get("portion_description") or row.get("modifier"),
+            })
+    for row in _read_csv(directory, "food.csv"):
+        fdc_id = row["fdc_id"]
+        yield {
+            "fdcId": int(fdc_id),
+            "description": row["description"],
+            "dataType": row.get("data_type"),
+            "foodCategory": categories.get(row.get("food_category_id") or "", row.get("food_category_id") or None),
+            "foodNutrients": food_nutrients.get(fdc_id, []),
+            "foodPortions": portions.get(fdc_id, []),
+        }
+
+
+def import_fdc_dump(path: str, store: "LocalFoodStore") -> int:
+    """Import an FDC JSON file or CSV directory into `store`; returns the number of foods."""
+    if os.path.isdir(path):
+        return store.import_foods(_iter_csv_foods(path))
+    return store.import_foods(_iter_json_foods(path))
+
+
+_shared_store: Optional[LocalFoodStore] = None
+_shared_lock = threading.Lock()
+
+
+def get_local_store(path: Optional[str]) -> Optional[LocalFoodStore]:
+    """Process-wide store for the configured path (None when no local DB is configured)."""
+    global _shared_store
+    if not path:
+        return None
+    if _shared_store is None:
+        with _shared_lock:
+            if _shared_store is None:
+                _shared_store = LocalFoodStore(path)
+    return _shared_store
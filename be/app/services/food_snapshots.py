@@ -0,0 +1,98 @@
+# app/services/food_snapshots.py
+"""
+Per-fdc_id nutrient snapshots (FoodSnapshot rows) captured when pantry items
+are added, so aggregation and planning read the DB instead of USDA.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db.session import SessionLocal
+from app.models.food import FoodSnapshot
+from app.services.nutrients import MICRONUTRIENTS
+from app.services.nutrition_planner import extract_nutrients_from_usda
+from app.services.pantry_ledger import mark_foods_changed
+
+VALUE_FIELDS = ("calories", "protein_g", "fat_g", "carbs_g", "portion_gram")
+
+
+def _category_name(food: dict):
+    cat = food.get("foodCategory")
+    if isinstance(cat, dict):
+        return cat.get("description")
+    return cat
+
+
+def upsert_snapshots(db: Session, foods: Dict[int, dict], commit: bool = True) -> Dict[int, FoodSnapshot]:
+    """Create or refresh snapshots from full USDA records ({fdc_id: food})."""
+    if not foods:
+        return {}
+    existing = {s.fdc_id: s for s in db.query(FoodSnapshot).filter(FoodSnapshot.fdc_id.in_(list(foods)))}
+    now = datetime.utcnow()
+    out = {}
+    changed = []
+    for fdc_id, food in foods.items():
+        n = extract_nutrients_from_usda(food)
+        snap = existing.get(fdc_id)
+        if snap is None:
+            snap = FoodSnapshot(fdc_id=fdc_id)
+            db.add(snap)
+            changed.append(fdc_id)
+        elif any(getattr(snap, k) != n.get(k) for k in VALUE_FIELDS):
+            changed.append(fdc_id)
+        snap.description = (food.get("description") or "")[:512] or None
+        snap.category = (_category_name(food) or "")[:255] or None
+        snap.calories = n.get("calories")
+        snap.protein_g = n.get("protein_g")
+        snap.fat_g = n.get("fat_g")
+        snap.carbs_g = n.get("carbs_g")
+        snap.portion_gram = n.get("portion_gram")
+        micro = {k: n[k] for k in MICRONUTRIENTS if n.get(k) is not None}
+        snap.micronutrients = json.dumps(micro, separators=(",", ":")) if micro else None
+        snap.updated_at = now
+        out[fdc_id] = snap
+    # materialized pantry totals valued these foods with the old (or no) nutrients
+    mark_foods_changed(db, changed)
+    if commit:
+        db.commit()
+    return out
+
+
+def load_snapshots(db: Session, fdc_ids: Iterable[int]) -> Tuple[Dict[int, dict], List[int], List[int]]:
+    """
+    Return ({fdc_id: nutrients}, missing_ids, stale_ids). Stale snapshots are
+    still returned; callers refresh them in the background.
+    """
+    wanted = set(fdc_ids)
+    if not wanted:
+        return {}, [], []
+    cutoff = datetime.utcnow() - timedelta(days=settings.FOOD_SNAPSHOT_MAX_AGE_DAYS)
+    found = {}
+    stale = []
+    for snap in db.query(FoodSnapshot).filter(FoodSnapshot.fdc_id.in_(list(wanted))):
+        found[snap.fdc_id] = snap.to_nutrients()
+        if snap.updated_at < cutoff:
+            stale.append(snap.fdc_id)
+    missing = [i for i in wanted if i not in found]
+    return found, missing, stale
+
+
+def refresh_snapshots(fdc_ids: List[int]):
+    """Background task: re-fetch USDA records and rewrite their snapshots."""
+    from app.services.usda_client import get_usda_client
+
+    if not fdc_ids:
+        return
+    try:
+        foods = get_usda_client().get_foods(fdc_ids)
+    except Exception:
+        # keep the old snapshots; they'll be retried on a later request
+        return
+    db = SessionLocal()
+    try:
+        upsert_snapshots(db, foods)
+    finally:
+        db.close()
@@ -0,0 +1,248 @@
+# app/services/meal_optimizer.py
+"""
+Optimization-based planner: chooses whole portions of pantry items for every
+day of the horizon so each day lands on the calorie *and* protein/fat/carb
+targets (within a tolerance band) while the whole plan fits the available
+inventory; each day is then split into meals.
+
+The week is formulated jointly as an integer program over portion counts.
+Proving optimality of that program takes seconds for a couple of hundred
+items, so it is solved as its LP relaxation (HiGHS, milliseconds) followed by
+rounding down and a vectorized local search that adds/removes single portions
+per day while that reduces the weighted deviation. If SciPy is missing or the
+LP fails, the greedy planner is used instead.
+"""
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.nutrition_matrix import NUTRIENTS, PantryMatrix, plan_matrix
+from app.services.metrics import COMPUTE_SECONDS
+
+try:
+    from scipy.optimize import linprog
+    from scipy.sparse import coo_matrix, hstack, identity, kron
+except ImportError:  # optional: fall back to the greedy planner
+    linprog = None
+
+# relative weight of missing each target (calories matter most)
+WEIGHTS = {"calories": 4.0, "protein_g": 2.0, "fat_g": 1.0, "carbs_g": 1.0}
+IN_BAND_COST = 0.05  # deviation inside the tolerance band is almost free
+PORTION_COST = 1e-3  # tie-breaker: prefer fewer portions
+MAX_REPAIR_STEPS = 64  # single-portion moves per day during rounding repair
+
+
+def _targets(targets: dict) -> Dict[str, float]:
+    nutrition = targets.get("nutrition") or targets
+    out = {}
+    for k in NUTRIENTS:
+        v = nutrition.get(k)
+        out[k] = float(v) if v else 0.0
+    if not out["calories"]:
+        out["calories"] = 2000.0
+    return out
+
+
+def _split_meals(units: List[int], unit_cal: np.ndarray, meals_per_day: int) -> List[int]:
+    """Assign each portion to a meal, largest first into the lightest meal (balanced calories)."""
+    meals = [0.0] * max(1, meals_per_day)
+    assignment = [0] * len(units)
+    for pos in sorted(range(len(units)), key=lambda p: -unit_cal[units[p]]):
+        m = min(range(len(meals)), key=meals.__getitem__)
+        assignment[pos] = m
+        meals[m] += unit_cal[units[pos]]
+    return assignment
+
+
+def _penalty(residual: np.ndarray, band: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """Objective of the program for residual(s) T - A x (last axis = nutrients)."""
+    dev = np.abs(residual)
+    inside = np.minimum(dev, band)
+    return ((inside * IN_BAND_COST + (dev - inside)) * w).sum(axis=-1)
+
+
+def _repair_day(x: np.ndarray, per_unit: np.ndarray, T: np.ndarray, band: np.ndarray, w: np.ndarray,
+                stock: np.ndarray, cap: np.ndarray, deadline: float) -> np.ndarray:
+    """
+    Local search on one day's portion counts: apply the best single-portion
+    add, drop or swap (drop one item's portion, add another's) while it lowers
+    the day's penalty. Moves are scored for all items at once.
+    """
+    residual = T - x @ per_unit
+    current = _penalty(residual, band, w)
+    for _step in range(MAX_REPAIR_STEPS):
+        if time.perf_counter() > deadline:
+            break
+        can_add = (stock >= 1) & (x < cap)
+        can_drop = x >= 1
+        add = np.where(can_add, _penalty(residual[None, :] - per_unit, band, w) + PORTION_COST, np.inf)
+        drop = np.where(can_drop, _penalty(residual[None, :] + per_unit, band, w) - PORTION_COST, np.inf)
+        i_add, i_drop = int(np.argmin(add)), int(np.argmin(drop))
+        best = min(add[i_add], drop[i_drop])
+        move = ("add", i_add) if add[i_add] <= drop[i_drop] else ("drop", i_drop)
+        dropped = np.nonzero(can_drop)[0]
+        if len(dropped) and can_add.any():
+            # residual after dropping a portion of i and adding one of j: (drop, add, K)
+            swapped = residual[None, None, :] + per_unit[dropped][:, None, :] - per_unit[None, :, :]
+            swap = np.where(can_add[None, :], _penalty(swapped, band, w), np.inf)
+            swap[np.arange(len(dropped)), dropped] = np.inf
+            r, j = np.unravel_index(int(np.argmin(swap)), swap.shape)
+            if swap[r, j] < best:
+                best, move = swap[r, j], ("swap", (int(dropped[r]), int(j)))
+        if best >= current - 1e-9:
+            break
+        kind, arg = move
+        if kind == "swap":
+            i, j = arg
+            x[i] -= 1
+            stock[i] += 1
+            x[j] += 1
+            stock[j] -= 1
+            residual += per_unit[i] - per_unit[j]
+        elif kind == "add":
+            x[arg] += 1
+            stock[arg] -= 1
+            residual -= per_unit[arg]
+        else:
+            x[arg] -= 1
+            stock[arg] += 1
+            residual += per_unit[arg]
+        current = _penalty(residual, band, w)
+    return x
+
+
+@COMPUTE_SECONDS.timed(operation="plan_optimized")
+def plan_optimized(targets: dict, matrix: PantryMatrix, meals_per_day: int = 3, days: int = 7,
+                   tolerance: float = 0.1, max_portions_per_item: int = 3,
+                   time_budget: float = 0.5) -> Dict:
+    """
+    Returns the same structure as plan_matrix / plan_daily_from_targets, with
+    each day's items tagged by `meal` and extra per-day `deviation_pct` /
+    `within_tolerance`, plus a top-level `solver` report.
+    """
+    started = time.perf_counter()
+    target = _targets(targets)
+    n = len(matrix)
+    if linprog is None or n == 0 or days <= 0:
+        return _greedy(targets, matrix, meals_per_day, days, "scipy unavailable" if linprog is None else "empty", started)
+    deadline = started + time_budget
+
+    avail = matrix.available_grams.astype(float)
+    # one "unit" is a portion, or whatever is left if less than a portion remains
+    unit_g = np.minimum(matrix.portion_gram, avail)
+    usable = unit_g >= 1.0
+    unit_g = np.where(usable, unit_g, 1.0)
+    max_units = np.where(usable, np.floor(avail / unit_g + 1e-9), 0)
+    per_unit = np.nan_to_num(matrix.per_100g) / 100.0 * unit_g[:, None]  # (n, K)
+
+    K = len(NUTRIENTS)
+    T = np.array([target[k] for k in NUTRIENTS])
+    scale = np.where(T > 0, T, 1.0)
+    w = np.array([WEIGHTS[k] for k in NUTRIENTS]) / scale
+
+    # variables: x[d, i] (n * days), then per (d, k): in-band under/over, excess under/over
+    nx = n * days
+    nd = K * days
+    c = np.concatenate([
+        np.full(nx, PORTION_COST),
+        np.tile(w, days) * IN_BAND_COST, np.tile(w, days) * IN_BAND_COST,
+        np.tile(w, days), np.tile(w, days),
+    ])
+    # day nutrients: A x + under_in + under_ex - over_in - over_ex = T
+    A_day = kron(identity(days), coo_matrix(per_unit.T))  # (days*K, days*n)
+    I = identity(nd)
+    A_eq = hstack([A_day, I, -I, I, -I])
+    # inventory over the horizon: sum_d x[d, i] <= max_units[i]
+    A_inv = hstack([kron(np.ones((1, days)), identity(n)), coo_matrix((n, 4 * nd))])
+    band = np.tile(T * tolerance, days)
+    cap = np.minimum(max_units, max_portions_per_item)
+    upper = np.concatenate([np.tile(cap, days), band, band, np.full(2 * nd, np.inf)])
+    res = linprog(c, A_ub=A_inv.tocsr(), b_ub=max_units, A_eq=A_eq.tocsr(), b_eq=np.tile(T, days),
+                  bounds=np.column_stack([np.zeros_like(upper), upper]), method="highs",
+                  options={"time_limit": max(0.05, deadline - time.perf_counter())})
+    if res.x is None:
+        return _greedy(targets, matrix, meals_per_day, days, f"solver: {res.message}", started)
+
+    # round down (always feasible), then repair day by day against the remaining stock
+    x = np.floor(res.x[:nx].reshape(days, n) + 1e-6)
+    stock = max_units - x.sum(axis=0)
+    day_band = T * tolerance
+    for d in range(days):
+        x[d] = _repair_day(x[d], per_unit, T, day_band, w, stock, cap, deadline)
+    x = x.astype(int)
+    unit_cal = per_unit[:, 0]
+    per_gram = matrix.per_100g / 100.0
+    used = np.zeros(n)
+    plan = []
+    for d in range(days):
+        units = [i for i in np.nonzero(x[d])[0].tolist() for _ in range(x[d, i])]
+        meals = _split_meals(units, unit_cal, meals_per_day)
+        grouped: Dict[tuple, float] = {}
+        for i, meal in zip(units, meals):
+            grouped[(meal, i)] = grouped.get((meal, i), 0.0) + unit_g[i]
+        items = []
+        day_totals = np.zeros(K)
+        for (meal, i), grams in sorted(grouped.items()):
+            contrib = np.round(per_gram[i] * grams, 2)
+            day_totals += np.nan_to_num(contrib)
+            used[i] += grams
+            items.append({
+                "fdc_id": matrix.fdc_ids[i],
+                "description": matrix.descriptions[i],
+                "meal": meal + 1,
+                "grams": round(float(grams), 1),
+                "nutrients": {k: (None if np.isnan(v) else float(v)) for k, v in zip(NUTRIENTS, contrib)},
+            })
+        totals = {k: round(float(v), 2) for k, v in zip(NUTRIENTS, day_totals)}
+        deviation = {k: round((totals[k] - target[k]) / target[k] * 100, 1) if target[k] else None for k in NUTRIENTS}
+        plan.append({
+            "day": d + 1,
+            "items": items,
+            "totals": totals,
+            "target_calories": round(target["calories"], 1),
+            "targets": target,
+            "deviation_pct": deviation,
+            "within_tolerance": all(v is None or abs(v) <= tolerance * 100 + 1e-6 for v in deviation.values()),
+        })
+    remaining = [
+        {"fdc_id": matrix.fdc_ids[i], "description": matrix.descriptions[i],
+         "remaining_grams": round(float(avail[i] - used[i]), 1)}
+        for i in range(n)
+    ]
+    return {
+        "days": plan,
+        "remaining_inventory": remaining,
+        "solver": {
+            "mode": "lp_round",
+            "status": res.message,
+            "lp_objective": round(float(res.fun), 4),
+            "objective": round(float(sum(_penalty(T - x[d] @ per_unit, day_band, w) for d in range(days))), 4),
+            "solve_ms": round((time.perf_counter() - started) * 1000, 1),
+        },
+    }
+
+
+def _greedy(targets: dict, matrix: PantryMatrix, meals_per_day: int, days: int, reason: str,
+            started: float) -> Dict:
+    result = plan_matrix(targets, matrix, meals_per_day=meals_per_day, days=days)
+    result["solver"] = {
+        "mode": "greedy",
+        "fallback_reason": reason,
+        "solve_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    return result
+
+
+def plan_deviation(result: Dict, targets: dict) -> Optional[Dict[str, float]]:
+    """Mean absolute % deviation from each target across the plan's days."""
+    target = _targets(targets)
+    if not result.get("days"):
+        return None
+    out = {}
+    for k in NUTRIENTS:
+        if not target[k]:
+            continue
+        devs = [abs(day["totals"][k] - target[k]) / target[k] * 100 for day in result["days"]]
+        out[k] = round(sum(devs) / len(devs), 1)
+    return out
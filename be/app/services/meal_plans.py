@@ -0,0 +1,263 @@
+# app/services/meal_plans.py
+"""
+Saved multi-day plans (up to MAX_PLAN_DAYS) built with the greedy planner,
+re-planned incrementally.
+
+For every day the plan keeps the planner's picks (item rows + grams) and how
+many rotation positions it visited. Replaying a saved plan against the
+current pantry walks the days keeping two inventories: the one the saved
+plan was built from and the current one. A saved day is reused as long as
+every item whose stock differs was either not reached by that day's rotation
+or would still yield the same portion; only the other days are re-planned.
+So changing one item's quantity only re-plans the days that actually touch
+it, and editing a day only affects later days that draw on what it changed.
+Adding/removing items, nutrient changes or a new calorie target change the
+rotation itself and re-plan the whole horizon.
+
+Accepting a day marks it eaten: its grams are consumed from the pantry
+(ledger "consume" events) and the rendered day is kept in `consumed`. Since
+the pantry no longer holds that food, an accepted day draws nothing on
+replay, and the other days keep the stock they were planned with.
+"""
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.plan import MealPlan
+from app.services.nutrition_matrix import CAL, PantryMatrix, day_entry, plan_day, remaining_inventory
+from app.services.metrics import COMPUTE_SECONDS
+from app.services.pantry_ledger import EPSILON, change_quantities
+from app.services.pantry_versions import bump_version
+
+MAX_PLAN_DAYS = 90
+
+
+class DayAlreadyAccepted(ValueError):
+    """The plan day to accept was already eaten."""
+
+
+def pantry_signature(pantry: List, matrix: PantryMatrix) -> str:
+    """Fingerprint of everything the plan depends on except item quantities."""
+    payload = json.dumps([
+        [p.id for p in pantry],
+        matrix.fdc_ids,
+        np.where(np.isnan(matrix.per_100g), -1.0, matrix.per_100g).tolist(),
+        matrix.portion_gram.tolist(),
+    ], separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def resolve_locks(matrix: PantryMatrix, locks: Dict[str, list]) -> Dict[int, List[Tuple[int, float]]]:
+    """Map stored {day: [{"fdc_id", "grams"}]} locks to (row, grams); unknown foods are skipped."""
+    rows = {}
+    for i, fdc_id in enumerate(matrix.fdc_ids):
+        rows.setdefault(fdc_id, i)
+    out = {}
+    for day, entries in locks.items():
+        out[int(day)] = [(rows[e["fdc_id"]], float(e["grams"])) for e in entries if e["fdc_id"] in rows]
+    return out
+
+
+def _apply_lock(avail: np.ndarray, picks: List[Tuple[int, float]]):
+    idx = []
+    grams = []
+    for row, wanted in picks:
+        take = min(wanted, max(avail[row], 0.0))
+        if take > 0:
+            avail[row] -= take
+            idx.append(row)
+            grams.append(take)
+    return idx, grams
+
+
+def _reusable(entry: dict, day: int, matrix: PantryMatrix, avail: np.ndarray, old: np.ndarray) -> bool:
+    changed = np.nonzero(np.abs(avail - old) > 1e-6)[0]
+    if not len(changed):
+        return True
+    n = len(matrix)
+    visited = entry["visited"]
+    if visited > n:
+        # the rotation went round more than once; don't try to reason about second visits
+        return False
+    reached = changed[(changed - day % n) % n < visited]
+    if not len(reached):
+        return True
+    portion = matrix.portion_gram[reached]
+    new_take = np.where(avail[reached] >= 1.0, np.minimum(portion, avail[reached]), 0.0)
+    old_take = np.where(old[reached] >= 1.0, np.minimum(portion, old[reached]), 0.0)
+    return bool(np.all(np.abs(new_take - old_take) <= 1e-9))
+
+
+@COMPUTE_SECONDS.timed(operation="build_plan")
+def build_plan(matrix: PantryMatrix, daily_cal: float, days: int,
+               locks: Optional[Dict[int, List[Tuple[int, float]]]] = None,
+               previous: Optional[List[dict]] = None, previous_avail: Optional[np.ndarray] = None,
+               accepted: frozenset = frozenset()):
+    """
+    Plan `days` days, reusing `previous` (saved entries planned on the same
+    pantry structure and calorie target from inventory `previous_avail`)
+    wherever the current inventory cannot change the outcome. `accepted`
+    days are already eaten and draw nothing.
+
+    Returns (entries, remaining grams per item, number of days re-planned).
+    """
+    locks = locks or {}
+    avail = matrix.available_grams.astype(float).copy()
+    old = None
+    if previous is not None:
+        old = np.asarray(previous_avail, dtype=float).copy()
+    cal_per_gram = np.nan_to_num(matrix.per_100g[:, CAL] / 100.0)
+    entries = []
+    replanned = 0
+    for day in range(days):
+        prev = previous[day] if previous is not None and day < len(previous) else None
+        if day in accepted:
+            entry = {"visited": 0, "idx": [], "grams": [], "locked": False, "accepted": True}
+        elif day in locks:
+            idx, grams = _apply_lock(avail, locks[day])
+            entry = {"visited": 0, "idx": idx, "grams": grams, "locked": True}
+        elif prev is not None and not prev["locked"] and not prev.get("accepted") \
+                and _reusable(prev, day, matrix, avail, old):
+            np.subtract.at(avail, np.asarray(prev["idx"], dtype=int), np.asarray(prev["grams"], dtype=float))
+            entry = prev
+        else:
+            idx, grams, visited = plan_day(matrix, avail, day, daily_cal, cal_per_gram)
+            entry = {"visited": visited, "idx": idx.tolist(), "grams": grams.tolist(), "locked": False}
+            replanned += 1
+        if prev is not None:
+            np.subtract.at(old, np.asarray(prev["idx"], dtype=int), np.asarray(prev["grams"], dtype=float))
+        entries.append(entry)
+    return entries, avail, replanned
+
+
+def render_plan(matrix: PantryMatrix, entries: List[dict], avail: np.ndarray, daily_cal: float,
+                consumed: Optional[Dict[str, dict]] = None) -> Dict:
+    days = []
+    for day, entry in enumerate(entries):
+        if entry.get("accepted"):
+            out = dict(consumed[str(day)], locked=False, accepted=True)
+        else:
+            out = day_entry(matrix, day, entry["idx"], entry["grams"], daily_cal)
+            out["locked"] = entry["locked"]
+        days.append(out)
+    return {"days": days, "remaining_inventory": remaining_inventory(matrix, avail)}
+
+
+def load_plan(db: Session, user_id: int) -> Optional[MealPlan]:
+    return db.query(MealPlan).filter(MealPlan.user_id == user_id).first()
+
+
+PLAN_FIELDS = ("goal", "days", "daily_calories", "signature", "quantities", "locks", "state", "consumed")
+
+
+def saved_fields(plan: Optional[MealPlan]) -> Optional[dict]:
+    return {f: getattr(plan, f) for f in PLAN_FIELDS} if plan is not None else None
+
+
+def accepted_days(saved: Optional[dict]) -> Dict[str, dict]:
+    """{day (0-based, as str): rendered day} of the days already accepted."""
+    return json.loads(saved["consumed"]) if saved is not None and saved["consumed"] else {}
+
+
+def replan(saved: Optional[dict], pantry: List, matrix: PantryMatrix, daily_cal: float, days: int,
+           goal: str = "maintain", lock_day: Optional[int] = None, lock_items: Optional[List[dict]] = None):
+    """
+    The DB-free part of update_plan: plan against the stored plan fields
+    (saved_fields(), None for a new plan). Returns (new plan fields, entries,
+    remaining grams, number of days re-planned).
+    """
+    locks = json.loads(saved["locks"]) if saved is not None and saved["locks"] else {}
+    consumed = {d: v for d, v in accepted_days(saved).items() if int(d) < days}
+    if lock_day is not None:
+        if lock_items is None:
+            locks.pop(str(lock_day), None)
+        else:
+            locks[str(lock_day)] = lock_items
+
+    signature = pantry_signature(pantry, matrix)
+    previous = previous_avail = None
+    if saved is not None and saved["signature"] == signature and abs(saved["daily_calories"] - daily_cal) < 1e-6:
+        previous = json.loads(saved["state"])
+        previous_avail = np.array(json.loads(saved["quantities"]), dtype=float) * matrix.portion_gram
+
+    entries, avail, replanned = build_plan(matrix, daily_cal, days, resolve_locks(matrix, locks),
+                                           previous, previous_avail, frozenset(int(d) for d in consumed))
+    fields = {
+        "goal": goal,
+        "days": days,
+        "daily_calories": daily_cal,
+        "signature": signature,
+        "quantities": json.dumps([1.0 if p.quantity is None else p.quantity for p in pantry]),
+        "locks": json.dumps(locks) if locks else None,
+        "state": json.dumps(entries, separators=(",", ":")),
+        "consumed": json.dumps(consumed, separators=(",", ":")) if consumed else None,
+    }
+    return fields, entries, avail, replanned
+
+
+def _accept(db: Session, user_id: int, day: int, fields: dict, entries: List[dict], pantry: List,
+            matrix: PantryMatrix, daily_cal: float) -> dict:
+    """Consume a planned day from the pantry and keep it as eaten; updates `fields`/`entries` in place."""
+    entry = entries[day]
+    if entry.get("accepted"):
+        raise DayAlreadyAccepted(f"Day {day + 1} was already accepted")
+    rendered = day_entry(matrix, day, entry["idx"], entry["grams"], daily_cal)
+    idx = np.asarray(entry["idx"], dtype=int)
+    used = np.zeros(len(matrix))  # quantity (portions) taken per item
+    np.add.at(used, idx, np.asarray(entry["grams"], dtype=float) / matrix.portion_gram[idx])
+    changes = []
+    for row in np.flatnonzero(used).tolist():
+        item = pantry[row]
+        left = (1.0 if item.quantity is None else item.quantity) - used[row]
+        changes.append((item, left if left > EPSILON else 0.0))
+    change_quantities(db, user_id, changes, "consume", plan_day=day + 1)
+    bump_version(db, user_id)
+
+    entries[day] = {"visited": 0, "idx": [], "grams": [], "locked": False, "accepted": True}
+    consumed = accepted_days(fields)
+    consumed[str(day)] = rendered
+    locks = json.loads(fields["locks"]) if fields["locks"] else {}
+    locks.pop(str(day), None)
+    fields.update(
+        quantities=json.dumps([1.0 if p.quantity is None else p.quantity for p in pantry]),
+        locks=json.dumps(locks) if locks else None,
+        state=json.dumps(entries, separators=(",", ":")),
+        consumed=json.dumps(consumed, separators=(",", ":")),
+    )
+    return consumed
+
+
+def update_plan(db: Session, user_id: int, pantry: List, matrix: PantryMatrix, daily_cal: float, days: int,
+                goal: str = "maintain", lock_day: Optional[int] = None,
+                lock_items: Optional[List[dict]] = None, accept_day: Optional[int] = None) -> Dict:
+    """
+    Bring the user's saved plan up to date with the pantry/targets (creating
+    it if needed) and persist it. `lock_day` fixes that day to `lock_items`
+    ([{"fdc_id", "grams"}]), or releases it back to the planner when
+    `lock_items` is None. `accept_day` then consumes that day's food from the
+    pantry (`pantry` must be the ORM rows) and keeps the day as eaten
+    (DayAlreadyAccepted if it already was).
+    """
+    started = time.perf_counter()
+    plan = load_plan(db, user_id)
+    fields, entries, avail, replanned = replan(saved_fields(plan), pantry, matrix, daily_cal, days, goal,
+                                               lock_day, lock_items)
+    consumed = accepted_days(fields)
+    if accept_day is not None:
+        consumed = _accept(db, user_id, accept_day, fields, entries, pantry, matrix, daily_cal)
+    if plan is None:
+        plan = MealPlan(user_id=user_id)
+        db.add(plan)
+    for key, value in fields.items():
+        setattr(plan, key, value)
+    db.commit()
+
+    out = render_plan(matrix, entries, avail, daily_cal, consumed)
+    out["replanned_days"] = replanned
+    out["reused_days"] = days - replanned - sum(1 for e in entries if e["locked"] or e.get("accepted"))
+    out["plan_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return out
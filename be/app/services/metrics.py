@@ -0,0 +1,215 @@
+# app/services/metrics.py
+"""
+In-process metrics in Prometheus text format (GET /metrics), cheap enough to
+leave on at full load: recording is a perf_counter pair, a bisect over fixed
+buckets and a short per-metric lock, with no allocation after a label set
+is first seen. Values that already live elsewhere (cache hit/miss counters,
+DB pool and threadpool usage) are read by collectors only when /metrics is
+scraped.
+
+Metrics are per process; with several uvicorn workers each one is scraped
+(or aggregated by the scraper) separately.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# seconds; covers sub-ms cache hits up to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        pos = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[pos] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def timed(self, **labels):
+        """Decorator form of time()."""
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - started, **labels)
+            return wrapper
+        return decorate
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        out = []
+        for key, series in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                out.append((f"{self.name}_bucket", dict(labels, le=_number(bound)), cumulative))
+            out.append((f"{self.name}_count", labels, cumulative))
+            out.append((f"{self.name}_sum", labels, series[-1]))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # name -> (kind, help, fn returning samples); run at scrape time
+        self._collectors: Dict[str, Tuple[str, str, Callable[[], List[Sample]]]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def collector(self, name: str, kind: str, help: str, fn: Callable[[], List[Sample]]):
+        with self._lock:
+            self._collectors[name] = (kind, help, fn)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        families = [(m.name, m.kind, m.help, m.samples) for m in metrics]
+        families += [(name, kind, help, fn) for name, (kind, help, fn) in collectors]
+        for name, kind, help, collect in families:
+            try:
+                samples = collect()
+            except Exception:
+                continue  # a broken collector must not take /metrics down
+            if not samples:
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "Requests currently being served")
+
+USDA_REQUEST_SECONDS = REGISTRY.histogram(
+    "usda_request_duration_seconds", "USDA API call latency (to response headers)", ("client", "endpoint", "status"))
+
+DB_QUERY_SECONDS = REGISTRY.histogram("db_query_duration_seconds", "SQL statement execution time")
+
+COMPUTE_SECONDS = REGISTRY.histogram(
+    "compute_duration_seconds", "Aggregation and planner runtime", ("operation",))
+
+
+def cache_collector(caches: Callable[[], Dict[str, object]]) -> Callable[[], List[Sample]]:
+    """Samples of the hit/miss counters every BaseCache keeps, labelled by cache name."""
+    def collect():
+        out = []
+        for name, cache in caches().items():
+            stats = cache.stats()
+            for result in ("hits", "stale_hits", "misses"):
+                out.append(("cache_lookups_total", {"cache": name, "result": result}, stats[result]))
+        return out
+    return collect
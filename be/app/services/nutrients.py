@@ -0,0 +1,180 @@
+# app/services/nutrients.py
+"""
+Nutrient extraction from USDA FoodData Central records, keyed on FDC nutrient
+ids instead of names.
+
+FIELDS fixes the order of the nutrient vector (macros first, then fiber,
+sugars, sodium and key vitamins/minerals; all per 100 g). Every nutrient has
+one or more FDC nutrient ids and legacy nutrient numbers in priority order;
+both are compiled into lookup tables once, so parsing a record is a single
+pass of dict lookups. The record shapes handled are:
+
+    search results / dataset dumps  {"nutrientId": 1008, "nutrientNumber": "208", "value": ...}
+    full detail records             {"nutrient": {"id": 1008, "number": "208"}, "amount": ...}
+    abridged detail records         {"number": "208", "amount": ...}
+
+Entries carrying neither id nor number (hand-written or third-party data)
+fall back to matching the nutrient name.
+
+Parsed records are memoized per (fdc_id, publicationDate) in a bounded
+first-in-first-out table, so a food appearing in many pantries or requests
+is parsed once per process.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# (key, FDC nutrient ids, legacy nutrient numbers); earlier ids/numbers win
+FIELDS: Tuple[Tuple[str, Tuple[int, ...], Tuple[str, ...]], ...] = (
+    ("calories", (1008, 2047, 2048), ("208", "957", "958")),  # kcal; not 1062 (kJ)
+    ("protein_g", (1003,), ("203",)),
+    ("fat_g", (1004, 1085), ("204", "298")),
+    ("carbs_g", (1005, 1050), ("205", "205.2")),
+    ("fiber_g", (1079,), ("291",)),
+    ("sugars_g", (2000, 1063), ("269", "269.3")),
+    ("saturated_fat_g", (1258,), ("606",)),
+    ("cholesterol_mg", (1253,), ("601",)),
+    ("sodium_mg", (1093,), ("307",)),
+    ("potassium_mg", (1092,), ("306",)),
+    ("calcium_mg", (1087,), ("301",)),
+    ("iron_mg", (1089,), ("303",)),
+    ("magnesium_mg", (1090,), ("304",)),
+    ("zinc_mg", (1095,), ("309",)),
+    ("vitamin_a_ug", (1106,), ("320",)),  # RAE
+    ("vitamin_c_mg", (1162,), ("401",)),
+    ("vitamin_d_ug", (1114,), ("328",)),
+    ("vitamin_b12_ug", (1178,), ("418",)),
+    ("folate_ug", (1190, 1177), ("435", "417")),  # DFE, else total
+)
+NUTRIENT_KEYS: Tuple[str, ...] = tuple(key for key, _ids, _numbers in FIELDS)
+MICRONUTRIENTS: Tuple[str, ...] = NUTRIENT_KEYS[4:]
+
+# id / number -> (vector position, priority: lower wins)
+_BY_ID: Dict[int, Tuple[int, int]] = {}
+_BY_NUMBER: Dict[str, Tuple[int, int]] = {}
+for _pos, (_key, _ids, _numbers) in enumerate(FIELDS):
+    for _prio, _id in enumerate(_ids):
+        _BY_ID[_id] = (_pos, _prio)
+    for _prio, _number in enumerate(_numbers):
+        _BY_NUMBER[_number] = (_pos, _prio)
+
+# name fallback for entries without id/number
+_BY_NAME: Dict[str, int] = {
+    "protein": 1,
+    "total lipid (fat)": 2,
+    "total fat": 2,
+    "fat": 2,
+    "carbohydrate, by difference": 3,
+    "carbohydrate": 3,
+    "carbohydrates": 3,
+    "fiber, total dietary": 4,
+    "fiber": 4,
+    "sugars, total including nlea": 5,
+    "sugars, total": 5,
+    "sugars": 5,
+    "fatty acids, total saturated": 6,
+    "saturated fat": 6,
+    "cholesterol": 7,
+    "sodium, na": 8,
+    "sodium": 8,
+    "potassium, k": 9,
+    "potassium": 9,
+    "calcium, ca": 10,
+    "calcium": 10,
+    "iron, fe": 11,
+    "iron": 11,
+    "magnesium, mg": 12,
+    "zinc, zn": 13,
+    "vitamin a, rae": 14,
+    "vitamin c, total ascorbic acid": 15,
+    "vitamin c": 15,
+    "vitamin d (d2 + d3)": 16,
+    "vitamin b-12": 17,
+    "folate, dfe": 18,
+    "folate, total": 18,
+}
+_NAME_PRIORITY = 10  # id/number matches always beat name matches
+
+MEMO_SIZE = 20000
+_memo: Dict[tuple, Dict[str, Optional[float]]] = {}
+_memo_lock = threading.Lock()
+
+
+def _name_position(name: str, unit: Optional[str]) -> Optional[int]:
+    n = name.strip().lower()
+    if n.startswith("energy"):
+        # only kcal; kJ entries share the name
+        unit = (unit or "").lower()
+        return 0 if unit == "kcal" or "kcal" in n else None
+    return _BY_NAME.get(n)
+
+
+def _portion_gram(food: dict) -> float:
+    # the first reasonable (> 5 g) portion weight, else values are per 100 g units
+    for p in food.get("foodPortions") or []:
+        gw = p.get("gramWeight")
+        if gw and isinstance(gw, (int, float)) and gw > 5:
+            return float(gw)
+    return 100.0
+
+
+def parse_nutrients(food: dict) -> Tuple[Tuple[Optional[float], ...], float]:
+    """(nutrient vector in NUTRIENT_KEYS order, portion_gram) of one USDA record; not memoized."""
+    values: List[Optional[float]] = [None] * len(FIELDS)
+    priority = [_NAME_PRIORITY + 1] * len(FIELDS)
+    entries = food.get("foodNutrients")
+    if not isinstance(entries, list):
+        entries = []
+    for n in entries:
+        # detail records use "amount", search results / dataset dumps use "value"
+        amount = n.get("amount", n.get("value"))
+        if amount is None:
+            continue
+        nested = n.get("nutrient") or {}
+        hit = None
+        nid = n.get("nutrientId") or nested.get("id")
+        if nid is not None:
+            hit = _BY_ID.get(nid)
+        if hit is None:
+            number = n.get("nutrientNumber") or n.get("number") or nested.get("number")
+            if number is not None:
+                hit = _BY_NUMBER.get(str(number))
+            elif nid is None:
+                name = n.get("nutrientName") or n.get("name") or nested.get("name")
+                if name:
+                    pos = _name_position(name, n.get("unitName") or nested.get("unitName"))
+                    if pos is not None:
+                        hit = (pos, _NAME_PRIORITY)
+        if hit is None:
+            continue
+        pos, prio = hit
+        if prio < priority[pos]:
+            try:
+                values[pos] = float(amount)
+            except (TypeError, ValueError):
+                continue
+            priority[pos] = prio
+    return tuple(values), _portion_gram(food)
+
+
+def nutrients_dict(values: Tuple[Optional[float], ...], portion_gram: float) -> Dict[str, Optional[float]]:
+    out = dict(zip(NUTRIENT_KEYS, values))
+    out["portion_gram"] = portion_gram
+    return out
+
+
+def food_nutrients(food: dict) -> Dict[str, Optional[float]]:
+    """{key: per-100g value} for NUTRIENT_KEYS plus portion_gram, memoized per (fdc_id, publicationDate)."""
+    fdc_id = food.get("fdcId")
+    if fdc_id is None:
+        return nutrients_dict(*parse_nutrients(food))
+    key = (fdc_id, food.get("publicationDate") or food.get("modifiedDate"))
+    # reads are a single dict lookup (atomic under the GIL); only inserts take the lock
+    hit = _memo.get(key)
+    if hit is None:
+        hit = nutrients_dict(*parse_nutrients(food))
+        with _memo_lock:
+            _memo[key] = hit
+            while len(_memo) > MEMO_SIZE:
+                del _memo[next(iter(_memo))]  # oldest first
+    # callers may add keys to the result; the memoized dict stays untouched
+    return hit.copy()
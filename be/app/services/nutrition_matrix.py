@@ -0,0 +1,203 @@
+# app/services/nutrition_matrix.py
+"""
+Array-backed versions of the pantry aggregation and greedy planner in
+nutrition_planner. A pantry is held as an items x nutrients matrix of per-100g
+values (NaN where USDA reports nothing) plus per-item grams/portion vectors;
+totals, per-day allocation and inventory depletion are computed on whole
+arrays. Results have the same structure as the dict implementations.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.metrics import COMPUTE_SECONDS
+
+NUTRIENTS = ("calories", "protein_g", "fat_g", "carbs_g")
+CAL = 0  # column of calories in the nutrient matrix
+BLOCK = 32  # rotation positions evaluated per vectorized step of the planner
+
+
+def _nan_to_none(values: list) -> list:
+    return [None if v != v else v for v in values]
+
+
+class PantryMatrix:
+    def __init__(self, fdc_ids: Sequence[int], descriptions: Sequence[str], per_100g: np.ndarray,
+                 available_grams: np.ndarray, portion_gram: np.ndarray):
+        self.fdc_ids = list(fdc_ids)
+        self.descriptions = list(descriptions)
+        self.per_100g = per_100g  # (n, len(NUTRIENTS)) float64, NaN = unknown
+        self.available_grams = available_grams  # (n,)
+        self.portion_gram = portion_gram  # (n,)
+
+    def __len__(self):
+        return len(self.fdc_ids)
+
+    @classmethod
+    def from_nutrients(cls, pantry_items: List, nutrients_by_id: Dict[int, dict]) -> "PantryMatrix":
+        """Build from pantry rows and extracted nutrients ({fdc_id: extract_nutrients_from_usda(...)})."""
+        rows = []
+        qty = []
+        portion = []
+        for p in pantry_items:
+            nutrients = nutrients_by_id.get(p.fdc_id)
+            if nutrients is None:
+                raise ValueError(f"USDA: Food with FDC ID {p.fdc_id} not found.")
+            rows.append([nutrients.get(k) for k in NUTRIENTS])
+            qty.append(1.0 if p.quantity is None else p.quantity)  # 0 = used up
+            portion.append(nutrients.get("portion_gram") or 100.0)
+        # dtype=float turns missing (None) values into NaN
+        per_100g = np.array(rows, dtype=float).reshape(len(rows), len(NUTRIENTS))
+        portion = np.array(portion, dtype=float)
+        return cls([p.fdc_id for p in pantry_items], [p.description for p in pantry_items],
+                   per_100g, np.array(qty, dtype=float) * portion, portion)
+
+    @classmethod
+    def from_breakdown(cls, pantry_breakdown: List[dict]) -> "PantryMatrix":
+        """Build from the `breakdown` list returned by the aggregation functions."""
+        n = len(pantry_breakdown)
+        per_100g = np.array(
+            [[b["per_100g"].get(k) for k in NUTRIENTS] for b in pantry_breakdown], dtype=float
+        ).reshape(n, len(NUTRIENTS))
+        return cls(
+            [b["fdc_id"] for b in pantry_breakdown],
+            [b["description"] for b in pantry_breakdown],
+            per_100g,
+            np.array([b["available_grams"] for b in pantry_breakdown], dtype=float),
+            np.array([b["portion_gram"] or 100.0 for b in pantry_breakdown], dtype=float),
+        )
+
+    def totals(self) -> np.ndarray:
+        """Per-item total nutrients available, rounded like the dict implementation (NaN = unknown)."""
+        return np.round(self.per_100g * (self.available_grams / 100.0)[:, None], 2)
+
+
+@COMPUTE_SECONDS.timed(operation="aggregate_matrix")
+def aggregate_matrix(matrix: PantryMatrix, breakdown: bool = True) -> Dict:
+    """
+    Vectorized aggregate_from_nutrients: same {"totals", "breakdown"} structure.
+    breakdown=False skips building the per-item dicts (totals only).
+    """
+    item_totals = matrix.totals()
+    agg = np.round(np.nansum(item_totals, axis=0), 2).tolist()
+    out = {"totals": dict(zip(NUTRIENTS, agg)), "breakdown": []}
+    if not breakdown:
+        return out
+    grams = matrix.available_grams.tolist()
+    portion = matrix.portion_gram.tolist()
+    per_100g = matrix.per_100g.tolist()
+    totals = item_totals.tolist()
+    for i in range(len(matrix)):
+        out["breakdown"].append({
+            "fdc_id": matrix.fdc_ids[i],
+            "description": matrix.descriptions[i],
+            "available_grams": grams[i],
+            "per_100g": dict(zip(NUTRIENTS, _nan_to_none(per_100g[i]))),
+            "total": dict(zip(NUTRIENTS, _nan_to_none(totals[i]))),
+            "portion_gram": portion[i],
+        })
+    return out
+
+
+def aggregate_from_nutrients_np(pantry_items: List, nutrients_by_id: Dict[int, dict]) -> Dict:
+    return aggregate_matrix(PantryMatrix.from_nutrients(pantry_items, nutrients_by_id))
+
+
+def _daily_calories(targets: dict) -> float:
+    return targets.get("nutrition", {}).get("calories") or targets.get("calories") or 2000
+
+
+def plan_day(matrix: PantryMatrix, avail: np.ndarray, day: int, daily_cal: float,
+             cal_per_gram: Optional[np.ndarray] = None):
+    """
+    One day of the greedy rotation, drawing from (and updating) `avail` in
+    place. Returns (item indices, grams, visited) where `visited` is how many
+    rotation positions were looked at, so callers can tell which items could
+    have influenced the day.
+
+    Within one pass of the rotation every item is visited at most once, so a
+    block of rotation positions is evaluated on whole arrays: take one portion
+    from each item with stock, cumulative-sum the calories and keep the prefix
+    visited before the daily target is reached. Blocks never straddle passes,
+    and at most 4 passes are made per day (the `len(inventory) * 4` attempt
+    cap of the dict planner).
+    """
+    n = len(matrix)
+    portion = matrix.portion_gram
+    if cal_per_gram is None:
+        cal_per_gram = np.nan_to_num(matrix.per_100g[:, CAL] / 100.0)  # unknown calories contribute nothing
+    day_cal = 0.0
+    picked_idx = []
+    picked_grams = []
+    start = day % max(1, n)
+    pos = 0
+    while pos < n * 4 and day_cal < daily_cal:
+        stop = min(pos + BLOCK, (pos // n + 1) * n)  # don't run into the next pass
+        order = (start + np.arange(pos, stop)) % n
+        active = avail[order] >= 1.0
+        take = np.where(active, np.minimum(portion[order], avail[order]), 0.0)
+        cal = np.round(cal_per_gram[order] * take, 2)
+        # running calories *before* each visit (summed in visit order, like the
+        # dict planner); the rotation stops once the target is met
+        before = np.cumsum(np.concatenate(([day_cal], cal)))[:-1]
+        visit = int(np.searchsorted(before >= daily_cal, True))
+        used = active[:visit]
+        idx = order[:visit][used]
+        grams = take[:visit][used]
+        avail[idx] -= grams
+        day_cal += float(cal[:visit].sum())
+        picked_idx.append(idx)
+        picked_grams.append(grams)
+        pos += visit if visit < len(order) else len(order)
+        if visit < len(order):
+            break
+    idx = np.concatenate(picked_idx) if picked_idx else np.empty(0, dtype=int)
+    grams = np.concatenate(picked_grams) if picked_grams else np.empty(0)
+    return idx, grams, pos
+
+
+def day_entry(matrix: PantryMatrix, day: int, idx: np.ndarray, grams: np.ndarray, daily_cal: float) -> Dict:
+    """Render one planned day in the plan_daily_from_targets shape."""
+    idx = np.asarray(idx, dtype=int)
+    grams = np.asarray(grams, dtype=float)
+    contrib = np.round(matrix.per_100g[idx] / 100.0 * grams[:, None], 2)
+    day_totals = np.round(np.nansum(contrib, axis=0), 2).tolist()
+    contrib_rows = contrib.tolist()
+    return {
+        "day": day + 1,
+        "items": [
+            {
+                "fdc_id": matrix.fdc_ids[i],
+                "description": matrix.descriptions[i],
+                "grams": round(g, 1),
+                "nutrients": dict(zip(NUTRIENTS, _nan_to_none(contrib_rows[r]))),
+            }
+            for r, (i, g) in enumerate(zip(idx.tolist(), grams.tolist()))
+        ],
+        "totals": dict(zip(NUTRIENTS, day_totals)),
+        "target_calories": round(daily_cal, 1),
+    }
+
+
+def remaining_inventory(matrix: PantryMatrix, avail: np.ndarray) -> List[dict]:
+    return [
+        {"fdc_id": fdc_id, "description": desc, "remaining_grams": round(g, 1)}
+        for fdc_id, desc, g in zip(matrix.fdc_ids, matrix.descriptions, avail.tolist())
+    ]
+
+
+@COMPUTE_SECONDS.timed(operation="plan_matrix")
+def plan_matrix(targets: dict, matrix: PantryMatrix, meals_per_day: int = 3, days: int = 7) -> Dict:
+    """Vectorized plan_daily_from_targets (see plan_day)."""
+    daily_cal = _daily_calories(targets)
+    avail = matrix.available_grams.astype(float).copy()
+    cal_per_gram = np.nan_to_num(matrix.per_100g[:, CAL] / 100.0)
+    plan = []
+    for day in range(days):
+        idx, grams, _visited = plan_day(matrix, avail, day, daily_cal, cal_per_gram)
+        plan.append(day_entry(matrix, day, idx, grams, daily_cal))
+    return {"days": plan, "remaining_inventory": remaining_inventory(matrix, avail)}
+
+
+def plan_daily_from_targets_np(targets: dict, pantry_breakdown: List[dict], meals_per_day: int = 3) -> Dict:
+    return plan_matrix(targets, PantryMatrix.from_breakdown(pantry_breakdown), meals_per_day=meals_per_day)
@@ -1,81 +1,30 @@
 # app/services/nutrition_planner.py
-from typing import Dict, List, Tuple, Optional
-from app.services.usda_client import USDAClient
-
-# nutrient keys we'll extract and normalize (values are grams or kcal per reference weight)
-NUTRIENT_KEY_ALIASES = {
-    "energy": ["energy", "energy (kcal)", "energy (kcal)"],
-    "protein": ["protein", "protein, total"],
-    "fat": ["total lipid", "total lipid (fat)", "fat", "total fat"],
-    "carbs": ["carbohydrate", "carbohydrate, by difference", "carbohydrate, total"]
-}
-
-def _match_nutrient_name(name: str) -> Optional[str]:
-    if not name:
-        return None
-    n = name.strip().lower()
-    # quick mapping heuristics
-    if "energy" in n and ("kcal" in n or "kcal" in name.lower() or "calorie" in n):
-        return "energy"
-    if "protein" in n:
-        return "protein"
-    if "lipid" in n or "fat" in n:
-        return "fat"
-    if "carbohydrate" in n or "carb" in n:
-        return "carbs"
-    return None
+from typing import Dict, List, Optional
+from app.services.usda_client import AsyncUSDAClient, USDAClient
+from app.services.metrics import COMPUTE_SECONDS
+from app.services.nutrients import food_nutrients
 
 def extract_nutrients_from_usda(food_json: dict) -> Dict[str, Optional[float]]:
     """
-    Returns nutrient dict with keys: calories (kcal), protein_g, fat_g, carbs_g
+    Returns nutrient dict with keys: calories (kcal), protein_g, fat_g, carbs_g,
+    the micronutrients of nutrients.MICRONUTRIENTS, portion_gram and per_gram_multiplier.
     Interpretation rules:
-    - If foodNutrients list is present, we attempt to parse relevant nutrients.
+    - Nutrients are looked up by FDC nutrient id/number (see app.services.nutrients);
+      results are memoized per fdc_id and publication date.
     - Values are treated as 'per 100g' unless the nutrient data or foodPortions indicate otherwise.
     """
-    # defaults
-    out = {"calories": None, "protein_g": None, "fat_g": None, "carbs_g": None, "per_gram_multiplier": 0.01}
-    # find nutrients
-    nutrients = food_json.get("foodNutrients") or food_json.get("labelNutrients") or []
-    for n in nutrients:
-        name = n.get("nutrientName") or n.get("name") or n.get("nutrient", {}).get("name", "")
-        amount = n.get("amount")
-        unit = n.get("unitName") or n.get("unitName") or (n.get("nutrient", {}) or {}).get("unitName")
-        if amount is None:
-            continue
-        key = _match_nutrient_name(name)
-        if not key:
-            continue
-        # amount is typically per 100 g for foodNutrients in many datasets
-        if key == "energy":
-            # unit might be 'KCAL' or 'kcal'
-            out["calories"] = float(amount)
-        elif key == "protein":
-            out["protein_g"] = float(amount)
-        elif key == "fat":
-            out["fat_g"] = float(amount)
-        elif key == "carbs":
-            out["carbs_g"] = float(amount)
-    # if we have foodPortions with a gramWeight for a named portion, capture it
-    gram_portion = None
-    portions = food_json.get("foodPortions") or []
-    for p in portions:
-        gw = p.get("gramWeight")
-        if gw and isinstance(gw, (int, float)):
-            # pick the first reasonable gramWeight ( >5 g)
-            if gw > 5:
-                gram_portion = gw
-                break
-    # default multiplier: values found are likely per 100 g -> per gram multiplier = 0.01
-    if gram_portion:
-        out["portion_gram"] = gram_portion
-    else:
-        out["portion_gram"] = 100.0
-    # ensure numeric values exist (if missing, leave None)
+    out = food_nutrients(food_json)
+    # values found are per 100 g -> per gram multiplier = 0.01
+    out["per_gram_multiplier"] = 0.01
     return out
 
-def estimate_nutrients_for_pantry_item(pantry_item: dict, usda_client: USDAClient) -> Dict:
+def estimate_nutrients_for_pantry_item(pantry_item: dict, usda_client: USDAClient, food: Optional[dict] = None,
+                                       nutrients: Optional[dict] = None) -> Dict:
     """
     pantry_item: object with keys: fdc_id, quantity, unit_name, description
+    food: already fetched USDA record for the item (skips the per-item lookup)
+    nutrients: already extracted per-100g values + portion_gram, e.g. a stored
+      FoodSnapshot (skips both the lookup and the parsing)
     returns: dict with estimated total nutrients available from that pantry entry:
       {
           "fdc_id": ...,
@@ -89,11 +38,14 @@ def estimate_nutrients_for_pantry_item(pantry_item: dict, usda_client: USDAClien
       - Else assume quantity counts of 100 g units -> available_grams = quantity * 100
     """
     fdc_id = pantry_item.fdc_id
-    food = usda_client.get_food(fdc_id)
-    nutrients = extract_nutrients_from_usda(food)
+    if nutrients is None:
+        if food is None:
+            food = usda_client.get_food(fdc_id)
+        nutrients = extract_nutrients_from_usda(food)
     # determine grams available from pantry quantity
-    qty = pantry_item.quantity or 1.0
-    portion_gram = nutrients.get("portion_gram", 100.0)
+    # unset quantity = one unit; 0 = used up
+    qty = 1.0 if pantry_item.quantity is None else pantry_item.quantity
+    portion_gram = nutrients.get("portion_gram") or 100.0
     # treat pantry quantity as number of portions if portion_gram present
     available_grams = qty * portion_gram
     # compute per 100g baseline
@@ -118,14 +70,43 @@ def estimate_nutrients_for_pantry_item(pantry_item: dict, usda_client: USDAClien
         "portion_gram": portion_gram
     }
 
+@COMPUTE_SECONDS.timed(operation="aggregate_pantry_nutrients")
 def aggregate_pantry_nutrients(pantry_items: List, usda_client: USDAClient) -> Dict:
     """
     Return aggregated nutrients across the given pantry items.
+    All USDA records are fetched up front with one bulk lookup.
+    """
+    foods = usda_client.get_foods(p.fdc_id for p in pantry_items)
+    return aggregate_from_foods(pantry_items, foods)
+
+async def aggregate_pantry_nutrients_async(pantry_items: List, usda_client: AsyncUSDAClient) -> Dict:
+    """
+    Same as aggregate_pantry_nutrients, for the async client.
+    """
+    with COMPUTE_SECONDS.time(operation="aggregate_pantry_nutrients_async"):
+        foods = await usda_client.get_foods(p.fdc_id for p in pantry_items)
+        return aggregate_from_foods(pantry_items, foods)
+
+def aggregate_from_foods(pantry_items: List, foods: Dict[int, dict]) -> Dict:
+    """
+    Aggregate pantry items against already fetched USDA records ({fdc_id: food}).
+    """
+    return aggregate_from_nutrients(
+        pantry_items, {fdc_id: extract_nutrients_from_usda(food) for fdc_id, food in foods.items()}
+    )
+
+def aggregate_from_nutrients(pantry_items: List, nutrients_by_id: Dict[int, dict]) -> Dict:
+    """
+    Aggregate pantry items against extracted nutrients ({fdc_id: extract_nutrients_from_usda(...)-shaped dict}),
+    e.g. stored snapshots. No USDA access.
     """
     agg = {"calories": 0.0, "protein_g": 0.0, "fat_g": 0.0, "carbs_g": 0.0}
     breakdown = []
     for p in pantry_items:
-        info = estimate_nutrients_for_pantry_item(p, usda_client)
+        nutrients = nutrients_by_id.get(p.fdc_id)
+        if nutrients is None:
+            raise ValueError(f"USDA: Food with FDC ID {p.fdc_id} not found.")
+        info = estimate_nutrients_for_pantry_item(p, None, nutrients=nutrients)
         tot = info["total"]
         for k in agg:
             val = tot.get(k)
@@ -136,7 +117,8 @@ def aggregate_pantry_nutrients(pantry_items: List, usda_client: USDAClient) -> D
     agg = {k: round(v, 2) for k, v in agg.items()}
     return {"totals": agg, "breakdown": breakdown}
 
-def plan_daily_from_targets(targets: dict, pantry_breakdown: List[dict], meals_per_day: int = 3) -> Tuple[Dict, List]:
+@COMPUTE_SECONDS.timed(operation="plan_daily_from_targets")
+def plan_daily_from_targets(targets: dict, pantry_breakdown: List[dict], meals_per_day: int = 3) -> Dict:
     """
     Simple greedy allocator:
       - For each day: for each meal, pick pantry items in rotation and allocate a portion (portion_gram)
@@ -175,3 +157,28 @@ def plan_daily_from_targets(targets: dict, pantry_breakdown: List[dict], meals_p
             pg = item["portion_gram"] or 100.0
             take_grams = min(pg, item["available_grams"])
             # compute nutrient contribution
+            factor = take_grams / 100.0
+            contrib = {}
+            for k in day_totals:
+                v = item["per_100g"].get(k)
+                contrib[k] = round(v * factor, 2) if v is not None else None
+                if v is not None:
+                    day_totals[k] += contrib[k]
+            item["available_grams"] -= take_grams
+            day_used.append({
+                "fdc_id": item["fdc_id"],
+                "description": item["description"],
+                "grams": round(take_grams, 1),
+                "nutrients": contrib
+            })
+        plan.append({
+            "day": day + 1,
+            "items": day_used,
+            "totals": {k: round(v, 2) for k, v in day_totals.items()},
+            "target_calories": round(daily_cal, 1)
+        })
+    remaining = [
+        {"fdc_id": i["fdc_id"], "description": i["description"], "remaining_grams": round(i["available_grams"], 1)}
+        for i in inventory
+    ]
+    return {"days": plan, "remaining_inventory": remaining}
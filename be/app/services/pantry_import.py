@@ -0,0 +1,67 @@
+# app/services/pantry_import.py
+"""
+Parsing and validation for bulk pantry imports. Rows may come as a JSON list
+(or {"items": [...]}), NDJSON (one object per line) or CSV with a header row
+naming PantryItemCreate fields. `user_id` may be omitted; it defaults to the
+importing user.
+"""
+import csv
+import io
+import json
+from typing import List, Tuple
+
+from pydantic import ValidationError
+
+from app.schemas.pantry import PantryItemCreate
+
+MAX_IMPORT_ROWS = 1000
+
+
+def parse_rows(content_type: str, body: bytes) -> List[dict]:
+    """Raises ValueError if the body can't be read in the given format."""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    text = body.decode("utf-8-sig")
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    elif content_type in ("text/csv", "application/csv"):
+        reader = csv.DictReader(io.StringIO(text))
+        # empty cells mean "not given", so schema defaults apply
+        rows = [{k.strip(): v.strip() for k, v in row.items() if k and v is not None and v.strip()}
+                for row in reader]
+    else:
+        data = json.loads(text)
+        rows = data.get("items") if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValueError("Expected a JSON list of items or {\"items\": [...]}")
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise ValueError(f"At most {MAX_IMPORT_ROWS} items per import")
+    return rows
+
+
+def validate_rows(rows: List, user_id: int) -> Tuple[List[Tuple[int, PantryItemCreate]], List[dict]]:
+    """
+    Returns ([(row number, item)] for valid rows, per-row status dicts). Each
+    status starts as "valid", "invalid" (with `errors`) or "forbidden".
+    """
+    valid = []
+    results = []
+    for row_no, row in enumerate(rows, start=1):
+        status = {"row": row_no, "status": "valid"}
+        results.append(status)
+        if not isinstance(row, dict):
+            status.update(status="invalid", errors=["Row must be an object"])
+            continue
+        row = dict(row)
+        row.setdefault("user_id", user_id)
+        try:
+            item = PantryItemCreate(**row)
+        except ValidationError as e:
+            status.update(status="invalid",
+                          errors=[f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()])
+            continue
+        status["fdc_id"] = item.fdc_id
+        if item.user_id != user_id:
+            status.update(status="forbidden", errors=["You can only add items to your own pantry"])
+            continue
+        valid.append((row_no, item))
+    return valid, results
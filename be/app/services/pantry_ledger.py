@@ -0,0 +1,204 @@
+# app/services/pantry_ledger.py
+"""
+Pantry stock ledger and materialized per-user nutrient totals.
+
+Every change of a pantry item's quantity is recorded as a PantryEvent:
+"stock" when the item is added, "restock", "consume" (e.g. an accepted plan
+day) and "adjust" for a quantity set directly. The same transaction applies
+the change to the user's PantryTotals row, so the pantry's totals are read
+with one primary-key lookup instead of aggregating every item.
+
+Totals are computed like aggregate_matrix: per-item contributions are
+rounded to 0.01, and items without a nutrient snapshot count zero. Each
+change adds the difference it makes to the row. Changes to the snapshots
+themselves (a food's first snapshot, or a refresh with new values) mark the
+totals of the users holding that food stale. A stale or missing row is
+recomputed from the items on its next read. `rebuild` repairs a user's
+pantry from the ledger: item quantities become the sum of their events,
+then the totals are recomputed.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, exists, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.db.insert import insert_ignore
+from app.models.food import FoodSnapshot
+from app.models.pantry import PantryEvent, PantryItem, PantryTotals
+from app.services.nutrition_matrix import NUTRIENTS
+from app.services.pantry_versions import bump_version
+
+EPSILON = 1e-9  # quantities below this are treated as used up
+
+
+def _snapshot_nutrients(db: Session, fdc_ids: Iterable[int]) -> Dict[int, dict]:
+    ids = set(fdc_ids)
+    if not ids:
+        return {}
+    return {s.fdc_id: s.to_nutrients() for s in db.query(FoodSnapshot).filter(FoodSnapshot.fdc_id.in_(ids))}
+
+
+def contribution(nutrients: dict, quantity: Optional[float]) -> np.ndarray:
+    """One item's share of the totals (the PantryMatrix.totals() row, unknown values as 0)."""
+    per_100g = np.array([nutrients.get(k) for k in NUTRIENTS], dtype=float)
+    grams = (1.0 if quantity is None else quantity) * (nutrients.get("portion_gram") or 100.0)
+    return np.nan_to_num(np.round(per_100g * (grams / 100.0), 2))
+
+
+def _apply(db: Session, user_id: int, delta: np.ndarray, items: int = 0, valued_items: int = 0):
+    """Add to the user's totals row; a missing row is created stale (computed in full on read)."""
+    values = {k: getattr(PantryTotals, k) + float(d) for k, d in zip(NUTRIENTS, delta)}
+    values.update(items=PantryTotals.items + items, valued_items=PantryTotals.valued_items + valued_items,
+                  updated_at=datetime.utcnow())
+    updated = db.execute(update(PantryTotals).where(PantryTotals.user_id == user_id).values(values)).rowcount
+    if not updated:
+        # a concurrent writer may create it first: either row ends up recomputed
+        insert_ignore(db, PantryTotals, [{"user_id": user_id, "stale": True, "updated_at": datetime.utcnow()}])
+
+
+def _open(db: Session, user_id: int, *where):
+    """A "stock" event with the stored quantity for the user's matching items that have none yet."""
+    events = (
+        select(PantryItem.user_id, PantryItem.id, PantryItem.fdc_id, literal("stock"),
+               func.coalesce(PantryItem.quantity, 1.0), literal(datetime.utcnow()))
+        .where(PantryItem.user_id == user_id, *where)
+        .where(~exists().where(and_(PantryEvent.item_id == PantryItem.id, PantryEvent.kind == "stock")))
+    )
+    db.execute(insert(PantryEvent).from_select(
+        ["user_id", "item_id", "fdc_id", "kind", "quantity", "created_at"], events))
+
+
+def items_added(db: Session, user_id: int, rows: List[Tuple[int, Optional[float]]], after_id: int):
+    """
+    Record newly inserted items of a user, as (fdc_id, quantity) pairs, in the
+    caller's transaction: a "stock" event for each of the user's items with
+    id > `after_id` that has none yet, and their share of the totals.
+    """
+    db.flush()  # snapshots added in this transaction must be seen below
+    _open(db, user_id, PantryItem.id > after_id)
+    nutrients = _snapshot_nutrients(db, (fdc_id for fdc_id, _q in rows))
+    delta = np.zeros(len(NUTRIENTS))
+    valued = 0
+    for fdc_id, quantity in rows:
+        if fdc_id in nutrients:
+            delta += contribution(nutrients[fdc_id], quantity)
+            valued += 1
+    _apply(db, user_id, delta, items=len(rows), valued_items=valued)
+
+
+def change_quantities(db: Session, user_id: int, changes: List[Tuple[PantryItem, float]], kind: str,
+                      plan_day: Optional[int] = None):
+    """
+    Set items (of one user) to new quantities, recording one `kind` event per
+    item that changed and adjusting the totals, in the caller's transaction.
+    Raises ValueError (before writing anything) if a quantity is negative.
+    """
+    for item, quantity in changes:
+        if quantity < 0:
+            raise ValueError(f"Quantity of pantry item {item.id} cannot go below 0 (got {quantity:g})")
+    changes = [(item, quantity) for item, quantity in changes
+               if abs(quantity - (1.0 if item.quantity is None else item.quantity)) > EPSILON]
+    if not changes:
+        return
+    # items stocked before the ledger existed get their opening balance first
+    _open(db, user_id, PantryItem.id.in_([item.id for item, _q in changes]))
+    nutrients = _snapshot_nutrients(db, (item.fdc_id for item, _q in changes))
+    now = datetime.utcnow()
+    events = []
+    delta = np.zeros(len(NUTRIENTS))
+    for item, quantity in changes:
+        old = 1.0 if item.quantity is None else item.quantity
+        events.append({"user_id": user_id, "item_id": item.id, "fdc_id": item.fdc_id, "kind": kind,
+                       "quantity": quantity - old, "plan_day": plan_day, "created_at": now})
+        if item.fdc_id in nutrients:
+            delta += contribution(nutrients[item.fdc_id], quantity) - contribution(nutrients[item.fdc_id], old)
+        item.quantity = quantity
+    db.execute(insert(PantryEvent), events)
+    _apply(db, user_id, delta)
+
+
+def mark_foods_changed(db: Session, fdc_ids: Iterable[int]):
+    """Nutrients of these foods changed: totals of every user holding one are recomputed on next read."""
+    ids = list(set(fdc_ids))
+    if not ids:
+        return
+    holders = select(PantryItem.user_id).where(PantryItem.fdc_id.in_(ids))
+    db.execute(update(PantryTotals).where(PantryTotals.user_id.in_(holders)).values(stale=True))
+
+
+def recompute_totals(db: Session, user_id: int) -> PantryTotals:
+    """Compute the user's totals from all items (and commit)."""
+    # lock the row first: writers adjusting it wait, and their change is applied on top of this result
+    row = db.query(PantryTotals).filter(PantryTotals.user_id == user_id).with_for_update().first()
+    if row is None:
+        row = PantryTotals(user_id=user_id)
+        db.add(row)
+    items = db.query(PantryItem.fdc_id, PantryItem.quantity).filter(PantryItem.user_id == user_id).all()
+    nutrients = _snapshot_nutrients(db, (fdc_id for fdc_id, _q in items))
+    totals = np.zeros(len(NUTRIENTS))
+    valued = 0
+    for fdc_id, quantity in items:
+        if fdc_id in nutrients:
+            totals += contribution(nutrients[fdc_id], quantity)
+            valued += 1
+    for key, value in zip(NUTRIENTS, totals.tolist()):
+        setattr(row, key, value)
+    row.items = len(items)
+    row.valued_items = valued
+    row.stale = False
+    row.updated_at = datetime.utcnow()
+    db.commit()
+    return row
+
+
+def get_totals(db: Session, user_id: int) -> dict:
+    """The user's pantry totals: one primary-key read unless the row is stale or missing."""
+    row = db.get(PantryTotals, user_id)
+    if row is None or row.stale:
+        row = recompute_totals(db, user_id)
+    out = {
+        "totals": {k: round(getattr(row, k), 2) for k in NUTRIENTS},
+        "items": row.items,
+        "updated_at": row.updated_at.isoformat(),
+    }
+    if row.valued_items < row.items:
+        out.update(items_without_nutrients=row.items - row.valued_items, partial=True)
+    return out
+
+
+def rebuild(db: Session, user_id: int) -> dict:
+    """
+    Repair a user's pantry from the ledger (and commit): items without any
+    event get a "stock" event for their current quantity, every other item's
+    quantity is set to the sum of its events, and the totals are recomputed.
+    """
+    balances = dict(db.query(PantryEvent.item_id, func.sum(PantryEvent.quantity))
+                    .filter(PantryEvent.user_id == user_id).group_by(PantryEvent.item_id))
+    opened = corrected = 0
+    now = datetime.utcnow()
+    for item in db.query(PantryItem).filter(PantryItem.user_id == user_id):
+        quantity = 1.0 if item.quantity is None else item.quantity
+        if item.id not in balances:
+            db.add(PantryEvent(user_id=user_id, item_id=item.id, fdc_id=item.fdc_id, kind="stock",
+                               quantity=quantity, created_at=now))
+            opened += 1
+            continue
+        balance = max(balances[item.id], 0.0)
+        if abs(balance - quantity) > EPSILON:
+            item.quantity = balance
+            corrected += 1
+    if corrected:
+        bump_version(db, user_id)
+    db.flush()
+    totals = recompute_totals(db, user_id)
+    return {"user_id": user_id, "items": totals.items, "opened": opened, "corrected": corrected}
+
+
+def list_events(db: Session, user_id: int, limit: int, before: Optional[int] = None) -> List[PantryEvent]:
+    """The user's events, newest first; `before` is the id of the last event of the previous page."""
+    query = db.query(PantryEvent).filter(PantryEvent.user_id == user_id)
+    if before is not None:
+        query = query.filter(PantryEvent.id < before)
+    return query.order_by(PantryEvent.id.desc()).limit(limit).all()
@@ -0,0 +1,175 @@
+# app/services/pantry_search.py
+"""
+Per-user fuzzy search index over pantry items, kept in the worker so
+search-as-you-type doesn't re-read the pantry on every keystroke.
+
+Each index holds the preprocessed description/category strings and a
+trigram -> rows map. A query is scored (rapidfuzz WRatio, batched with
+process.cdist) only against rows sharing a trigram with it (for tokens
+shorter than a trigram: rows with a trigram containing the token). Indexes
+are built on first search, updated in place when this worker adds or edits
+an item, kept LRU up to PANTRY_SEARCH_MAX_USERS users and rebuilt after
+PANTRY_SEARCH_TTL seconds so changes made through other workers show up.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Set
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+from app.config import settings
+
+FIELDS = ("description", "category")
+GRAM = 3
+
+
+def _grams(text: str) -> Set[str]:
+    out = set()
+    for token in text.split():
+        if len(token) <= GRAM:
+            out.add(token)
+        else:
+            out.update(token[i:i + GRAM] for i in range(len(token) - GRAM + 1))
+    return out
+
+
+def _row(item) -> dict:
+    return {
+        "id": item.id,
+        "description": item.description,
+        "fdc_id": item.fdc_id,
+        "category": item.category,
+        "quantity": item.quantity,
+        "unit_name": item.unit_name,
+    }
+
+
+class PantrySearchIndex:
+    def __init__(self, items: List = ()):
+        self.rows: List[dict] = []
+        self.positions: Dict[int, int] = {}  # pantry item id -> row
+        self.texts: Dict[str, List[str]] = {f: [] for f in FIELDS}
+        self.grams: Dict[str, Dict[str, Set[int]]] = {f: {} for f in FIELDS}
+        self.built_at = time.time()
+        self.lock = threading.Lock()
+        for item in items:
+            self._add(item)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _index_text(self, field: str, pos: int, text: str):
+        for g in _grams(text):
+            self.grams[field].setdefault(g, set()).add(pos)
+
+    def _unindex_text(self, field: str, pos: int, text: str):
+        for g in _grams(text):
+            rows = self.grams[field].get(g)
+            if rows is not None:
+                rows.discard(pos)
+
+    def _add(self, item):
+        pos = len(self.rows)
+        self.rows.append(_row(item))
+        self.positions[item.id] = pos
+        for field in FIELDS:
+            text = default_process(getattr(item, field) or "")
+            self.texts[field].append(text)
+            self._index_text(field, pos, text)
+
+    def add(self, item):
+        with self.lock:
+            if item.id in self.positions:
+                self._update(item)
+            else:
+                self._add(item)
+
+    def _update(self, item):
+        pos = self.positions[item.id]
+        self.rows[pos] = _row(item)
+        for field in FIELDS:
+            text = default_process(getattr(item, field) or "")
+            if text != self.texts[field][pos]:
+                self._unindex_text(field, pos, self.texts[field][pos])
+                self.texts[field][pos] = text
+                self._index_text(field, pos, text)
+
+    def _candidates(self, field: str, query: str) -> np.ndarray:
+        index = self.grams[field]
+        found: Set[int] = set()
+        for g in _grams(query):
+            if len(g) >= GRAM:
+                found |= index.get(g, set())
+            else:
+                # short token (typing has just started): rows with a gram containing it
+                for key, rows in index.items():
+                    if g in key:
+                        found |= rows
+        return np.fromiter(found, dtype=np.int64, count=len(found))
+
+    def _scores(self, field: str, query: str, min_score: float) -> np.ndarray:
+        scores = np.zeros(len(self.rows))
+        candidates = self._candidates(field, query)
+        if not len(candidates):
+            return scores
+        texts = self.texts[field]
+        batch = process.cdist([query], [texts[i] for i in candidates.tolist()], scorer=fuzz.WRatio,
+                              processor=None, score_cutoff=min_score, dtype=np.float64)
+        scores[candidates] = batch[0]
+        return scores
+
+    def search(self, query: str, fields=("description",), limit: int = 25, min_score: float = 30) -> List[dict]:
+        """Best matches first; each row carries its `score` (best over `fields`)."""
+        query = default_process(query)
+        if not query:
+            return []
+        with self.lock:
+            if not self.rows:
+                return []
+            scores = self._scores(fields[0], query, min_score)
+            for field in fields[1:]:
+                scores = np.maximum(scores, self._scores(field, query, min_score))
+            hits = np.nonzero(scores >= min_score)[0]
+            if len(hits) > limit:
+                hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+            # highest score first, earlier rows first on ties (like process.extract)
+            hits = hits[np.lexsort((hits, -scores[hits]))]
+            return [dict(self.rows[i], score=float(scores[i])) for i in hits.tolist()]
+
+
+_indexes: "OrderedDict[int, PantrySearchIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(user_id: int, load: Callable[[], List]) -> PantrySearchIndex:
+    """The user's index, built from `load()` (their pantry rows) when missing or expired."""
+    now = time.time()
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is not None and now - index.built_at <= settings.PANTRY_SEARCH_TTL:
+            _indexes.move_to_end(user_id)
+            return index
+    index = PantrySearchIndex(load())
+    with _indexes_lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > settings.PANTRY_SEARCH_MAX_USERS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def index_item(item):
+    """Add or refresh one pantry row in its owner's index, if that index is loaded."""
+    with _indexes_lock:
+        index = _indexes.get(item.user_id)
+    if index is not None:
+        index.add(item)
+
+
+def evict(user_id: int):
+    """Drop the user's index (e.g. after a bulk write); it is rebuilt on the next search."""
+    with _indexes_lock:
+        _indexes.pop(user_id, None)
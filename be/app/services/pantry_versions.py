@@ -0,0 +1,24 @@
+# app/services/pantry_versions.py
+"""
+Per-user pantry version: a counter bumped in the same transaction as every
+pantry write, so readers can tell cheaply (one primary-key lookup) whether a
+user's pantry changed since they last looked.
+"""
+from sqlalchemy.orm import Session
+
+from app.db.insert import insert_ignore
+from app.models.pantry import PantryVersion
+
+
+def get_version(db: Session, user_id: int) -> int:
+    row = db.get(PantryVersion, user_id)
+    return row.version if row is not None else 0
+
+
+def bump_version(db: Session, user_id: int):
+    """Increment the user's version; call before committing the pantry change."""
+    # two first writes of a user may race to create the row: the loser's insert is a no-op, not an IntegrityError
+    insert_ignore(db, PantryVersion, [{"user_id": user_id, "version": 0}])
+    db.query(PantryVersion).filter(PantryVersion.user_id == user_id).update(
+        {PantryVersion.version: PantryVersion.version + 1}, synchronize_session=False
+    )
@@ -1,4 +1,16 @@
-from typing import Dict
+from typing import Dict, Sequence
+
+import numpy as np
+
+ACTIVITY_MULTIPLIERS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725
+}
+ACTIVITY_LEVELS = tuple(ACTIVITY_MULTIPLIERS)
+GOAL_ADJUSTMENTS = {"lose": -500, "gain": 300}  # kcal/day on top of maintenance
+GOALS = ("lose", "maintain", "gain")
 
 def calc_bmi(weight_kg: float, height_cm: float) -> float:
     if not height_cm or height_cm <= 0:
@@ -8,25 +20,18 @@ def calc_bmi(weight_kg: float, height_cm: float) -> float:
 
 def bmr_mifflin_segor(weight_kg: float, height_cm: float, age: int, gender: str) -> float:
     # Mifflin-St Jeor
-    s = 5 if gender and gender.lower() == "male" else -161
-    return (10 * weight_kg) + (6.25 * height_cm) - (5 * age) + s
+    return (10 * weight_kg) + (6.25 * height_cm) - (5 * age) + _sex_offset(gender)
+
+def _sex_offset(gender: str) -> int:
+    return 5 if gender and gender.lower() == "male" else -161
 
 def activity_multiplier(level: str) -> float:
     level = (level or "").lower()
-    return {
-        "sedentary": 1.2,
-        "light": 1.375,
-        "moderate": 1.55,
-        "active": 1.725
-    }.get(level, 1.2)
+    return ACTIVITY_MULTIPLIERS.get(level, 1.2)
 
 def calorie_target(bmr: float, activity_level: str, goal: str = "maintain") -> float:
     cal = bmr * activity_multiplier(activity_level)
-    if goal == "lose":
-        return cal - 500
-    elif goal == "gain":
-        return cal + 300
-    return cal
+    return cal + GOAL_ADJUSTMENTS.get(goal, 0)
 
 def macros_from_calories(calories: float, protein_pct=0.25, fat_pct=0.25, carbs_pct=0.5) -> Dict[str, float]:
     # calories to grams: protein 4 kcal/g, carbs 4 kcal/g, fat 9 kcal/g
@@ -47,3 +52,107 @@ def nutrition_profile_from_user(user: dict, goal: str = "maintain"):
     calories = calorie_target(bmr, activity, goal)
     macros = macros_from_calories(calories)
     return {"bmi": round(bmi,1), "bmr": round(bmr,1), "nutrition": macros}
+
+def profile_from_user(user) -> dict:
+    """nutrition_profile_from_user input from a User row (defaults for unset age/gender/activity)."""
+    return {
+        "weight_kg": user.weight_kg,
+        "height_cm": user.height_cm,
+        "age": user.age or 30,
+        "gender": user.gender or "male",
+        "activity_level": user.activity_level or "sedentary"
+    }
+
+
+# -------------------------
+# Batch (column) versions
+# -------------------------
+# Same formulas over NumPy columns, one value per user/scenario: results are
+# identical to the scalar functions above, element by element. Label columns
+# (gender, activity_level, goal) may be any sequence of strings/None or a
+# single label for all rows; numeric columns anything np.asarray accepts.
+# Missing numbers (None/NaN) give NaN where the scalar functions would raise.
+
+def _numbers(values) -> np.ndarray:
+    return np.asarray(values, dtype=float)
+
+def _labels(values, fn) -> np.ndarray:
+    """fn(label) for each label, computed once per distinct label."""
+    if values is None or isinstance(values, str):
+        return np.asarray(float(fn(values)))
+    memo = {label: fn(label) for label in set(values)}
+    return np.fromiter(map(memo.__getitem__, values), dtype=float, count=len(values))
+
+def _round1(values) -> np.ndarray:
+    """round(x, 1) for every element."""
+    values = _numbers(values)
+    scaled = values * 10
+    rounded = np.rint(scaled)
+    # rint(x * 10) differs from round(x, 1) only where the product was rounded
+    # onto a .5 tie that the exact x * 10 is not on. Its rounding error tells
+    # which side the exact value lies (computed exactly: 8x and 2x are exact
+    # and 8x - x*10 has no rounding error by Sterbenz' lemma)
+    with np.errstate(invalid="ignore"):
+        error = (values * 8 - scaled) + values * 2
+        off_tie = (scaled - np.floor(scaled) == 0.5) & (error != 0)
+    if off_tie.any():
+        rounded = np.where(off_tie, np.where(error > 0, np.ceil(scaled), np.floor(scaled)), rounded)
+    out = rounded / 10
+    huge = np.flatnonzero(np.abs(scaled) >= 2.0 ** 52)  # x * 10 past integer precision: no exact shortcut
+    if huge.size:
+        out = np.array(out)
+        out.flat[huge] = [round(float(v), 1) for v in values.flat[huge]]
+    return out
+
+def calc_bmi_batch(weight_kg, height_cm) -> np.ndarray:
+    weight, height = _numbers(weight_kg), _numbers(height_cm)
+    h_m = height / 100.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(height <= 0, 0.0, weight / (h_m * h_m))
+
+def bmr_mifflin_segor_batch(weight_kg, height_cm, age, gender) -> np.ndarray:
+    return (10 * _numbers(weight_kg)) + (6.25 * _numbers(height_cm)) - (5 * _numbers(age)) \
+        + _labels(gender, _sex_offset)
+
+def activity_multiplier_batch(level) -> np.ndarray:
+    return _labels(level, activity_multiplier)
+
+def calorie_target_batch(bmr, activity_level, goal="maintain") -> np.ndarray:
+    return _numbers(bmr) * activity_multiplier_batch(activity_level) \
+        + _labels(goal, lambda g: GOAL_ADJUSTMENTS.get(g, 0))
+
+def macros_from_calories_batch(calories, protein_pct=0.25, fat_pct=0.25, carbs_pct=0.5) -> Dict[str, np.ndarray]:
+    calories = _numbers(calories)
+    return {
+        "calories": _round1(calories),
+        "protein_g": _round1((calories * protein_pct) / 4),
+        "fat_g": _round1((calories * fat_pct) / 9),
+        "carbs_g": _round1((calories * carbs_pct) / 4),
+    }
+
+def nutrition_profiles(weight_kg, height_cm, age=30, gender="male", activity_level="sedentary",
+                       goal="maintain") -> Dict[str, np.ndarray]:
+    """
+    nutrition_profile_from_user for many users/scenarios at once:
+    {"bmi", "bmr", "calories", "protein_g", "fat_g", "carbs_g"} arrays.
+    """
+    bmr = bmr_mifflin_segor_batch(weight_kg, height_cm, age, gender)
+    out = {"bmi": _round1(calc_bmi_batch(weight_kg, height_cm)), "bmr": _round1(bmr)}
+    out.update(macros_from_calories_batch(calorie_target_batch(bmr, activity_level, goal)))
+    return out
+
+def scenario_grid(weight_kg, height_cm, age=30, gender="male", goals: Sequence[str] = GOALS,
+                  activity_levels: Sequence[str] = ACTIVITY_LEVELS) -> Dict:
+    """
+    Targets for every goal x activity level combination: "calories" and
+    the macros have shape (*users, len(goals), len(activity_levels)), "bmi"
+    and "bmr" (which depend on neither) the shape of the inputs.
+    """
+    bmr = bmr_mifflin_segor_batch(weight_kg, height_cm, age, gender)
+    multipliers = activity_multiplier_batch(list(activity_levels))
+    adjustments = _labels(list(goals), lambda g: GOAL_ADJUSTMENTS.get(g, 0))
+    calories = bmr[..., None, None] * multipliers + adjustments[:, None]
+    out = {"goals": list(goals), "activity_levels": list(activity_levels),
+           "bmi": _round1(calc_bmi_batch(weight_kg, height_cm)), "bmr": _round1(bmr)}
+    out.update(macros_from_calories_batch(calories))
+    return out
@@ -0,0 +1,155 @@
+# app/services/resilience.py
+"""
+Failure handling for upstream (USDA) calls, shared by the sync and async
+clients of a process:
+
+- CircuitBreaker: after USDA_BREAKER_FAILURES consecutive failures calls fail
+  fast (UpstreamUnavailable) for USDA_BREAKER_RESET seconds, then one probe
+  is let through; its outcome closes or re-opens the circuit.
+- RetryBudget: retries may add at most USDA_RETRY_BUDGET_RATIO extra load on
+  top of first attempts (plus a small floor per second), so retries can't
+  multiply traffic against an upstream that is already struggling.
+- backoff(): capped exponential backoff with full jitter.
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.config import settings
+from app.services.metrics import REGISTRY
+
+BREAKER_STATE = REGISTRY.gauge("usda_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+                               ("endpoint",))
+RETRIES = REGISTRY.counter("usda_retries_total", "USDA call retries", ("endpoint",))
+REJECTED = REGISTRY.counter("usda_rejected_total", "USDA calls failed fast (circuit open or retry budget spent)",
+                            ("endpoint", "reason"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamUnavailable(RuntimeError):
+    """USDA could not be reached (down, timing out, or the circuit is open)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(0, endpoint=name)
+
+    def _set_state(self, state: str):
+        self.state = state
+        BREAKER_STATE.set(_STATE_VALUE[state], endpoint=self.name)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (in half-open state only one probe at a time)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self._clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+            now = self._clock()
+            # a probe that never reported back (e.g. cancelled) doesn't block the circuit forever
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                return False
+            self._probe_started = now
+            return True
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_started = None
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_started = None
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = self._clock()
+                self._set_state(OPEN)
+
+
+class RetryBudget:
+    def __init__(self, ratio: float, min_per_sec: float, max_tokens: float = 100.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens * 0.1
+        self._clock = clock
+        self._refilled = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._refilled) * self.min_per_sec)
+        self._refilled = now
+
+    def deposit(self):
+        """Called once per first attempt."""
+        with self._lock:
+            self._refill(self._clock())
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take one retry from the budget; False when it is spent."""
+        with self._lock:
+            self._refill(self._clock())
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+def backoff(attempt: int, rng: random.Random = random) -> float:
+    """Seconds to wait before retry number `attempt` (0-based)."""
+    cap = min(settings.USDA_RETRY_BACKOFF_MAX, settings.USDA_RETRY_BACKOFF_BASE * 2 ** attempt)
+    return rng.uniform(0, cap)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_budget: Optional[RetryBudget] = None
+_lock = threading.Lock()
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.get(endpoint)
+            if breaker is None:
+                breaker = _breakers[endpoint] = CircuitBreaker(
+                    endpoint, settings.USDA_BREAKER_FAILURES, settings.USDA_BREAKER_RESET)
+    return breaker
+
+
+def get_retry_budget() -> RetryBudget:
+    global _budget
+    if _budget is None:
+        with _lock:
+            if _budget is None:
+                _budget = RetryBudget(settings.USDA_RETRY_BUDGET_RATIO, settings.USDA_RETRY_BUDGET_MIN_PER_SEC)
+    return _budget
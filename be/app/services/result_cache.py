@@ -0,0 +1,42 @@
+# app/services/result_cache.py
+"""
+Cache of computed responses (pantry aggregation, weekly diet) keyed by a
+content hash of everything the result depends on: the pantry version, the
+user's profile fields and the request parameters. A pantry write bumps the
+version and a profile edit changes the fields, so either produces a new key
+and the old entry simply ages out of the bounded LRU.
+"""
+import hashlib
+import json
+import threading
+from typing import Optional
+
+from app.config import settings
+from app.services.cache import BaseCache, build_cache
+
+PROFILE_FIELDS = ("weight_kg", "height_cm", "age", "gender", "activity_level")
+
+_cache: Optional[BaseCache] = None
+_lock = threading.Lock()
+
+
+def get_result_cache() -> BaseCache:
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = build_cache(settings.RESULT_CACHE_BACKEND, prefix="RESULT_CACHE")
+    return _cache
+
+
+def result_key(kind: str, user_id: int, pantry_version: int, profile=None, **params) -> str:
+    """Content hash of the inputs of a `kind` result; pass `profile` (a User) when it matters."""
+    inputs = {
+        "kind": kind,
+        "user_id": user_id,
+        "pantry_version": pantry_version,
+        "profile": {f: getattr(profile, f) for f in PROFILE_FIELDS} if profile is not None else None,
+        "params": params,
+    }
+    digest = hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"result:{kind}:{digest}"
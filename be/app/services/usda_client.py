@@ -1,51 +1,375 @@
 # app/services/usda_client.py
 
+import asyncio
 import httpx
-from app.config import settings
-from typing import Optional
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from app.config import settings
+from app.services.cache import BaseCache, build_cache
+from app.services.metrics import USDA_REQUEST_SECONDS
+from app.services.resilience import (REJECTED, RETRIES, CircuitBreaker, UpstreamUnavailable, backoff, get_breaker,
+                                     get_retry_budget)
+from app.utils import fastjson
+from typing import Dict, Iterable, List, Optional, Tuple
 
-BASE = "https://api.nal.usda.gov/fdc/v1"
+FOODS_BATCH_LIMIT = 20  # FDC caps the multi-ID /foods endpoint at 20 IDs per call
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
-class USDAClient:
-    def __init__(self, api_key: Optional[str] = None, timeout: int = 15):
-        self.api_key = api_key or settings.FDC_API_KEY
-        self.client = httpx.Client(timeout=timeout)
-        self._cache = {}
-        self._cache_ttl = 3600  # 1 hour cache
 
-    def _cache_get(self, key):
-        item = self._cache.get(key)
-        if not item:
+# -------------------------
+# Shared request/response handling (sync + async clients)
+# -------------------------
+def _search_response(r: httpx.Response):
+    # If the API fails → give clear message
+    try:
+        r.raise_for_status()
+    except Exception:
+        raise RuntimeError(f"USDA Search failed: {r.text}")
+
+    return r.json()
+
+
+def _food_response(r: httpx.Response, fdc_id: int) -> dict:
+    if r.status_code == 404:
+        raise ValueError(f"USDA: Food with FDC ID {fdc_id} not found.")
+
+    try:
+        r.raise_for_status()
+    except Exception:
+        raise RuntimeError(f"USDA get_food failed: {r.text}")
+
+    data = r.json()
+
+    if not isinstance(data, dict):
+        raise RuntimeError(f"USDA returned unexpected data format for {fdc_id}")
+
+    return data
+
+
+def _foods_response(r: httpx.Response) -> List[dict]:
+    try:
+        r.raise_for_status()
+    except Exception:
+        raise RuntimeError(f"USDA get_foods failed: {r.text}")
+
+    data = r.json()
+
+    if not isinstance(data, list):
+        raise RuntimeError("USDA returned unexpected data format for /foods")
+
+    return data
+
+
+def _endpoint(url: httpx.URL) -> str:
+    path = url.path.rstrip("/")
+    if path.endswith("/foods/search"):
+        return "search"
+    return "foods" if path.endswith("/foods") else "food"
+
+
+def _metric_hooks(kind: str, asynchronous: bool = False) -> dict:
+    """httpx event hooks timing every USDA call up to its response headers."""
+    def on_request(request: httpx.Request):
+        request.extensions["started"] = time.perf_counter()
+
+    def on_response(response: httpx.Response):
+        request = response.request
+        USDA_REQUEST_SECONDS.observe(time.perf_counter() - request.extensions["started"], client=kind,
+                                     endpoint=_endpoint(request.url), status=response.status_code)
+
+    if not asynchronous:
+        return {"request": [on_request], "response": [on_response]}
+
+    async def on_request_async(request):
+        on_request(request)
+
+    async def on_response_async(response):
+        on_response(response)
+
+    return {"request": [on_request_async], "response": [on_response_async]}
+
+
+def _timeout(endpoint: str) -> httpx.Timeout:
+    read = {
+        "search": settings.USDA_TIMEOUT_SEARCH,
+        "food": settings.USDA_TIMEOUT_FOOD,
+        "foods": settings.USDA_TIMEOUT_FOODS,
+    }[endpoint]
+    return httpx.Timeout(read, connect=settings.USDA_CONNECT_TIMEOUT)
+
+
+def _dedupe_ids(fdc_ids: Iterable[int]) -> List[int]:
+    wanted = []
+    seen = set()
+    for fdc_id in fdc_ids:
+        if fdc_id is None or fdc_id <= 0:
+            raise ValueError(f"Invalid FDC ID: {fdc_id}")
+        if fdc_id not in seen:
+            seen.add(fdc_id)
+            wanted.append(fdc_id)
+    return wanted
+
+
+def _chunks(ids: List[int]) -> List[List[int]]:
+    return [ids[i:i + FOODS_BATCH_LIMIT] for i in range(0, len(ids), FOODS_BATCH_LIMIT)]
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-fold a search query so near-identical queries share a cache key."""
+    return " ".join((query or "").casefold().split())
+
+
+def _search_key(query: str, page_size: int, page_number: int) -> str:
+    return f"search:{page_size}:{page_number}:{query}"
+
+
+def _default_local_store():
+    if settings.USDA_MODE == "remote":
+        return None
+    from app.services.fdc_local import get_local_store
+    return get_local_store(settings.USDA_LOCAL_DB)
+
+
+class _CachedClientMixin:
+    """Cache plumbing shared by USDAClient and AsyncUSDAClient."""
+
+    _cache: BaseCache
+    _search_cache: BaseCache
+    _local = None  # LocalFoodStore when USDA_MODE is "local" / "local_first"
+    _local_only = False
+
+    def _init_local(self, local_store):
+        self._local = local_store if local_store is not None else _default_local_store()
+        self._local_only = self._local is not None and settings.USDA_MODE == "local"
+
+    def _local_food(self, fdc_id: int) -> Optional[dict]:
+        if self._local is None:
             return None
+        food = self._local.get_food(fdc_id)
+        if food is None and self._local_only:
+            raise ValueError(f"USDA: Food with FDC ID {fdc_id} not found.")
+        return food
+
+    def _local_foods(self, fdc_ids: List[int]) -> Tuple[Dict[int, dict], List[int]]:
+        """Return (found locally, IDs still to look up remotely)."""
+        if self._local is None:
+            return {}, fdc_ids
+        found = self._local.get_foods(fdc_ids)
+        if self._local_only:
+            return found, []
+        return found, [i for i in fdc_ids if i not in found]
 
-        ts, value = item
-        if time.time() - ts > self._cache_ttl:
-            self._cache.pop(key, None)
+    def _local_search(self, query: str, page_size: int, page_number: int) -> Optional[dict]:
+        if self._local is None:
             return None
+        result = self._local.search(query, page_size=page_size, page_number=page_number)
+        if result is None and self._local_only:
+            return {"totalHits": 0, "currentPage": page_number, "totalPages": 0, "foods": []}
+        return result
 
-        return value
+    def _admit(self, endpoint: str) -> CircuitBreaker:
+        """Fail fast while the endpoint's circuit is open."""
+        breaker = get_breaker(endpoint)
+        if not breaker.allow():
+            REJECTED.inc(endpoint=endpoint, reason="circuit_open")
+            raise UpstreamUnavailable(f"USDA {endpoint} unavailable (circuit open)", breaker.retry_after())
+        get_retry_budget().deposit()
+        return breaker
+
+    def _retry_delay(self, endpoint: str, breaker: CircuitBreaker, attempt: int,
+                     response: Optional[httpx.Response], error: Optional[Exception]) -> Optional[float]:
+        """
+        Record one attempt's outcome. Returns None when `response` should be
+        handed back, otherwise how long to wait before retrying; raises
+        UpstreamUnavailable when giving up.
+        """
+        if error is None and response.status_code not in RETRY_STATUS:
+            breaker.record_success()
+            return None
+        breaker.record_failure()
+        reason = f"HTTP {response.status_code}" if error is None else (str(error) or type(error).__name__)
+        if attempt >= settings.USDA_RETRIES or not breaker.allow():
+            raise UpstreamUnavailable(f"USDA {endpoint} failed after {attempt + 1} attempt(s): {reason}",
+                                      breaker.retry_after() or None)
+        if not get_retry_budget().withdraw():
+            REJECTED.inc(endpoint=endpoint, reason="retry_budget")
+            raise UpstreamUnavailable(f"USDA {endpoint} failed: {reason} (retry budget spent)")
+        RETRIES.inc(endpoint=endpoint)
+        return backoff(attempt)
+
+    def _cache_get(self, key):
+        value, stale = self._cache.get(key)
+        return value, stale
 
     def _cache_set(self, key, value):
-        self._cache[key] = (time.time(), value)
+        self._cache.set(key, value)
 
-    def search_foods(self, query: str, page_size: int = 25, page_number: int = 1):
-        url = f"{BASE}/foods/search"
+    def cache_stats(self) -> dict:
+        return self._cache.stats()
+
+    def search_cache_stats(self) -> dict:
+        return self._search_cache.stats()
+
+    def _search_cache_lookup(self, query: str, page_size: int, page_number: int,
+                             raw: bool = False) -> Tuple[Optional[dict], bool]:
+        """Return (result, stale) from the search cache; with raw=True the result is JSON bytes."""
+        key = _search_key(query, page_size, page_number)
+        return self._search_cache.get_raw(key) if raw else self._search_cache.get(key)
+
+    def _split_cached(self, fdc_ids: List[int]) -> Tuple[Dict[int, dict], List[int], List[int]]:
+        """Return (found, missing, stale) for the given IDs."""
+        found: Dict[int, dict] = {}
+        missing = []
+        stale_ids = []
+        for fdc_id in fdc_ids:
+            cached, stale = self._cache_get(f"food:{fdc_id}")
+            if cached:
+                if stale:
+                    stale_ids.append(fdc_id)
+                found[fdc_id] = cached
+            else:
+                missing.append(fdc_id)
+        return found, missing, stale_ids
+
+    def _store_foods(self, foods: List[dict], found: Dict[int, dict]):
+        for food in foods:
+            if not isinstance(food, dict) or food.get("fdcId") is None:
+                continue
+            fdc_id = int(food["fdcId"])
+            self._cache_set(f"food:{fdc_id}", food)
+            found[fdc_id] = food
+
+
+class USDAClient(_CachedClientMixin):
+    def __init__(self, api_key: Optional[str] = None, timeout: int = 15, cache: Optional[BaseCache] = None,
+                 search_cache: Optional[BaseCache] = None, local_store=None):
+        self.api_key = api_key or settings.FDC_API_KEY
+        self.base_url = settings.USDA_BASE_URL.rstrip("/")
+        self.client = httpx.Client(timeout=timeout, event_hooks=_metric_hooks("sync"))
+        self._init_local(local_store)
+        self._cache = cache if cache is not None else get_usda_cache()
+        self._search_cache = search_cache if search_cache is not None else get_usda_search_cache()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._batch_pool = ThreadPoolExecutor(max_workers=settings.USDA_BATCH_CONCURRENCY,
+                                              thread_name_prefix="usda-batch")
+
+    def _request(self, endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """One USDA call with the endpoint's timeout, bounded retries and circuit breaker."""
+        breaker = self._admit(endpoint)
+        attempt = 0
+        while True:
+            response = error = None
+            try:
+                response = self.client.request(method, url, timeout=_timeout(endpoint), **kwargs)
+            except httpx.HTTPError as e:
+                error = e
+            delay = self._retry_delay(endpoint, breaker, attempt, response, error)
+            if delay is None:
+                return response
+            time.sleep(delay)
+            attempt += 1
+
+    def _single_flight(self, key: str, fn):
+        """Run fn() once for concurrent callers with the same key; followers share its result."""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _revalidate(self, key, fetch, store=None):
+        """Refresh a stale cache entry in the background (at most one refresh per key)."""
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        store = store or self._cache_set
+
+        def run():
+            try:
+                store(key, fetch())
+            except Exception:
+                # keep serving the stale value; the next lookup will retry
+                pass
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _revalidate_foods(self, fdc_ids: List[int]):
+        """Refresh stale food records with one background batch lookup (skipping those already refreshing)."""
+        with self._refresh_lock:
+            keys = {f"food:{i}": i for i in fdc_ids if f"food:{i}" not in self._refreshing}
+            self._refreshing.update(keys)
+        if not keys:
+            return
+
+        def run():
+            try:
+                for chunk in _chunks(list(keys.values())):
+                    try:
+                        self._store_foods(self._fetch_foods_chunk(chunk), {})
+                    except Exception:
+                        # keep serving the chunk's stale values; the next lookup will retry
+                        pass
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.difference_update(keys)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _fetch_search(self, query: str, page_size: int, page_number: int):
+        url = f"{self.base_url}/foods/search"
         params = {
             "api_key": self.api_key,
             "query": query,
             "pageSize": page_size,
             "pageNumber": page_number,
         }
-        r = self.client.get(url, params=params)
+        r = self._request("search", "GET", url, params=params)
+        return _search_response(r)
 
-        # If the API fails → give clear message
-        try:
-            r.raise_for_status()
-        except Exception:
-            raise RuntimeError(f"USDA Search failed: {r.text}")
+    def search_foods(self, query: str, page_size: int = 25, page_number: int = 1):
+        query = normalize_query(query)
+        local = self._local_search(query, page_size, page_number)
+        if local is not None:
+            return local
+        key = _search_key(query, page_size, page_number)
+        cached, stale = self._search_cache_lookup(query, page_size, page_number)
+        if cached is not None:
+            if stale:
+                self._revalidate(key, lambda: self._fetch_search(query, page_size, page_number),
+                                 store=self._search_cache.set)
+            return cached
 
-        return r.json()
+        def fetch():
+            data = self._fetch_search(query, page_size, page_number)
+            self._search_cache.set(key, data)
+            return data
+
+        return self._single_flight(key, fetch)
+
+    def _fetch_food(self, fdc_id: int) -> dict:
+        r = self._request("food", "GET", f"{self.base_url}/foods/{fdc_id}", params={"api_key": self.api_key})
+        return _food_response(r, fdc_id)
 
     def get_food(self, fdc_id: int):
         """Always returns a dictionary or raises an exception."""
@@ -53,28 +377,299 @@ class USDAClient:
         if fdc_id is None or fdc_id <= 0:
             raise ValueError(f"Invalid FDC ID: {fdc_id}")
 
+        local = self._local_food(fdc_id)
+        if local is not None:
+            return local
+
         cache_key = f"food:{fdc_id}"
-        cached = self._cache_get(cache_key)
+        cached, stale = self._cache_get(cache_key)
         if cached:
+            if stale:
+                self._revalidate(cache_key, lambda: self._fetch_food(fdc_id))
             return cached
 
-        url = f"{BASE}/foods/{fdc_id}"
-        params = {"api_key": self.api_key}
+        data = self._fetch_food(fdc_id)
+        self._cache_set(cache_key, data)
+        return data
+
+    def _fetch_foods_chunk(self, fdc_ids: List[int]) -> List[dict]:
+        r = self._request("foods", "POST", f"{self.base_url}/foods", params={"api_key": self.api_key},
+                          json={"fdcIds": fdc_ids})
+        return _foods_response(r)
 
-        r = self.client.get(url, params=params)
+    def get_foods(self, fdc_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        Bulk lookup. Returns {fdc_id: food} for every ID USDA knows about;
+        unknown IDs are simply absent. Duplicate IDs are fetched once, cached
+        records are served locally and the rest go out in 20-ID chunks that
+        are dispatched concurrently.
+        """
+        found, unavailable = self.get_foods_partial(fdc_ids)
+        if unavailable:
+            raise unavailable[0][1]
+        return found
 
-        if r.status_code == 404:
-            raise ValueError(f"USDA: Food with FDC ID {fdc_id} not found.")
+    def get_foods_partial(self, fdc_ids: Iterable[int]) -> Tuple[Dict[int, dict], List[Tuple[List[int], Exception]]]:
+        """
+        Like get_foods, but chunks that fail upstream don't fail the whole
+        lookup: returns (found, [(chunk IDs, error), ...]).
+        """
+        local, remote_ids = self._local_foods(_dedupe_ids(fdc_ids))
+        found, missing, stale_ids = self._split_cached(remote_ids)
+        found.update(local)
+        if stale_ids:
+            self._revalidate_foods(stale_ids)
 
-        try:
-            r.raise_for_status()
-        except Exception:
-            raise RuntimeError(f"USDA get_food failed: {r.text}")
+        chunks = _chunks(missing)
+        if len(chunks) == 1:
+            futures = None
+        else:
+            futures = [self._batch_pool.submit(self._fetch_foods_chunk, c) for c in chunks]
+        unavailable = []
+        for i, chunk in enumerate(chunks):
+            try:
+                foods = self._fetch_foods_chunk(chunk) if futures is None else futures[i].result()
+            except RuntimeError as e:  # incl. UpstreamUnavailable
+                unavailable.append((chunk, e))
+                continue
+            self._store_foods(foods, found)
+        return found, unavailable
 
-        data = r.json()
 
-        if not isinstance(data, dict):
-            raise RuntimeError(f"USDA returned unexpected data format for {fdc_id}")
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
 
+
+class AsyncUSDAClient(_CachedClientMixin):
+    """
+    Non-blocking USDA client for the request path. One instance (and so one
+    keep-alive connection pool) is created per worker by the app lifespan and
+    closed on shutdown; it shares its response cache with USDAClient.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, timeout: int = 15, cache: Optional[BaseCache] = None,
+                 search_cache: Optional[BaseCache] = None, local_store=None):
+        self.api_key = api_key or settings.FDC_API_KEY
+        self.base_url = settings.USDA_BASE_URL.rstrip("/")
+        self._init_local(local_store)
+        limits = httpx.Limits(
+            max_connections=settings.USDA_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.USDA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.USDA_KEEPALIVE_EXPIRY,
+        )
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=limits,
+            http2=settings.USDA_HTTP2 and _http2_available(),
+            event_hooks=_metric_hooks("async", asynchronous=True),
+        )
+        self._cache = cache if cache is not None else get_usda_cache()
+        self._search_cache = search_cache if search_cache is not None else get_usda_search_cache()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._batch_semaphore = asyncio.Semaphore(settings.USDA_BATCH_CONCURRENCY)
+
+    async def _request(self, endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Async counterpart of USDAClient._request."""
+        breaker = self._admit(endpoint)
+        attempt = 0
+        while True:
+            response = error = None
+            try:
+                response = await self.client.request(method, url, timeout=_timeout(endpoint), **kwargs)
+            except httpx.HTTPError as e:
+                error = e
+            delay = self._retry_delay(endpoint, breaker, attempt, response, error)
+            if delay is None:
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _single_flight(self, key: str, fetch):
+        """Await one fetch() for concurrent callers with the same key; followers share its result."""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _f: self._inflight.pop(key, None))
+        # shield: one caller going away must not cancel the shared upstream call
+        return await asyncio.shield(future)
+
+    def _revalidate(self, key, fetch, store=None):
+        """Refresh a stale cache entry in a background task (at most one refresh per key)."""
+        if key in self._refreshing:
+            return
+        store = store or self._cache_set
+
+        async def run():
+            try:
+                store(key, await fetch())
+            except Exception:
+                # keep serving the stale value; the next lookup will retry
+                pass
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.get_running_loop().create_task(run())
+
+    def _revalidate_foods(self, fdc_ids: List[int]):
+        """Refresh stale food records with one background batch lookup (skipping those already refreshing)."""
+        keys = {f"food:{i}": i for i in fdc_ids if f"food:{i}" not in self._refreshing}
+        if not keys:
+            return
+
+        async def run():
+            try:
+                chunks = _chunks(list(keys.values()))
+                for foods in await asyncio.gather(*map(self._fetch_foods_chunk, chunks), return_exceptions=True):
+                    # a failed chunk keeps serving its stale values; the next lookup will retry
+                    if not isinstance(foods, BaseException):
+                        self._store_foods(foods, {})
+            finally:
+                for key in keys:
+                    self._refreshing.pop(key, None)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._refreshing.update(dict.fromkeys(keys, task))
+
+    async def _fetch_search(self, query: str, page_size: int, page_number: int):
+        url = f"{self.base_url}/foods/search"
+        params = {
+            "api_key": self.api_key,
+            "query": query,
+            "pageSize": page_size,
+            "pageNumber": page_number,
+        }
+        r = await self._request("search", "GET", url, params=params)
+        return _search_response(r)
+
+    async def search_foods(self, query: str, page_size: int = 25, page_number: int = 1, raw: bool = False):
+        """
+        raw=True returns the result as JSON bytes; cache hits are then passed
+        through without decoding and re-encoding the document.
+        """
+        query = normalize_query(query)
+        local = self._local_search(query, page_size, page_number)
+        if local is not None:
+            return fastjson.dumps(local) if raw else local
+        key = _search_key(query, page_size, page_number)
+        cached, stale = self._search_cache_lookup(query, page_size, page_number, raw=raw)
+        if cached is not None:
+            if stale:
+                self._revalidate(key, lambda: self._fetch_search(query, page_size, page_number),
+                                 store=self._search_cache.set)
+            return cached
+
+        async def fetch():
+            data = await self._fetch_search(query, page_size, page_number)
+            self._search_cache.set(key, data)
+            return data
+
+        data = await self._single_flight(key, fetch)
+        return fastjson.dumps(data) if raw else data
+
+    async def _fetch_food(self, fdc_id: int) -> dict:
+        r = await self._request("food", "GET", f"{self.base_url}/foods/{fdc_id}", params={"api_key": self.api_key})
+        return _food_response(r, fdc_id)
+
+    async def get_food(self, fdc_id: int, raw: bool = False):
+        """
+        Always returns a dictionary (JSON bytes with raw=True, cache hits passed
+        through without a decode/re-encode) or raises an exception.
+        """
+
+        if fdc_id is None or fdc_id <= 0:
+            raise ValueError(f"Invalid FDC ID: {fdc_id}")
+
+        local = self._local_food(fdc_id)
+        if local is not None:
+            return fastjson.dumps(local) if raw else local
+
+        cache_key = f"food:{fdc_id}"
+        cached, stale = self._cache.get_raw(cache_key) if raw else self._cache_get(cache_key)
+        if cached:
+            if stale:
+                self._revalidate(cache_key, lambda: self._fetch_food(fdc_id))
+            return cached
+
+        data = await self._fetch_food(fdc_id)
         self._cache_set(cache_key, data)
-        return data
+        return fastjson.dumps(data) if raw else data
+
+    async def _fetch_foods_chunk(self, fdc_ids: List[int]) -> List[dict]:
+        async with self._batch_semaphore:
+            r = await self._request("foods", "POST", f"{self.base_url}/foods", params={"api_key": self.api_key},
+                                    json={"fdcIds": fdc_ids})
+        return _foods_response(r)
+
+    async def get_foods(self, fdc_ids: Iterable[int]) -> Dict[int, dict]:
+        """Async counterpart of USDAClient.get_foods; chunks are fetched concurrently."""
+        found, unavailable = await self.get_foods_partial(fdc_ids)
+        if unavailable:
+            raise unavailable[0][1]
+        return found
+
+    async def get_foods_partial(self, fdc_ids: Iterable[int]) -> Tuple[Dict[int, dict],
+                                                                       List[Tuple[List[int], Exception]]]:
+        """Async counterpart of USDAClient.get_foods_partial."""
+        local, remote_ids = self._local_foods(_dedupe_ids(fdc_ids))
+        found, missing, stale_ids = self._split_cached(remote_ids)
+        found.update(local)
+        if stale_ids:
+            self._revalidate_foods(stale_ids)
+
+        chunks = _chunks(missing)
+        results = await asyncio.gather(*(self._fetch_foods_chunk(c) for c in chunks), return_exceptions=True)
+        unavailable = []
+        for chunk, foods in zip(chunks, results):
+            if isinstance(foods, RuntimeError):  # incl. UpstreamUnavailable
+                unavailable.append((chunk, foods))
+            elif isinstance(foods, BaseException):
+                raise foods
+            else:
+                self._store_foods(foods, found)
+        return found, unavailable
+
+
+_shared_cache: Optional[BaseCache] = None
+_shared_search_cache: Optional[BaseCache] = None
+_shared_client: Optional[USDAClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_usda_cache() -> BaseCache:
+    """Process-wide USDA response cache shared by the sync and async clients."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = build_cache(settings.USDA_CACHE_BACKEND)
+    return _shared_cache
+
+
+def get_usda_search_cache() -> BaseCache:
+    """Process-wide cache of USDA search result pages."""
+    global _shared_search_cache
+    if _shared_search_cache is None:
+        with _shared_lock:
+            if _shared_search_cache is None:
+                _shared_search_cache = build_cache(settings.USDA_SEARCH_CACHE_BACKEND, prefix="USDA_SEARCH_CACHE")
+    return _shared_search_cache
+
+
+def get_usda_client() -> USDAClient:
+    """Process-wide client so every router shares one connection pool and cache."""
+    global _shared_client
+    if _shared_client is None:
+        cache, search_cache = get_usda_cache(), get_usda_search_cache()
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = USDAClient(cache=cache, search_cache=search_cache)
+    return _shared_client
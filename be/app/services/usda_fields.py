@@ -0,0 +1,99 @@
+# app/services/usda_fields.py
+"""
+Response shaping for the /usda proxy endpoints.
+
+- `fields=` projection: comma-separated keys to keep, dotted for nested ones,
+  e.g. "fdcId,description,foodNutrients.amount,foodNutrients.nutrient.name".
+  Lists are projected element-wise; for search results the projection applies
+  to every entry of `foods` and the paging keys are always kept.
+- abridged mode: a flat, compact food record (the keys of ABRIDGED_FIELDS,
+  nutrients as {number, name, amount, unitName} and portions as
+  {gramWeight, amount, description}), in both the search and detail shapes.
+"""
+from typing import Dict, Optional
+
+ABRIDGED_FIELDS = (
+    "fdcId", "description", "dataType", "publicationDate", "foodCategory", "brandOwner", "brandName",
+    "gtinUpc", "servingSize", "servingSizeUnit", "foodNutrients", "foodPortions",
+)
+SEARCH_PAGING = ("totalHits", "currentPage", "totalPages", "pageList")
+MAX_FIELDS = 64
+
+FieldTree = Dict[str, "FieldTree"]
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FieldTree]:
+    """"a,b.c,b.d" -> {"a": {}, "b": {"c": {}, "d": {}}}; None when no projection was asked for."""
+    if fields is None:
+        return None
+    paths = [p.strip() for p in fields.split(",") if p.strip()]
+    if not paths:
+        raise ValueError("fields must name at least one key")
+    if len(paths) > MAX_FIELDS:
+        raise ValueError(f"at most {MAX_FIELDS} fields can be requested")
+    tree: FieldTree = {}
+    for path in paths:
+        node = tree
+        parts = path.split(".")
+        if not all(parts):
+            raise ValueError(f"invalid field: {path!r}")
+        for part in parts:
+            node = node.setdefault(part, {})
+    return tree
+
+
+def project(value, tree: FieldTree):
+    if not tree:
+        return value
+    if isinstance(value, dict):
+        return {k: project(value[k], sub) for k, sub in tree.items() if k in value}
+    if isinstance(value, list):
+        return [project(v, tree) for v in value]
+    return value
+
+
+def _abridged_nutrient(n: dict) -> Optional[dict]:
+    amount = n.get("amount", n.get("value"))
+    if amount is None:
+        return None
+    nested = n.get("nutrient") or {}
+    return {
+        "number": n.get("nutrientNumber") or n.get("number") or nested.get("number"),
+        "name": n.get("nutrientName") or n.get("name") or nested.get("name"),
+        "amount": amount,
+        "unitName": n.get("unitName") or nested.get("unitName"),
+    }
+
+
+def _abridged_portion(p: dict) -> dict:
+    unit = p.get("measureUnit")
+    unit = unit.get("name") if isinstance(unit, dict) else unit
+    return {
+        "gramWeight": p.get("gramWeight"),
+        "amount": p.get("amount"),
+        "description": p.get("portionDescription") or p.get("modifier") or unit,
+    }
+
+
+def abridge(food: dict) -> dict:
+    out = {k: food[k] for k in ABRIDGED_FIELDS if k in food}
+    category = out.get("foodCategory")
+    if isinstance(category, dict):
+        out["foodCategory"] = category.get("description")
+    if isinstance(out.get("foodNutrients"), list):
+        out["foodNutrients"] = [a for a in map(_abridged_nutrient, out["foodNutrients"]) if a is not None]
+    if isinstance(out.get("foodPortions"), list):
+        out["foodPortions"] = [_abridged_portion(p) for p in out["foodPortions"]]
+    return out
+
+
+def shape_food(food: dict, tree: Optional[FieldTree], abridged: bool) -> dict:
+    if abridged:
+        food = abridge(food)
+    return project(food, tree) if tree else food
+
+
+def shape_search(result: dict, tree: Optional[FieldTree], abridged: bool) -> dict:
+    out = {k: result[k] for k in SEARCH_PAGING if k in result}
+    out["foods"] = [shape_food(f, tree, abridged) for f in result.get("foods") or []]
+    return out
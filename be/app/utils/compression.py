@@ -0,0 +1,143 @@
+# app/utils/compression.py
+"""
+Response compression: brotli when the client accepts it and the optional
+`brotli` package is installed, else gzip. Bodies under the size threshold
+and responses that already carry a Content-Encoding are passed through
+untouched; longer streamed bodies are compressed chunk by chunk.
+"""
+import gzip
+import io
+from typing import List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+def _accepted(accept_encoding: str) -> set:
+    out = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        q = 1.0
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                pass
+        if q > 0:
+            out.add(coding.strip())
+    return out
+
+
+class _Gzip:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        self._buffer = io.BytesIO()
+        self._file = gzip.GzipFile(mode="wb", fileobj=self._buffer, compresslevel=level)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def compress(self, data: bytes) -> bytes:
+        self._file.write(data)
+        self._file.flush()  # emit what we have so streamed chunks aren't held back
+        return self._drain()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        self._file.write(data)
+        self._file.close()
+        return self._drain()
+
+
+class _Brotli:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _codec_factory(self, scope: Scope):
+        accepted = _accepted(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return lambda: _Brotli(self.brotli_quality)
+        if "gzip" in accepted:
+            return lambda: _Gzip(self.gzip_level)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        factory = self._codec_factory(scope) if scope["type"] == "http" else None
+        if factory is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None  # held back until enough body is seen to decide
+        held: List[bytes] = []
+        held_size = 0
+        codec = None
+
+        async def send_compressed(message: Message):
+            nonlocal start, held_size, codec
+            if message["type"] == "http.response.start":
+                if "content-encoding" in Headers(raw=message["headers"]):
+                    await send(message)  # already encoded: pass through
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body" or (start is None and codec is None):
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if codec is not None:
+                chunk = codec.compress(body) if more_body else codec.finish(body)
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+            # streamed responses (e.g. through BaseHTTPMiddleware) arrive in pieces, often
+            # starting with an empty one: buffer until the size threshold or the end
+            held.append(body)
+            held_size += len(body)
+            if more_body and held_size < self.minimum_size:
+                return
+            initial, start = start, None
+            body = b"".join(held)
+            held.clear()
+            if not more_body and held_size < self.minimum_size:
+                await send(initial)
+                await send({"type": "http.response.body", "body": body})
+                return
+            codec = factory()
+            headers = MutableHeaders(raw=initial["headers"])
+            headers["Content-Encoding"] = codec.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                body = codec.compress(body)
+            else:
+                body = codec.finish(body)
+                headers["Content-Length"] = str(len(body))
+            await send(initial)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,30 @@
+# app/utils/fastjson.py
+"""
+JSON encoding for hot response and cache paths: orjson when installed
+(several times faster than the stdlib, emits bytes directly), else the
+stdlib json module with compact separators.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        # non-str keys (e.g. {fdc_id: ...}) are stringified like json.dumps does
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def available() -> bool:
+    return orjson is not None
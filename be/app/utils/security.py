@@ -6,11 +6,13 @@ from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 
 from app.config import settings
 from app.db.session import SessionLocal
 from app.models.user import User
+from app.services.cache import MemoryCache
 
 # -------------------------
 # Password & hashing
@@ -54,24 +56,56 @@ def decode_access_token(token: str) -> Optional[dict]:
 
 
 # -------------------------
-# Database helpers
+# Principal cache
 # -------------------------
-def get_db() -> Session:
+# column values of authenticated users keyed by token subject (email), so
+# get_current_user doesn't query the users table on every request
+_principals = MemoryCache(max_entries=settings.AUTH_CACHE_MAX_ENTRIES, default_ttl=settings.AUTH_CACHE_TTL)
+
+
+def principal_cache() -> MemoryCache:
+    """The process's principal cache (for stats; entries are managed here)."""
+    return _principals
+
+
+def _load_principal(email: str) -> Optional[dict]:
+    data, _stale = _principals.get(email, allow_stale=False)
+    if data is not None:
+        return data
     db = SessionLocal()
     try:
-        yield db
+        user = db.query(User).filter(User.email == email).first()
+        if not user:
+            return None
+        data = {c.key: getattr(user, c.key) for c in User.__table__.columns}
     finally:
         db.close()
+    _principals.set(email, data)
+    return data
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    for email in emails:
+        _principals.delete(email)
+    # drop again once committed, in case a concurrent request re-cached the old row meanwhile
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("stale_principals", set()).update(emails)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_stale_principals(session):
+    for email in session.info.pop("stale_principals", ()):
+        _principals.delete(email)
 
 
 # -------------------------
 # FastAPI dependency
 # -------------------------
-def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
-    """
-    Validate token, return User model instance or raise HTTPException.
-    Token payload must contain "sub" with user's email (string).
-    """
+def _token_payload(token: str) -> dict:
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(
@@ -79,20 +113,46 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-
-    email = payload.get("sub")
-    if not email:
+    if not payload.get("sub"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token payload",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return payload
 
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.email == email).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        return user
-    finally:
-        db.close()
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    """
+    Validate token, return User model instance or raise HTTPException.
+    Token payload must contain "sub" with user's email (string).
+    The user is served from the principal cache and is not attached to a session.
+    """
+    payload = _token_payload(token)
+    data = _load_principal(payload["sub"])
+    if not data:
+        raise HTTPException(status_code=404, detail="User not found")
+    return User(**data)
+
+
+def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    """
+    Authenticated user's id for handlers that only need identity. Tokens issued
+    with a "uid" claim need no lookup at all; older tokens go through the cache.
+    """
+    payload = _token_payload(token)
+    uid = payload.get("uid")
+    if isinstance(uid, int):
+        return uid
+    data = _load_principal(payload["sub"])
+    if not data:
+        raise HTTPException(status_code=404, detail="User not found")
+    return data["id"]
+
+
+def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """The authenticated user, if listed in ADMIN_EMAILS."""
+    admins = {e.strip().lower() for e in settings.ADMIN_EMAILS.split(",") if e.strip()}
+    if current_user.email.lower() not in admins:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
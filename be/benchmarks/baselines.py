@@ -0,0 +1,42 @@
+# benchmarks/baselines.py
+# Save benchmark results (name -> milliseconds, lower is better) and compare
+# later runs against them. Baselines are machine-specific: record and compare
+# on the same hardware.
+import json
+import os
+from typing import Dict, List
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def baseline_path(name: str) -> str:
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save(name: str, results: Dict[str, float]):
+    path = baseline_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({k: round(v, 4) for k, v in sorted(results.items())}, f, indent=2)
+        f.write("\n")
+    print(f"saved {len(results)} results to {path}")
+
+
+def compare(name: str, results: Dict[str, float], threshold: float = 0.2) -> List[str]:
+    """Print current vs baseline; returns the names that got slower by more than `threshold`."""
+    with open(baseline_path(name), encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"{'benchmark':<48} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key in sorted(results):
+        if key not in baseline:
+            print(f"{key:<48} {'-':>10} {results[key]:>10.3f} {'new':>8}")
+            continue
+        old, new = baseline[key], results[key]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<48} {old:>10.3f} {new:>10.3f} {change:>+7.0%}{flag}")
+    return regressions
@@ -0,0 +1,91 @@
+# benchmarks/bench_batch_plan.py
+# Batch re-planning throughput (app.services.batch_planning) against worker
+# count: seeds a throwaway SQLite DB with users, pantries and food snapshots
+# (no USDA calls), then re-plans everyone with each worker count, starting
+# from an empty plan table every time.
+# run from be/: python -m benchmarks.bench_batch_plan [--users 2000] [--items 40] [--days 7]
+#               [--workers 0 1 2 4 8] [--chunk-size 500]
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+
+def seed(users: int, items: int, foods: int = 2000):
+    from sqlalchemy import insert
+
+    from app.db.session import SessionLocal, init_db
+    from app.models.food import FoodSnapshot
+    from app.models.pantry import PantryItem
+    from app.models.user import User
+
+    init_db()
+    rnd = random.Random(0)
+    db = SessionLocal()
+    try:
+        db.execute(insert(FoodSnapshot), [{
+            "fdc_id": 100000 + i, "description": f"food {i}", "calories": rnd.uniform(15, 600),
+            "protein_g": rnd.uniform(0, 35), "fat_g": rnd.uniform(0, 50), "carbs_g": rnd.uniform(0, 80),
+            "portion_gram": rnd.choice([30.0, 100.0, 150.0, 240.0]),
+        } for i in range(foods)])
+        db.execute(insert(User), [{
+            "id": u + 1, "email": f"batch{u}@example.com", "full_name": "Batch", "age": rnd.randint(18, 80),
+            "gender": rnd.choice(["male", "female"]), "height_cm": rnd.randint(150, 200),
+            "weight_kg": rnd.randint(45, 120), "activity_level": "light",
+        } for u in range(users)])
+        rows = []
+        for u in range(users):
+            for fdc_id in rnd.sample(range(100000, 100000 + foods), items):
+                rows.append({"user_id": u + 1, "fdc_id": fdc_id, "description": f"food {fdc_id}",
+                             "quantity": rnd.choice([1, 2, 3, 5])})
+        db.execute(insert(PantryItem), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def clear_plans():
+    from app.db.session import SessionLocal
+    from app.models.plan import MealPlan
+
+    db = SessionLocal()
+    try:
+        db.query(MealPlan).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=40, help="pantry items per user")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4, 8],
+                        help="worker counts to compare (0 = plan in-process)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'batch.db')}"
+        os.environ["DB_QUERY_REPORT"] = "false"
+        sys.path.insert(0, os.getcwd())
+        from app.services.batch_planning import run_batch
+
+        seed(args.users, args.items)
+        print(f"{args.users} users x {args.items} items, {args.days}-day plans, {os.cpu_count()} CPUs")
+        print(f"{'workers':>7} {'seconds':>8} {'users/s':>9} {'speedup':>8}")
+        base = None
+        for workers in args.workers:
+            clear_plans()
+            stats = run_batch(days=args.days, workers=workers, chunk_size=args.chunk_size)
+            if stats.get("planned") != args.users:
+                sys.exit(f"expected {args.users} plans, got {stats}")
+            base = base or stats["seconds"]
+            print(f"{workers:>7} {stats['seconds']:>8.2f} {stats['users_per_sec']:>9.1f} "
+                  f"{base / stats['seconds']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
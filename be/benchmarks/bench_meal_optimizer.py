@@ -0,0 +1,40 @@
+# benchmarks/bench_meal_optimizer.py
+# Solve time and target deviation of the optimizing planner vs the greedy planner.
+# run from be/: python -m benchmarks.bench_meal_optimizer [--items 200] [--days 7]
+import argparse
+import time
+
+from app.services.meal_optimizer import plan_deviation, plan_optimized
+from app.services.nutrition_matrix import PantryMatrix, plan_matrix
+from benchmarks.bench_nutrition_matrix import TARGETS, make_pantry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs="+", default=[20, 200])
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--budget", type=float, default=0.5, help="solver time budget (s)")
+    parser.add_argument("--seeds", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'items':>6} {'seed':>4} {'mode':>8} {'solve ms':>9} {'in tol':>7}  mean |deviation| % (kcal/prot/fat/carb)")
+    for n in args.items:
+        for seed in range(args.seeds):
+            items, nutrients = make_pantry(n, seed=seed)
+            matrix = PantryMatrix.from_nutrients(items, nutrients)
+            for mode in ("greedy", "optimize"):
+                started = time.perf_counter()
+                if mode == "greedy":
+                    result = plan_matrix(TARGETS, matrix, days=args.days)
+                else:
+                    result = plan_optimized(TARGETS, matrix, days=args.days, time_budget=args.budget)
+                elapsed = (time.perf_counter() - started) * 1000
+                dev = plan_deviation(result, TARGETS)
+                in_tol = sum(1 for d in result["days"] if d.get("within_tolerance"))
+                shown = result.get("solver", {}).get("mode", mode)
+                print(f"{n:>6} {seed:>4} {shown:>8} {elapsed:>9.1f} {in_tol:>4}/{args.days:<2}  "
+                      + " / ".join(f"{v:5.1f}" for v in dev.values()))
+
+
+if __name__ == "__main__":
+    main()
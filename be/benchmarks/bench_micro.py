@@ -0,0 +1,76 @@
+# benchmarks/bench_micro.py
+# Micro-benchmarks of the per-food and per-plan hot paths, with baselines for
+# regression checks (benchmarks/baselines/micro.json).
+# run from be/: python -m benchmarks.bench_micro [--save] [--compare] [--threshold 0.2]
+import argparse
+import sys
+import time
+
+from app.services.nutrients import parse_nutrients
+from app.services.nutrition_planner import (aggregate_from_nutrients, extract_nutrients_from_usda,
+                                            plan_daily_from_targets)
+from benchmarks import baselines
+from benchmarks.bench_nutrition_matrix import TARGETS, make_pantry
+from benchmarks.fake_usda import load_fixtures, synthetic_food
+
+BASELINE = "micro"
+
+
+def per_call_ms(fn, loops: int, repeat: int) -> float:
+    """Best-of-`repeat` mean time of one call, in ms."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - started) / loops)
+    return best * 1e3
+
+
+def run(repeat: int) -> dict:
+    results = {}
+    foods = load_fixtures() or [synthetic_food(100000 + i) for i in range(60)]
+
+    def extract_all():
+        for food in foods:
+            extract_nutrients_from_usda(food)
+
+    results[f"extract_nutrients_from_usda/{len(foods)} foods"] = per_call_ms(extract_all, 50, repeat)
+    # a 150-item pantry: cold parse vs the memoized path requests take
+    pantry = [synthetic_food(200000 + i) for i in range(150)]
+    results["parse_nutrients/150-item pantry"] = per_call_ms(
+        lambda: [parse_nutrients(food) for food in pantry], 50, repeat)
+    results["extract_nutrients_from_usda/150-item pantry"] = per_call_ms(
+        lambda: [extract_nutrients_from_usda(food) for food in pantry], 50, repeat)
+    for n in (10, 100, 1000):
+        items, nutrients = make_pantry(n)
+        breakdown = aggregate_from_nutrients(items, nutrients)["breakdown"]
+        loops = max(1, 2000 // n)
+        results[f"plan_daily_from_targets/{n} items"] = per_call_ms(
+            lambda: plan_daily_from_targets(TARGETS, breakdown), loops, repeat)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", action="store_true", help=f"record as the baseline ({BASELINE}.json)")
+    parser.add_argument("--compare", action="store_true", help="compare with the saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+    if args.compare:
+        regressions = baselines.compare(BASELINE, results, args.threshold)
+        if regressions:
+            sys.exit(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+    else:
+        print(f"{'benchmark':<48} {'ms/call':>10}")
+        for key, value in results.items():
+            print(f"{key:<48} {value:>10.3f}")
+    if args.save:
+        baselines.save(BASELINE, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_nutrition_matrix.py
+# Dict vs NumPy pantry aggregation and plan simulation.
+# run from be/: python -m benchmarks.bench_nutrition_matrix [--sizes 10 100 1000]
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from app.services.nutrition_matrix import NUTRIENTS, PantryMatrix, aggregate_matrix, plan_matrix
+from app.services.nutrition_planner import aggregate_from_nutrients, plan_daily_from_targets
+
+TARGETS = {"nutrition": {"calories": 2400.0, "protein_g": 150.0, "fat_g": 67.0, "carbs_g": 300.0}}
+
+
+def make_pantry(n: int, seed: int = 0):
+    rnd = random.Random(seed)
+    items, nutrients = [], {}
+    for i in range(n):
+        fdc_id = 100000 + i
+        items.append(SimpleNamespace(fdc_id=fdc_id, description=f"food {i}", quantity=rnd.choice([1, 2, 3, 5])))
+        nutrients[fdc_id] = {
+            "calories": rnd.uniform(15, 600),
+            "protein_g": rnd.uniform(0, 35),
+            "fat_g": None if rnd.random() < 0.1 else rnd.uniform(0, 50),
+            "carbs_g": rnd.uniform(0, 80),
+            "portion_gram": rnd.choice([30.0, 100.0, 150.0, 240.0]),
+        }
+    return items, nutrients
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def max_deviation(a: dict, b: dict) -> float:
+    """Largest absolute difference between the per-day totals of two plans."""
+    dev = 0.0
+    for da, db in zip(a["days"], b["days"]):
+        for k in NUTRIENTS:
+            dev = max(dev, abs(da["totals"][k] - db["totals"][k]))
+    return dev
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'items':>6} {'agg dict ms':>12} {'agg np ms':>10} {'totals np ms':>13} "
+          f"{'plan dict ms':>13} {'plan np ms':>11} {'plan dev':>9}")
+    for n in args.sizes:
+        items, nutrients = make_pantry(n)
+        breakdown = aggregate_from_nutrients(items, nutrients)["breakdown"]
+        matrix = PantryMatrix.from_nutrients(items, nutrients)
+
+        agg_dict = best_of(lambda: aggregate_from_nutrients(items, nutrients), args.repeat)
+        agg_np = best_of(lambda: aggregate_matrix(PantryMatrix.from_nutrients(items, nutrients)), args.repeat)
+        totals_np = best_of(lambda: aggregate_matrix(PantryMatrix.from_nutrients(items, nutrients), breakdown=False),
+                            args.repeat)
+        plan_dict = best_of(lambda: plan_daily_from_targets(TARGETS, breakdown), args.repeat)
+        plan_np = best_of(lambda: plan_matrix(TARGETS, matrix), args.repeat)
+        dev = max_deviation(plan_daily_from_targets(TARGETS, breakdown), plan_matrix(TARGETS, matrix))
+        print(f"{n:>6} {agg_dict * 1e3:>12.3f} {agg_np * 1e3:>10.3f} {totals_np * 1e3:>13.3f} "
+              f"{plan_dict * 1e3:>13.3f} {plan_np * 1e3:>11.3f} {dev:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
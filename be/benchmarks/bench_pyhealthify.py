@@ -0,0 +1,91 @@
+# benchmarks/bench_pyhealthify.py
+# Scalar vs column nutrition targets (app.services.pyhealthify): one
+# nutrition_profile_from_user call per row against one nutrition_profiles
+# call over all rows, checking the results are identical; then the
+# goal x activity scenario grid against per-scenario scalar calls.
+# run from be/: python -m benchmarks.bench_pyhealthify [--rows 1000000] [--grid-rows 100000]
+import argparse
+import time
+
+import numpy as np
+
+from app.services.pyhealthify import (
+    ACTIVITY_LEVELS,
+    GOALS,
+    nutrition_profile_from_user,
+    nutrition_profiles,
+    scenario_grid,
+)
+
+KEYS = ("bmi", "bmr", "calories", "protein_g", "fat_g", "carbs_g")
+
+
+def make_columns(n: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        "weight_kg": rng.uniform(40, 160, n).round(1),
+        "height_cm": rng.integers(140, 210, n).astype(float),
+        "age": rng.integers(16, 90, n),
+        # includes labels the scalar code treats specially: mixed case, unknown, missing
+        "gender": rng.choice(np.array(["male", "female", "Male", None], dtype=object), n),
+        "activity_level": rng.choice(np.array(list(ACTIVITY_LEVELS) + ["Active", "unknown", None],
+                                              dtype=object), n),
+        "goal": rng.choice(np.array(GOALS, dtype=object), n),
+    }
+
+
+def scalar_profiles(cols: dict) -> dict:
+    out = {k: np.empty(len(cols["goal"])) for k in KEYS}
+    rows = zip(cols["weight_kg"].tolist(), cols["height_cm"].tolist(), cols["age"].tolist(),
+               cols["gender"], cols["activity_level"], cols["goal"])
+    for i, (weight, height, age, gender, activity, goal) in enumerate(rows):
+        p = nutrition_profile_from_user({"weight_kg": weight, "height_cm": height, "age": age,
+                                         "gender": gender, "activity_level": activity}, goal=goal)
+        out["bmi"][i], out["bmr"][i] = p["bmi"], p["bmr"]
+        for k in KEYS[2:]:
+            out[k][i] = p["nutrition"][k]
+    return out
+
+
+def mismatches(a: dict, b: dict) -> int:
+    return sum(int(np.count_nonzero(a[k] != b[k])) for k in KEYS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--grid-rows", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    cols = make_columns(args.rows)
+    started = time.perf_counter()
+    scalar = scalar_profiles(cols)
+    scalar_s = time.perf_counter() - started
+    started = time.perf_counter()
+    batch = nutrition_profiles(**cols)
+    batch_s = time.perf_counter() - started
+    print(f"{'':>22} {'rows':>9} {'scalar s':>9} {'batch s':>8} {'speedup':>8} {'mismatches':>11}")
+    print(f"{'nutrition_profiles':>22} {args.rows:>9} {scalar_s:>9.3f} {batch_s:>8.3f} "
+          f"{scalar_s / batch_s:>7.1f}x {mismatches(scalar, batch):>11}")
+
+    n = args.grid_rows
+    grid_cols = {k: cols[k][:n] for k in ("weight_kg", "height_cm", "age", "gender")}
+    started = time.perf_counter()
+    expected = {k: np.empty((n, len(GOALS), len(ACTIVITY_LEVELS))) for k in KEYS[2:]}
+    for g, goal in enumerate(GOALS):
+        for a, level in enumerate(ACTIVITY_LEVELS):
+            per = scalar_profiles(dict(grid_cols, activity_level=[level] * n, goal=[goal] * n))
+            for k in KEYS[2:]:
+                expected[k][:, g, a] = per[k]
+    scalar_s = time.perf_counter() - started
+    started = time.perf_counter()
+    grid = scenario_grid(**grid_cols)
+    batch_s = time.perf_counter() - started
+    bad = sum(int(np.count_nonzero(grid[k] != expected[k])) for k in KEYS[2:])
+    cells = n * len(GOALS) * len(ACTIVITY_LEVELS)
+    print(f"{'scenario_grid':>22} {cells:>9} {scalar_s:>9.3f} {batch_s:>8.3f} "
+          f"{scalar_s / batch_s:>7.1f}x {bad:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/bench_startup.py
+# Worker boot time: importing the app, running its lifespan startup and serving
+# the first request, each measured in a fresh interpreter.
+# run from be/: python -m benchmarks.bench_startup [--runs 5] [--database-url sqlite:///...]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# executed in the child interpreter; prints one JSON line of timings (ms)
+_CHILD = """
+import json, time
+t0 = time.perf_counter()
+from app.api.routes import app
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    t2 = time.perf_counter()
+    client.get("/health")
+    t3 = time.perf_counter()
+print(json.dumps({"import": (t1 - t0) * 1000, "startup": (t2 - t1) * 1000, "first_request": (t3 - t2) * 1000}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    out = subprocess.run([sys.executable, "-c", _CHILD], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", help="defaults to a throwaway sqlite file")
+    parser.add_argument("--no-schema", action="store_true", help="boot with DB_CREATE_SCHEMA=false")
+    parser.add_argument("--no-enrichment", action="store_true", help="boot with ENRICHMENT_ENABLED=false")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        if args.no_schema:
+            env["DB_CREATE_SCHEMA"] = "false"
+        if args.no_enrichment:
+            env["ENRICHMENT_ENABLED"] = "false"
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    print(f"{'phase':>14} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for phase in ("import", "startup", "first_request"):
+        values = [r[phase] for r in runs]
+        print(f"{phase:>14} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# benchmarks/fake_usda.py
+# Local stand-in for api.nal.usda.gov/fdc/v1 with configurable latency and error
+# rate. Serves the frontend fixtures (fe/public/data/foods.json) plus synthetic
+# foods for any other FDC ID, and counts upstream calls per endpoint
+# (GET /_stats, POST /_reset).
+# run from be/: python -m benchmarks.fake_usda [--port 8765] [--latency-ms 50] [--error-rate 0.01]
+# then start the app with USDA_BASE_URL=http://127.0.0.1:8765/fdc/v1
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = Path(__file__).resolve().parents[2] / "fe" / "public" / "data" / "foods.json"
+PREFIX = "/fdc/v1"
+
+
+def load_fixtures(path: Path = FIXTURES) -> List[dict]:
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def synthetic_food(fdc_id: int) -> dict:
+    """Deterministic food for IDs the fixtures don't cover (so pantries can be any size)."""
+    rnd = random.Random(fdc_id)
+    return {
+        "fdcId": fdc_id,
+        "description": f"Synthetic food {fdc_id}",
+        "dataType": "Foundation",
+        "foodCategory": {"description": rnd.choice(["Vegetables", "Fruits", "Dairy", "Grains", "Meats"])},
+        "foodNutrients": [
+            {"nutrientId": 1008, "nutrientName": "Energy", "unitName": "kcal", "value": round(rnd.uniform(15, 600), 1)},
+            {"nutrientId": 1003, "nutrientName": "Protein", "unitName": "g", "value": round(rnd.uniform(0, 35), 2)},
+            {"nutrientId": 1004, "nutrientName": "Total lipid (fat)", "unitName": "g",
+             "value": round(rnd.uniform(0, 50), 2)},
+            {"nutrientId": 1005, "nutrientName": "Carbohydrate, by difference", "unitName": "g",
+             "value": round(rnd.uniform(0, 80), 2)},
+        ],
+        "foodPortions": [{"gramWeight": rnd.choice([30.0, 100.0, 150.0, 240.0])}],
+    }
+
+
+class FakeUSDA:
+    def __init__(self, foods: Optional[List[dict]] = None, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        foods = load_fixtures() if foods is None else foods
+        self.foods: Dict[int, dict] = {f["fdcId"]: f for f in foods}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -------------------------
+    # Data
+    # -------------------------
+    def food(self, fdc_id: int) -> Optional[dict]:
+        if fdc_id <= 0:
+            return None
+        return self.foods.get(fdc_id) or synthetic_food(fdc_id)
+
+    def search(self, query: str, page_size: int, page_number: int) -> dict:
+        tokens = query.casefold().split()
+        hits = [f for f in self.foods.values() if all(t in f["description"].casefold() for t in tokens)]
+        start = (max(page_number, 1) - 1) * page_size
+        return {
+            "totalHits": len(hits),
+            "currentPage": page_number,
+            "totalPages": (len(hits) + page_size - 1) // page_size if page_size else 0,
+            "foods": hits[start:start + page_size],
+        }
+
+    # -------------------------
+    # Behaviour
+    # -------------------------
+    def record(self, endpoint: str) -> bool:
+        """Count the call and apply latency; False if this call should fail."""
+        with self._lock:
+            self.calls[endpoint] += 1
+            delay = self.latency_ms + self._rnd.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self._rnd.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return not failed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.calls, total=sum(self.calls.values()))
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+    # -------------------------
+    # Server
+    # -------------------------
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in a background thread; returns the base URL to use as USDA_BASE_URL."""
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-usda", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{PREFIX}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _handler(fake: FakeUSDA):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/_stats":
+                return self._send(200, fake.stats())
+            path = url.path[len(PREFIX):] if url.path.startswith(PREFIX) else url.path
+            if path == "/foods/search":
+                if not fake.record("search"):
+                    return self._send(503, {"error": "injected failure"})
+                q = parse_qs(url.query)
+                return self._send(200, fake.search(q.get("query", [""])[0], int(q.get("pageSize", ["25"])[0]),
+                                                   int(q.get("pageNumber", ["1"])[0])))
+            if path.startswith("/foods/") or path.startswith("/food/"):
+                if not fake.record("food"):
+                    return self._send(503, {"error": "injected failure"})
+                try:
+                    food = fake.food(int(path.rsplit("/", 1)[1]))
+                except ValueError:
+                    food = None
+                return self._send(200, food) if food else self._send(404, {"error": "not found"})
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if url.path == "/_reset":
+                fake.reset()
+                return self._send(200, {"ok": True})
+            if url.path == f"{PREFIX}/foods":
+                if not fake.record("foods"):
+                    return self._send(503, {"error": "injected failure"})
+                ids = json.loads(body or b"{}").get("fdcIds", [])
+                return self._send(200, [f for f in (fake.food(int(i)) for i in ids) if f])
+            self._send(404, {"error": "not found"})
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    fake = FakeUSDA(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    print(f"fake USDA serving {len(fake.foods)} fixture foods at {fake.start(args.host, args.port)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
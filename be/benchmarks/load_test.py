@@ -0,0 +1,206 @@
+# benchmarks/load_test.py
+# Load test of the hot endpoints: starts the fake USDA server and the app
+# (uvicorn, SQLite) and drives /usda/search, /pantry/aggregate,
+# /pantry/weekly-diet and /pantry/search at several pantry sizes and
+# concurrency levels. Reports throughput, p50/p95/p99 latency, errors and
+# how many upstream USDA calls each scenario caused.
+# run from be/: python -m benchmarks.load_test [--sizes 10 100] [--concurrency 1 8 32]
+#               [--requests 200] [--latency-ms 50] [--error-rate 0] [--env RESULT_CACHE_TTL=0]
+#               [--save NAME | --compare NAME]
+import argparse
+import asyncio
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import httpx
+
+from benchmarks import baselines
+from benchmarks.fake_usda import FakeUSDA
+
+ENDPOINTS = ("usda_search", "aggregate", "weekly_diet", "pantry_search")
+SEARCH_TERMS = ("apple", "tomato", "milk", "rice", "chicken", "egg", "bread", "cheese", "banana", "oat")
+SECRET_KEY = "load-test-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def start_app(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api.routes:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("app exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("app did not come up within 30s")
+
+
+def make_token(user_id: int, email: str) -> str:
+    from jose import jwt
+
+    return jwt.encode({"sub": email, "uid": user_id, "exp": int(time.time()) + 3600}, SECRET_KEY, algorithm="HS256")
+
+
+async def seed_user(client: httpx.AsyncClient, size: int, fixture_ids: List[int]) -> dict:
+    """A user with `size` pantry items (fixture foods first, then synthetic ones)."""
+    email = f"load{size}-{time.time_ns()}@example.com"
+    r = await client.post("/users/", json={"email": email, "full_name": "Load Test", "age": 30, "gender": "male",
+                                          "height_cm": 180, "weight_kg": 80, "activity_level": "light"})
+    r.raise_for_status()
+    user_id = r.json()["id"]
+    headers = {"Authorization": f"Bearer {make_token(user_id, email)}"}
+    ids = (fixture_ids + list(range(900000, 900000 + size)))[:size]
+    for start in range(0, len(ids), 1000):
+        rows = [{"fdc_id": i, "description": f"item {i}", "quantity": 2} for i in ids[start:start + 1000]]
+        r = await client.post("/pantry/bulk", json=rows, headers=headers)
+        r.raise_for_status()
+    return {"id": user_id, "headers": headers}
+
+
+def request_factory(endpoint: str, user: dict) -> Callable[[int], tuple]:
+    """(method, url, kwargs) for the n-th request of a scenario."""
+    uid, headers = user["id"], user["headers"]
+
+    def make(n: int):
+        term = SEARCH_TERMS[n % len(SEARCH_TERMS)]
+        if endpoint == "usda_search":
+            return "GET", "/usda/search", {"params": {"q": term}}
+        if endpoint == "aggregate":
+            return "GET", "/pantry/aggregate", {"params": {"user_id": uid}, "headers": headers}
+        if endpoint == "weekly_diet":
+            return "GET", "/pantry/weekly-diet", {"params": {"user_id": uid}, "headers": headers}
+        return "GET", "/pantry/search", {"params": {"user_id": uid, "q": term[:n % 4 + 2]}, "headers": headers}
+
+    return make
+
+
+async def run_scenario(client: httpx.AsyncClient, make: Callable, total: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for n in counter:
+            method, url, kwargs = make(n)
+            started = time.perf_counter()
+            try:
+                r = await client.request(method, url, **kwargs)
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": total / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "errors": errors,
+    }
+
+
+async def drive(args, base_url: str, fake: FakeUSDA) -> Dict[str, float]:
+    fixture_ids = sorted(fake.foods)
+    results = {}
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    print(f"{'endpoint':<14} {'items':>6} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'upstream':>9}")
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        for size in args.sizes:
+            user = await seed_user(client, size, fixture_ids)
+            for endpoint in args.endpoints:
+                if endpoint == "usda_search" and size != args.sizes[0]:
+                    continue  # doesn't depend on the pantry
+                make = request_factory(endpoint, user)
+                for concurrency in args.concurrency:
+                    fake.reset()
+                    stats = await run_scenario(client, make, args.requests, concurrency)
+                    upstream = fake.stats()["total"]
+                    print(f"{endpoint:<14} {size:>6} {concurrency:>5} {stats['rps']:>9.1f} {stats['p50']:>8.1f} "
+                          f"{stats['p95']:>8.1f} {stats['p99']:>8.1f} {stats['errors']:>7} {upstream:>9}")
+                    name = f"{endpoint}/{size} items/c{concurrency}"
+                    results[f"{name}/p50_ms"] = stats["p50"]
+                    results[f"{name}/p95_ms"] = stats["p95"]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fake USDA response latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake USDA 503 probability")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra app setting, e.g. RESULT_CACHE_TTL=0 to measure uncached aggregation")
+    parser.add_argument("--save", metavar="NAME", help="record p50/p95 as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="compare p50/p95 with baseline NAME")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    fake = FakeUSDA(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    usda_url = fake.start()
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'load.db')}",
+            "USDA_BASE_URL": usda_url,
+            "USDA_CACHE_PATH": os.path.join(tmp, "usda_cache.sqlite3"),
+            "USDA_SEARCH_CACHE_PATH": os.path.join(tmp, "usda_search_cache.sqlite3"),
+            "RESULT_CACHE_PATH": os.path.join(tmp, "result_cache.sqlite3"),
+            "FDC_API_KEY": "load-test",
+            "SECRET_KEY": SECRET_KEY,
+            "DB_QUERY_REPORT": "false",
+        })
+        env.update(kv.split("=", 1) for kv in args.env)
+        proc = start_app(port, env)
+        try:
+            results = asyncio.run(drive(args, f"http://127.0.0.1:{port}", fake))
+        finally:
+            proc.terminate()
+            proc.wait()
+            fake.stop()
+
+    if args.save:
+        baselines.save(args.save, results)
+    if args.compare:
+        regressions = baselines.compare(args.compare, results, args.threshold)
+        if regressions:
+            sys.exit(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import importlib
+import json
+import pkgutil
+import re
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models
+from app.db import session as db_session
+from app.db.base import Base
+from app.models.pantry import PantryItem
+from app.models.user import User
+from app.services import pantry_search, resilience
+from app.services.cache import MemoryCache
+from app.services.food_snapshots import upsert_snapshots
+from app.services.result_cache import get_result_cache
+from app.utils import security
+
+# register every table on Base.metadata
+for _module in pkgutil.iter_modules(app.models.__path__):
+    importlib.import_module(f"app.models.{_module.name}")
+
+
+def usda_food(description: str, calories: float, protein: float, fat: float, carbs: float,
+              portion_gram: float = 100.0) -> dict:
+    """A minimal USDA /food record with per-100g values and one portion."""
+    return {
+        "description": description,
+        "foodNutrients": [
+            {"nutrientName": "Energy", "unitName": "KCAL", "value": calories},
+            {"nutrientName": "Protein", "unitName": "G", "value": protein},
+            {"nutrientName": "Total lipid (fat)", "unitName": "G", "value": fat},
+            {"nutrientName": "Carbohydrate, by difference", "unitName": "G", "value": carbs},
+        ],
+        "foodPortions": [{"gramWeight": portion_gram}],
+    }
+
+
+class FakeFDC:
+    """
+    FoodData Central stand-in for httpx.MockTransport: serves `foods`
+    ({fdc_id: record}), records every request, and answers with
+    `fail_status` while it is set (or for /foods chunks containing an id in
+    `fail_ids`).
+    """
+
+    def __init__(self, foods=None):
+        self.foods = dict(foods or {})
+        self.requests = []
+        self.fail_status = None
+        self.fail_ids = set()
+
+    def food(self, fdc_id):
+        food = self.foods.get(fdc_id)
+        return None if food is None else dict(food, fdcId=fdc_id)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.fail_status:
+            return httpx.Response(self.fail_status, text="unavailable")
+        path = request.url.path
+        if request.method == "POST" and path.endswith("/foods"):
+            ids = json.loads(request.content)["fdcIds"]
+            if self.fail_ids & set(ids):
+                return httpx.Response(503, text="unavailable")
+            return httpx.Response(200, json=[f for f in map(self.food, ids) if f])
+        if path.endswith("/foods/search"):
+            terms = request.url.params.get("query", "").casefold().split()
+            hits = [self.food(i) for i, f in self.foods.items()
+                    if all(t in f["description"].casefold() for t in terms)]
+            return httpx.Response(200, json={"totalHits": len(hits), "currentPage": 1,
+                                             "totalPages": 1 if hits else 0, "foods": hits})
+        match = re.search(r"/foods?/(\d+)$", path)
+        if match and self.food(int(match.group(1))):
+            return httpx.Response(200, json=self.food(int(match.group(1))))
+        return httpx.Response(404, json={"error": "not found"})
+
+    def paths(self):
+        return [(r.method, r.url.path) for r in self.requests]
+
+    def sync_client(self, **kwargs):
+        """A USDAClient answered by this fake, with its own caches."""
+        from app.services.usda_client import USDAClient
+
+        kwargs.setdefault("cache", MemoryCache())
+        kwargs.setdefault("search_cache", MemoryCache())
+        client = USDAClient(api_key="test", **kwargs)
+        client.client = httpx.Client(transport=httpx.MockTransport(self.handler))
+        return client
+
+    def async_client(self, **kwargs):
+        """An AsyncUSDAClient answered by this fake, with its own caches."""
+        from app.services.usda_client import AsyncUSDAClient
+
+        kwargs.setdefault("cache", MemoryCache())
+        kwargs.setdefault("search_cache", MemoryCache())
+        client = AsyncUSDAClient(api_key="test", **kwargs)
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        return client
+
+
+@pytest.fixture(autouse=True)
+def _process_state():
+    """Per-process caches and breakers start empty in every test."""
+    resilience._breakers.clear()
+    resilience._budget = None
+    security._principals.clear()
+    get_result_cache().clear()
+    pantry_search._indexes.clear()
+    yield
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    """Sessions on a fresh in-memory SQLite database (one shared connection); SessionLocal uses it too."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    event.listen(engine, "before_cursor_execute", db_session._query_started)
+    event.listen(engine, "after_cursor_execute", db_session._query_finished)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(db_session, "_engine", engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    u = User(email="cook@example.com", full_name="Cook", age=30, gender="male",
+             height_cm=180, weight_kg=80, activity_level="light")
+    db.add(u)
+    db.commit()
+    return u
+
+
+def auth_headers(user, uid: bool = True) -> dict:
+    """Bearer token for `user` (uid=False: an older token with the email only)."""
+    claims = {"sub": user.email, "uid": user.id} if uid else {"sub": user.email}
+    return {"Authorization": f"Bearer {security.create_access_token(claims)}"}
+
+
+@pytest.fixture
+def fdc():
+    return FakeFDC()
+
+
+@pytest.fixture
+def api(session_factory, fdc, monkeypatch):
+    """TestClient on the app with the test database and `fdc` as USDA; the enrichment worker stays off."""
+    from app.api.routes import app
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "ENRICHMENT_ENABLED", False)
+    monkeypatch.setattr(settings, "DB_CREATE_SCHEMA", False)
+    monkeypatch.setattr(settings, "USDA_RETRIES", 0)
+    monkeypatch.setattr(settings, "USDA_MODE", "remote")
+    monkeypatch.setattr("app.api.routes.AsyncUSDAClient", fdc.async_client)
+    monkeypatch.setattr("app.services.usda_client.get_usda_client", fdc.sync_client)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def stock_pantry(db, user):
+    """Add items ({fdc_id: (quantity, usda_food)}) with their snapshots; returns the pantry rows by id."""
+    def stock(foods: dict):
+        for fdc_id, (quantity, food) in foods.items():
+            db.add(PantryItem(user_id=user.id, fdc_id=fdc_id, description=food["description"], quantity=quantity))
+        db.commit()
+        upsert_snapshots(db, {fdc_id: food for fdc_id, (_q, food) in foods.items()})
+        return db.query(PantryItem).filter(PantryItem.user_id == user.id).order_by(PantryItem.id).all()
+    return stock
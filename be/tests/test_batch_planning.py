@@ -0,0 +1,44 @@
+from app.models.pantry import PantryItem
+from app.models.plan import MealPlan
+from app.models.user import User
+from app.services.batch_planning import run_batch
+
+from conftest import usda_food
+
+FOODS = {
+    4001: usda_food("Oats", 380, 13, 7, 68, portion_gram=80),
+    4002: usda_food("Lentils", 116, 9, 0.4, 20, portion_gram=200),
+    4003: usda_food("Eggs", 143, 12.6, 9.5, 0.7, portion_gram=50),
+}
+
+
+def _add_user(db, email, fdc_ids):
+    u = User(email=email, full_name=email, age=40, gender="female", height_cm=165, weight_kg=60,
+             activity_level="moderate")
+    db.add(u)
+    db.flush()
+    for fdc_id in fdc_ids:
+        db.add(PantryItem(user_id=u.id, fdc_id=fdc_id, description=f"food {fdc_id}", quantity=6.0))
+    db.commit()
+    return u
+
+
+def test_invalid_fdc_id_does_not_abort_the_batch(db, fdc):
+    fdc.foods.update(FOODS)
+    good = _add_user(db, "good@example.com", [4001, 4002, 4003])
+    # rows stored before fdc_id was validated
+    mixed = _add_user(db, "mixed@example.com", [-1, 4001, 4002])
+    legacy = _add_user(db, "legacy@example.com", [0])
+
+    stats = run_batch(days=3, workers=0, usda_client=fdc.sync_client())
+    assert stats["users"] == 3
+    assert stats["planned"] == 2
+    assert stats["partial"] == 1
+    assert stats["no_foods"] == 1
+    assert stats["usda_lookups"] == 3
+    assert stats["usda_unresolved"] == 2
+    assert stats["errors"] == []
+    assert {p.user_id for p in db.query(MealPlan)} == {good.id, mixed.id}
+    assert legacy.id not in {p.user_id for p in db.query(MealPlan)}
+    # only valid ids went to USDA, once
+    assert fdc.paths() == [("POST", "/fdc/v1/foods")]
@@ -0,0 +1,160 @@
+import pytest
+
+from app.services import cache as cache_module
+from app.services.cache import MemoryCache, SQLiteCache, TieredCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+@pytest.fixture(params=["memory", "sqlite", "tiered"])
+def cache(request, sqlite_path):
+    if request.param == "memory":
+        return MemoryCache(default_ttl=10, stale_ttl=20)
+    if request.param == "sqlite":
+        return SQLiteCache(sqlite_path, default_ttl=10, stale_ttl=20)
+    return TieredCache(MemoryCache(default_ttl=10, stale_ttl=20),
+                       SQLiteCache(sqlite_path, default_ttl=10, stale_ttl=20))
+
+
+def test_fresh_stale_and_expired(cache, clock):
+    cache.set("k", {"a": 1})
+    assert cache.get("k") == ({"a": 1}, False)
+    assert cache.get_raw("k") == (b'{"a":1}', False)
+
+    clock.now += 15  # past the TTL, inside the stale window
+    assert cache.get("k") == ({"a": 1}, True)
+    assert cache.get("k", allow_stale=False) == (None, False)
+
+    clock.now += 20  # past the stale window
+    assert cache.get("k") == (None, False)
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_delete_and_clear(cache, clock):
+    cache.set("short", 1, ttl=1)
+    cache.set("long", 2)
+    clock.now += 2
+    assert cache.get("short") == (1, True)
+    assert cache.get("long") == (2, False)
+    cache.delete("long")
+    assert cache.get("long") == (None, False)
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_stats_count_hits_stale_hits_and_misses(cache, clock):
+    cache.set("k", 1)
+    cache.get("k")
+    cache.get("missing")
+    cache.get("missing", count=False)
+    clock.now += 15
+    cache.get("k")
+    stats = cache.stats()
+    assert (stats["hits"], stats["stale_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (None, False)
+    assert (cache.get("a")[0], cache.get("c")[0]) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_memory_cache_is_bounded_by_bytes():
+    cache = MemoryCache(max_bytes=25)
+    cache.set("big", "x" * 100)  # larger than the whole cache: not stored
+    assert len(cache) == 0
+    for key in "abc":
+        cache.set(key, "x" * 8)  # 10 bytes of JSON each
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] == 20
+
+
+def test_sqlite_cache_evicts_least_recently_used(sqlite_path, clock):
+    cache = SQLiteCache(sqlite_path, max_entries=10, touch_interval=0, check_every=1000)
+    for i in range(10):
+        clock.now += 1
+        cache.set(f"k{i}", i)
+    clock.now += 1
+    cache.get("k0")  # recently used: survives
+    clock.now += 1
+    cache.set("k10", 10)
+    # back under 90% of the limit, oldest first
+    assert len(cache) <= 9
+    assert cache.get("k0")[0] == 0 and cache.get("k10")[0] == 10
+    assert cache.get("k1") == (None, False)
+    assert cache.evictions >= 2
+
+
+def test_sqlite_cache_drops_expired_rows_before_live_ones(sqlite_path, clock):
+    cache = SQLiteCache(sqlite_path, max_entries=4, default_ttl=10, touch_interval=0)
+    cache.set("old1", 1, ttl=1)
+    cache.set("old2", 2, ttl=1)
+    clock.now += 5
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert len(cache) == 3
+    assert cache.evictions == 0  # the expired rows made room; no live entry was evicted
+    assert [cache.get(k)[0] for k in ("a", "b", "c")] == ["a", "b", "c"]
+
+
+def test_sqlite_cache_only_measures_the_table_when_needed(sqlite_path, monkeypatch):
+    cache = SQLiteCache(sqlite_path, max_entries=1000, check_every=50)
+    measured = []
+    measure = cache._measure
+    monkeypatch.setattr(cache, "_measure", lambda conn: measured.append(1) or measure(conn))
+    for i in range(101):
+        cache.set(f"k{i}", i)
+    # on the first write, then after every 50 more
+    assert len(measured) == 3
+
+
+def test_sqlite_cache_sees_writes_of_other_processes(sqlite_path):
+    ours = SQLiteCache(sqlite_path, max_entries=10, check_every=5)
+    theirs = SQLiteCache(sqlite_path, max_entries=1000)
+    ours.set("first", 0)
+    for i in range(20):
+        theirs.set(f"t{i}", i)
+    for i in range(5):
+        ours.set(f"o{i}", i)
+    assert len(ours) <= 10
+
+
+def test_tiered_cache_fills_l1_from_l2(sqlite_path, clock):
+    l1, l2 = MemoryCache(default_ttl=10), SQLiteCache(sqlite_path, default_ttl=10, stale_ttl=20)
+    SQLiteCache(sqlite_path).set("k", {"a": 1}, ttl=10)  # written by another process
+    cache = TieredCache(l1, l2)
+    assert cache.get("k") == ({"a": 1}, False)
+    assert l1.get("k", count=False) == ({"a": 1}, False)
+
+
+def test_tiered_cache_serves_stale_from_l2_without_filling_l1(sqlite_path, clock):
+    l1, l2 = MemoryCache(default_ttl=10), SQLiteCache(sqlite_path, default_ttl=10, stale_ttl=20)
+    cache = TieredCache(l1, l2)
+    l2.set("k", 1)
+    clock.now += 15
+    assert cache.get("k") == (1, True)
+    assert cache.get_raw("k") == (b"1", True)
+    assert len(l1) == 0
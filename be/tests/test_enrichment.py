@@ -0,0 +1,174 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.models.enrichment import EnrichmentJob
+from app.models.food import FoodSnapshot
+from app.models.pantry import PantryItem
+from app.services import enrichment
+from app.services.pantry_versions import get_version
+
+from conftest import usda_food
+
+FOOD = usda_food("Lentils, raw", 116, 9, 0.4, 20, portion_gram=200)
+
+
+class FakeClient:
+    """get_foods stand-in: fails while `errors` is set, otherwise returns the known foods."""
+
+    def __init__(self, foods, errors=0):
+        self.foods = foods
+        self.errors = errors
+        self.calls = []
+
+    def get_foods(self, fdc_ids):
+        self.calls.append(list(fdc_ids))
+        if self.errors:
+            self.errors -= 1
+            raise RuntimeError("USDA get_foods failed: 503")
+        return {i: self.foods[i] for i in fdc_ids if i in self.foods}
+
+
+@pytest.fixture
+def queued(db, user, session_factory, monkeypatch):
+    """Pending items for a known (3001) and an unknown (3002) food, with their jobs queued."""
+    monkeypatch.setattr(enrichment, "SessionLocal", session_factory)
+    monkeypatch.setattr(settings, "ENRICHMENT_BACKOFF_BASE", 10.0)
+    monkeypatch.setattr(settings, "ENRICHMENT_MAX_ATTEMPTS", 3)
+    for fdc_id in (3001, 3002):
+        db.add(PantryItem(user_id=user.id, fdc_id=fdc_id, description="typed by user", enrichment_status="pending"))
+    enrichment.enqueue(db, [3001, 3002])
+    enrichment.enqueue(db, [3001])  # queued again by a concurrent writer
+    db.commit()
+    return user
+
+
+def _job(db, fdc_id):
+    db.expire_all()
+    return db.get(EnrichmentJob, fdc_id)
+
+
+def _items(db, user_id):
+    db.expire_all()
+    return {i.fdc_id: i for i in db.query(PantryItem).filter(PantryItem.user_id == user_id)}
+
+
+def test_enqueue_is_idempotent(db, queued):
+    assert db.query(EnrichmentJob).count() == 2
+    assert {j.status for j in db.query(EnrichmentJob)} == {"pending"}
+
+
+def test_claim_takes_each_due_job_once(db, queued):
+    worker = enrichment.EnrichmentWorker(client=FakeClient({}))
+    assert sorted(worker.claim(10)) == [3001, 3002]
+    assert _job(db, 3001).status == "running"
+    assert worker.claim(10) == []
+
+
+def test_claim_reclaims_abandoned_jobs(db, queued):
+    worker = enrichment.EnrichmentWorker(client=FakeClient({}))
+    worker.claim(10)
+    job = _job(db, 3001)
+    job.updated_at = datetime.utcnow() - timedelta(seconds=settings.ENRICHMENT_LOCK_TIMEOUT + 1)
+    db.commit()
+    assert worker.claim(10) == [3001]
+
+
+def test_failed_lookup_is_retried_with_backoff(db, queued):
+    client = FakeClient({3001: FOOD}, errors=1)
+    worker = enrichment.EnrichmentWorker(client=client)
+    version = get_version(db, queued.id)
+
+    started = datetime.utcnow()
+    worker.run(worker.claim(10))
+    job = _job(db, 3001)
+    assert (job.status, job.attempts) == ("pending", 1)
+    assert "503" in job.last_error
+    # ENRICHMENT_BACKOFF_BASE * 2 ** 0, jittered by 0.5-1.5
+    assert started + timedelta(seconds=5) <= job.next_attempt_at <= datetime.utcnow() + timedelta(seconds=15)
+    assert worker.claim(10) == []  # not due yet
+    assert get_version(db, queued.id) == version
+    assert {i.enrichment_status for i in _items(db, queued.id).values()} == {"pending"}
+
+    db.query(EnrichmentJob).update({EnrichmentJob.next_attempt_at: datetime.utcnow()})
+    db.commit()
+    worker.run(worker.claim(10))
+    assert len(client.calls) == 2
+    assert (_job(db, 3001).status, _job(db, 3001).attempts) == ("done", 2)
+    assert (_job(db, 3002).status, _job(db, 3002).last_error) == ("failed", "Food not found in USDA")
+
+
+def test_finish_enriches_items_and_bumps_version(db, queued):
+    worker = enrichment.EnrichmentWorker(client=FakeClient({3001: FOOD}))
+    version = get_version(db, queued.id)
+
+    worker.run(worker.claim(10))
+    items = _items(db, queued.id)
+    assert items[3001].enrichment_status == "done"
+    assert items[3001].description == "Lentils, raw"
+    assert items[3002].enrichment_status == "failed"
+    assert db.get(FoodSnapshot, 3001).calories == 116
+    assert get_version(db, queued.id) == version + 1
+
+
+def test_retries_stop_after_max_attempts(db, queued):
+    worker = enrichment.EnrichmentWorker(client=FakeClient({3001: FOOD}, errors=settings.ENRICHMENT_MAX_ATTEMPTS))
+    version = get_version(db, queued.id)
+    for _attempt in range(settings.ENRICHMENT_MAX_ATTEMPTS):
+        db.query(EnrichmentJob).update({EnrichmentJob.next_attempt_at: datetime.utcnow()})
+        db.commit()
+        worker.run(worker.claim(10))
+
+    job = _job(db, 3001)
+    assert (job.status, job.attempts) == ("failed", settings.ENRICHMENT_MAX_ATTEMPTS)
+    assert worker.claim(10) == []
+    assert {i.enrichment_status for i in _items(db, queued.id).values()} == {"failed"}
+    assert get_version(db, queued.id) == version + 1
+
+
+def test_invalid_fdc_id_fails_alone(db, queued):
+    # a row stored before fdc_id was validated, queued with valid ones
+    db.add(PantryItem(user_id=queued.id, fdc_id=-1, description="typed by user", enrichment_status="pending"))
+    enrichment.enqueue(db, [-1])
+    db.commit()
+    client = FakeClient({3001: FOOD})
+    worker = enrichment.EnrichmentWorker(client=client)
+
+    worker.run(worker.claim(10))
+    assert [sorted(c) for c in client.calls] == [[3001, 3002]]
+    assert (_job(db, -1).status, _job(db, -1).last_error) == ("failed", "Invalid FDC ID: -1")
+    assert _job(db, 3001).status == "done"
+    items = _items(db, queued.id)
+    assert (items[-1].enrichment_status, items[3001].enrichment_status) == ("failed", "done")
+
+
+def test_invalid_fdc_id_fails_even_when_usda_is_down(db, queued):
+    db.add(PantryItem(user_id=queued.id, fdc_id=0, description="typed by user", enrichment_status="pending"))
+    enrichment.enqueue(db, [0])
+    db.commit()
+    worker = enrichment.EnrichmentWorker(client=FakeClient({3001: FOOD}, errors=1))
+
+    worker.run(worker.claim(10))
+    assert _job(db, 0).status == "failed"
+    assert {_job(db, 3001).status, _job(db, 3002).status} == {"pending"}
+    assert _items(db, queued.id)[0].enrichment_status == "failed"
+
+
+def test_item_added_mid_run_rearms_the_running_job(db, queued, session_factory):
+    class AddsItemMidRun(FakeClient):
+        def get_foods(self, fdc_ids):
+            # another request adds an item for a food while its batch is in flight
+            writer = session_factory()
+            writer.add(PantryItem(user_id=queued.id, fdc_id=3002, description="added later",
+                                  enrichment_status="pending"))
+            enrichment.enqueue(writer, [3002])
+            writer.commit()
+            writer.close()
+            return super().get_foods(fdc_ids)
+
+    worker = enrichment.EnrichmentWorker(client=AddsItemMidRun({3001: FOOD}))
+    worker.run(worker.claim(10))
+    assert _job(db, 3001).status == "done"
+    assert (_job(db, 3002).status, _job(db, 3002).attempts) == ("pending", 0)
+    assert worker.claim(10) == [3002]
@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+import pytest
+
+from app import cli
+from app.config import settings
+from app.services.fdc_local import LocalFoodStore, import_fdc_dump
+
+from conftest import usda_food
+
+SR_LEGACY = {
+    "SRLegacyFoods": [
+        {
+            "fdcId": 171705,
+            "description": "Lentils, raw",
+            "dataType": "SR Legacy",
+            "foodCategory": {"description": "Legumes and Legume Products"},
+            "foodNutrients": [
+                {"nutrient": {"id": 1008, "number": "208", "name": "Energy", "unitName": "kcal"}, "amount": 352},
+                {"nutrient": {"id": 1003, "number": "203", "name": "Protein", "unitName": "g"}, "amount": 24.6},
+                {"nutrient": {"id": 1004, "number": "204", "name": "Total lipid (fat)", "unitName": "g"},
+                 "amount": 1.06},
+                {"nutrient": {"id": 1005, "number": "205", "name": "Carbohydrate, by difference", "unitName": "g"},
+                 "amount": 63.4},
+            ],
+            "foodPortions": [{"gramWeight": 192, "amount": 1}],
+        },
+        {
+            "fdcId": 173424,
+            "description": "Chicken, broilers or fryers, breast, meat only, raw",
+            "dataType": "SR Legacy",
+            "foodCategory": {"description": "Poultry Products"},
+            "foodNutrients": [{"nutrient": {"id": 1008, "number": "208"}, "amount": 120}],
+        },
+        {"fdcId": 1, "description": ""},  # no description: skipped
+        {"description": "no id"},  # skipped
+    ]
+}
+
+CSV = {
+    "food.csv": "fdc_id,data_type,description,food_category_id\n"
+                "2001,foundation_food,\"Oats, rolled\",8\n"
+                "2002,foundation_food,Almond butter,12\n",
+    "nutrient.csv": "id,name,unit_name,nutrient_nbr\n"
+                    "1008,Energy,KCAL,208\n1003,Protein,G,203\n1258,\"Fatty acids, total saturated\",G,606\n",
+    "food_nutrient.csv": "id,fdc_id,nutrient_id,amount\n"
+                         "1,2001,1008,379\n2,2001,1003,13.2\n3,2001,1258,\n4,2002,1008,614\n5,2002,1258,4.5\n",
+    "food_category.csv": "id,code,description\n8,0800,Breakfast Cereals\n",
+    "food_portion.csv": "id,fdc_id,amount,gram_weight,portion_description\n1,2001,1,81,1 cup\n",
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalFoodStore(str(tmp_path / "fdc.sqlite3"))
+
+
+@pytest.fixture
+def json_dump(tmp_path):
+    path = tmp_path / "sr_legacy.json"
+    path.write_text(json.dumps(SR_LEGACY))
+    return str(path)
+
+
+@pytest.fixture
+def csv_dump(tmp_path):
+    directory = tmp_path / "foundation"
+    directory.mkdir()
+    for name, content in CSV.items():
+        (directory / name).write_text(content)
+    return str(directory)
+
+
+def _row(store, fdc_id):
+    return store._conn().execute(
+        "SELECT description, data_type, category, calories, protein_g, fat_g, carbs_g, portion_gram"
+        " FROM foods WHERE fdc_id = ?", (fdc_id,)).fetchone()
+
+
+def test_import_json_dump(store, json_dump):
+    assert import_fdc_dump(json_dump, store) == 2
+    assert store.count() == 2
+    assert _row(store, 171705) == ("Lentils, raw", "SR Legacy", "Legumes and Legume Products",
+                                   352, 24.6, 1.06, 63.4, 192)
+    assert store.get_food(171705) == SR_LEGACY["SRLegacyFoods"][0]
+    assert store.get_food(1) is None
+
+
+def test_import_json_list(store, tmp_path):
+    path = tmp_path / "foods.json"
+    path.write_text(json.dumps([dict(usda_food("Oats", 380, 13, 7, 68), fdcId=9)]))
+    assert import_fdc_dump(str(path), store) == 1
+    assert _row(store, 9)[3:5] == (380, 13)
+
+
+def test_import_csv_directory(store, csv_dump):
+    assert import_fdc_dump(csv_dump, store) == 2
+    assert _row(store, 2001) == ("Oats, rolled", "foundation_food", "Breakfast Cereals", 379, 13.2, None, None, 81)
+    # unknown category id is kept as is; no portion: per 100 g
+    assert _row(store, 2002)[2:4] == ("12", 614)
+    assert _row(store, 2002)[7] == 100
+    oats = store.get_food(2001)
+    assert oats["foodPortions"] == [{"gramWeight": 81.0, "portionDescription": "1 cup"}]
+    # empty amounts are left out
+    assert [n["nutrient"]["id"] for n in oats["foodNutrients"]] == [1008, 1003]
+
+
+def test_reimport_replaces_rows_and_search_index(store, json_dump):
+    import_fdc_dump(json_dump, store)
+    store.import_foods([{"fdcId": 171705, "description": "Lentils, pink, raw"}])
+    assert store.count() == 2
+    assert store.search("pink")["foods"][0]["fdcId"] == 171705
+    assert store.search("lentils")["totalHits"] == 1
+
+
+def test_search(store, json_dump, csv_dump):
+    import_fdc_dump(json_dump, store)
+    import_fdc_dump(csv_dump, store)
+    result = store.search("chick bre")  # every token, as a prefix
+    assert [f["fdcId"] for f in result["foods"]] == [173424]
+    assert result["foods"][0]["foodCategory"] == "Poultry Products"
+    assert store.search("poultry")["totalHits"] == 1  # category is indexed too
+    assert store.search("quinoa") is None
+    assert store.search("!!") is None
+    page = store.search("a", page_size=1, page_number=2)
+    assert (page["currentPage"], page["totalPages"], len(page["foods"])) == (2, page["totalHits"], 1)
+
+
+def test_cli_import(tmp_path, json_dump, capsys):
+    db = str(tmp_path / "cli.sqlite3")
+    cli.main(["import-fdc", json_dump, "--db", db])
+    assert "imported 2 foods" in capsys.readouterr().out
+    assert LocalFoodStore(db).count() == 2
+
+
+# -------------------------
+# USDA_MODE
+# -------------------------
+@pytest.fixture
+def imported(store, json_dump, fdc):
+    import_fdc_dump(json_dump, store)
+    fdc.foods[999] = usda_food("Remote only", 100, 1, 1, 1)
+    return store
+
+
+def test_local_first_serves_local_foods_and_asks_usda_for_the_rest(imported, fdc, monkeypatch):
+    monkeypatch.setattr(settings, "USDA_MODE", "local_first")
+    client = fdc.sync_client(local_store=imported)
+    assert client.get_food(171705)["description"] == "Lentils, raw"
+    assert fdc.requests == []
+    assert client.get_food(999)["description"] == "Remote only"
+    assert sorted(client.get_foods([171705, 999, 173424])) == [999, 171705, 173424]
+    assert client.search_foods("lentils")["foods"][0]["fdcId"] == 171705
+    # only 999 went upstream (and was cached after the first lookup)
+    assert fdc.paths() == [("GET", "/fdc/v1/foods/999")]
+    assert client.search_foods("remote")["foods"][0]["fdcId"] == 999  # no local match: upstream
+
+
+def test_local_mode_never_calls_usda(imported, fdc, monkeypatch):
+    monkeypatch.setattr(settings, "USDA_MODE", "local")
+    client = fdc.sync_client(local_store=imported)
+    assert client.get_food(171705)["description"] == "Lentils, raw"
+    with pytest.raises(ValueError):
+        client.get_food(999)
+    assert sorted(client.get_foods([171705, 999])) == [171705]
+    assert client.search_foods("remote") == {"totalHits": 0, "currentPage": 1, "totalPages": 0, "foods": []}
+    async_client = fdc.async_client(local_store=imported)
+    assert sorted(asyncio.run(async_client.get_foods([173424, 999]))) == [173424]
+    assert fdc.requests == []
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from app.models.pantry import PantryEvent
+from app.services.food_snapshots import load_snapshots
+from app.services.meal_plans import DayAlreadyAccepted, accepted_days, load_plan, saved_fields, update_plan
+from app.services.nutrition_matrix import PantryMatrix
+from app.services.pantry_ledger import change_quantities
+
+from conftest import usda_food
+
+DAILY_CAL = 1800
+DAYS = 5
+
+FOODS = {
+    1001: (4.0, usda_food("Oats", 380, 13, 7, 68, portion_gram=80)),
+    1002: (6.0, usda_food("Lentils", 116, 9, 0.4, 20, portion_gram=200)),
+    1003: (5.0, usda_food("Eggs", 143, 12.6, 9.5, 0.7, portion_gram=50)),
+    1004: (3.0, usda_food("Rice", 130, 2.7, 0.3, 28, portion_gram=150)),
+    1005: (8.0, usda_food("Apples", 52, 0.3, 0.2, 14, portion_gram=180)),
+}
+
+
+def _plan(db, user_id, pantry, accept_day=None):
+    nutrients, _missing, _stale = load_snapshots(db, [p.fdc_id for p in pantry])
+    matrix = PantryMatrix.from_nutrients(pantry, nutrients)
+    return update_plan(db, user_id, pantry, matrix, DAILY_CAL, DAYS, accept_day=accept_day)
+
+
+def _saved_day(db, user_id, day):
+    """The planner's picks for a day as {pantry row: grams}."""
+    entry = json.loads(load_plan(db, user_id).state)[day]
+    picks = {}
+    for row, grams in zip(entry["idx"], entry["grams"]):
+        picks[row] = picks.get(row, 0.0) + grams
+    return picks
+
+
+def test_unchanged_pantry_reuses_every_day(db, user, stock_pantry):
+    pantry = stock_pantry(FOODS)
+    first = _plan(db, user.id, pantry)
+    assert first["replanned_days"] == DAYS
+
+    again = _plan(db, user.id, pantry)
+    assert again["replanned_days"] == 0
+    assert again["reused_days"] == DAYS
+    assert again["days"] == first["days"]
+
+
+def test_quantity_change_replans_days_using_the_item(db, user, stock_pantry):
+    pantry = stock_pantry(FOODS)
+    _plan(db, user.id, pantry)
+    used = pantry[min(_saved_day(db, user.id, 0))]
+    change_quantities(db, user.id, [(used, 0.0)], "adjust")
+    db.commit()
+
+    again = _plan(db, user.id, pantry)
+    assert again["replanned_days"] >= 1
+    assert again["replanned_days"] + again["reused_days"] == DAYS
+    assert all(item["fdc_id"] != used.fdc_id for day in again["days"] for item in day["items"])
+
+
+def test_accepting_a_day_consumes_its_food(db, user, stock_pantry):
+    pantry = stock_pantry(FOODS)
+    before = [p.quantity for p in pantry]
+    _plan(db, user.id, pantry)
+    picks = _saved_day(db, user.id, 0)
+    portions = {row: FOODS[pantry[row].fdc_id][1]["foodPortions"][0]["gramWeight"] for row in picks}
+
+    out = _plan(db, user.id, pantry, accept_day=0)
+    assert out["days"][0]["accepted"] is True
+    for row, item in enumerate(pantry):
+        expected = max(before[row] - picks.get(row, 0.0) / portions.get(row, 1.0), 0.0)
+        assert item.quantity == pytest.approx(expected)
+    events = db.query(PantryEvent).filter(PantryEvent.kind == "consume").all()
+    assert sorted(e.item_id for e in events) == sorted(pantry[row].id for row in picks)
+    assert {e.plan_day for e in events} == {1}
+    assert list(accepted_days(saved_fields(load_plan(db, user.id)))) == ["0"]
+
+
+def test_accepting_a_day_twice_is_rejected(db, user, stock_pantry):
+    pantry = stock_pantry(FOODS)
+    _plan(db, user.id, pantry)
+    _plan(db, user.id, pantry, accept_day=0)
+    quantities = [p.quantity for p in pantry]
+    consumed = db.query(PantryEvent).filter(PantryEvent.kind == "consume").count()
+
+    with pytest.raises(DayAlreadyAccepted):
+        _plan(db, user.id, pantry, accept_day=0)
+    db.rollback()
+    assert [p.quantity for p in pantry] == quantities
+    assert db.query(PantryEvent).filter(PantryEvent.kind == "consume").count() == consumed
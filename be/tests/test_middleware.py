@@ -0,0 +1,27 @@
+from app.services.metrics import REGISTRY
+from app.utils.security import principal_cache
+
+from conftest import auth_headers
+
+
+def test_query_report_headers(api, user):
+    r = api.get("/pantry/", params={"user_id": user.id}, headers=auth_headers(user))
+    assert r.status_code == 200
+    assert int(r.headers["X-DB-Queries"]) >= 1
+    assert r.headers["Server-Timing"].startswith("db;dur=")
+
+
+def test_request_metrics_are_labelled_by_route_template(api, user):
+    r = api.patch("/pantry/999", json={"quantity": 1}, headers=auth_headers(user))
+    assert r.status_code == 404
+    api.get("/no-such-page")
+    metrics = api.get("/metrics").text
+    assert 'method="PATCH",route="/pantry/{item_id}",status="404"' in metrics
+    assert 'route="unmatched",status="404"' in metrics
+    assert "/pantry/999" not in metrics
+
+
+def test_principal_cache_is_reported(api, user):
+    api.get("/users/me", headers=auth_headers(user))
+    assert len(principal_cache()) == 1
+    assert 'cache="auth"' in REGISTRY.render()
@@ -0,0 +1,76 @@
+import pytest
+
+from app.services.nutrients import FIELDS, NUTRIENT_KEYS, food_nutrients, parse_nutrients
+
+LOOKUPS = [(key, nid, number) for key, ids, numbers in FIELDS for nid, number in zip(ids, numbers)]
+
+
+def _values(entries):
+    values, _portion = parse_nutrients({"foodNutrients": entries})
+    return {k: v for k, v in zip(NUTRIENT_KEYS, values) if v is not None}
+
+
+@pytest.mark.parametrize("key,nid,number", LOOKUPS)
+def test_every_id_and_number_maps_to_its_nutrient(key, nid, number):
+    assert _values([{"nutrientId": nid, "value": 7.5}]) == {key: 7.5}  # search / dump
+    assert _values([{"nutrient": {"id": nid}, "amount": 7.5}]) == {key: 7.5}  # full detail
+    assert _values([{"nutrientNumber": number, "value": 7.5}]) == {key: 7.5}
+    assert _values([{"number": number, "amount": 7.5}]) == {key: 7.5}  # abridged
+    assert _values([{"nutrient": {"number": number}, "amount": 7.5}]) == {key: 7.5}
+
+
+def test_lookup_tables_pin_the_fdc_ids():
+    assert {key: ids[0] for key, ids, _numbers in FIELDS} == {
+        "calories": 1008, "protein_g": 1003, "fat_g": 1004, "carbs_g": 1005, "fiber_g": 1079,
+        "sugars_g": 2000, "saturated_fat_g": 1258, "cholesterol_mg": 1253, "sodium_mg": 1093,
+        "potassium_mg": 1092, "calcium_mg": 1087, "iron_mg": 1089, "magnesium_mg": 1090, "zinc_mg": 1095,
+        "vitamin_a_ug": 1106, "vitamin_c_mg": 1162, "vitamin_d_ug": 1114, "vitamin_b12_ug": 1178,
+        "folate_ug": 1190,
+    }
+
+
+def test_saturated_fat_is_not_total_fat():
+    entries = [
+        {"nutrient": {"id": 1258, "number": "606", "name": "Fatty acids, total saturated"}, "amount": 1.2},
+        {"nutrient": {"id": 1004, "number": "204", "name": "Total lipid (fat)"}, "amount": 9.5},
+    ]
+    assert _values(entries) == {"fat_g": 9.5, "saturated_fat_g": 1.2}
+    assert _values(entries[::-1]) == {"fat_g": 9.5, "saturated_fat_g": 1.2}
+    # by name only
+    assert _values([{"nutrientName": "Fatty acids, total saturated", "value": 1.2},
+                    {"nutrientName": "Total lipid (fat)", "value": 9.5}]) == {"fat_g": 9.5, "saturated_fat_g": 1.2}
+
+
+def test_earlier_ids_win_whatever_the_order():
+    atwater = {"nutrientId": 2047, "value": 360.0}  # Energy (Atwater General Factors)
+    energy = {"nutrientId": 1008, "value": 352.0}
+    assert _values([atwater, energy]) == {"calories": 352.0}
+    assert _values([energy, atwater]) == {"calories": 352.0}
+    assert _values([atwater]) == {"calories": 360.0}
+
+
+def test_kilojoules_are_not_calories():
+    assert _values([{"nutrientId": 1062, "nutrientNumber": "268", "value": 1470}]) == {}
+    assert _values([{"nutrientName": "Energy", "unitName": "kJ", "value": 1470}]) == {}
+    assert _values([{"nutrientName": "Energy", "unitName": "KCAL", "value": 352}]) == {"calories": 352.0}
+
+
+def test_id_or_number_matches_beat_names():
+    entries = [{"nutrientName": "Protein", "value": 1.0}, {"nutrientId": 1003, "value": 24.6}]
+    assert _values(entries) == {"protein_g": 24.6}
+
+
+def test_unknown_ids_and_bad_values_are_skipped():
+    entries = [{"nutrientId": 9999, "nutrientName": "Protein", "value": 5.0},  # unknown id: no name fallback
+               {"nutrientId": 1004, "value": "n/a"},
+               {"nutrientId": 1005}]
+    assert _values(entries) == {}
+
+
+def test_food_nutrients_adds_the_portion_and_is_memoized():
+    food = {"fdcId": 1, "publicationDate": "2020-01-01", "foodPortions": [{"gramWeight": 2}, {"gramWeight": 40}],
+            "foodNutrients": [{"nutrientId": 1003, "value": 10}]}
+    first = food_nutrients(food)
+    assert first["protein_g"] == 10 and first["portion_gram"] == 40
+    first["extra"] = 1  # callers may add keys
+    assert "extra" not in food_nutrients(food)
@@ -0,0 +1,67 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services.nutrition_matrix import PantryMatrix, aggregate_matrix, plan_matrix
+from app.services.nutrition_planner import aggregate_from_nutrients, plan_daily_from_targets
+from app.services.result_cache import get_result_cache
+
+from conftest import auth_headers, usda_food
+
+TARGETS = {"nutrition": {"calories": 2400.0, "protein_g": 150.0, "fat_g": 67.0, "carbs_g": 300.0}}
+
+
+def make_pantry(n: int, seed: int):
+    """Random pantry rows and nutrients, with the gaps real data has (unknown values, no portion, used up)."""
+    rnd = random.Random(seed)
+    items, nutrients = [], {}
+    for i in range(n):
+        fdc_id = 100000 + i
+        items.append(SimpleNamespace(fdc_id=fdc_id, description=f"food {i}",
+                                     quantity=rnd.choice([None, 0, 0.5, 1, 2, 3, 5])))
+        nutrients[fdc_id] = {
+            "calories": None if rnd.random() < 0.05 else rnd.uniform(15, 600),
+            "protein_g": rnd.uniform(0, 35),
+            "fat_g": None if rnd.random() < 0.1 else rnd.uniform(0, 50),
+            "carbs_g": rnd.uniform(0, 80),
+            "portion_gram": rnd.choice([None, 30.0, 100.0, 150.0, 240.0]),
+        }
+    return items, nutrients
+
+
+@pytest.mark.parametrize("n", [1, 3, 10, 100, 400])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matrix_aggregate_matches_dict(n, seed):
+    items, nutrients = make_pantry(n, seed)
+    expected = aggregate_from_nutrients(items, nutrients)
+    assert aggregate_matrix(PantryMatrix.from_nutrients(items, nutrients)) == expected
+    assert aggregate_matrix(PantryMatrix.from_nutrients(items, nutrients), breakdown=False)["totals"] == \
+        expected["totals"]
+
+
+@pytest.mark.parametrize("n", [1, 3, 10, 100, 400])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matrix_plan_matches_dict(n, seed):
+    items, nutrients = make_pantry(n, seed)
+    breakdown = aggregate_from_nutrients(items, nutrients)["breakdown"]
+    expected = plan_daily_from_targets(TARGETS, breakdown)
+    assert plan_matrix(TARGETS, PantryMatrix.from_nutrients(items, nutrients)) == expected
+
+
+@pytest.mark.parametrize("path", ["/pantry/aggregate", "/pantry/weekly-diet"])
+def test_endpoints_answer_the_same_on_both_paths(api, user, stock_pantry, monkeypatch, path):
+    stock_pantry({
+        4001: (3, usda_food("Oats", 380, 13, 7, 68, portion_gram=80)),
+        4002: (2, usda_food("Lentils", 116, 9, 0.4, 20, portion_gram=200)),
+        4003: (12, usda_food("Eggs", 143, 12.6, 9.5, 0.7, portion_gram=50)),
+    })
+    responses = []
+    for min_items in (1000, 1):  # dict path, then matrix path
+        monkeypatch.setattr(settings, "PANTRY_MATRIX_MIN_ITEMS", min_items)
+        get_result_cache().clear()
+        r = api.get(path, params={"user_id": user.id}, headers=auth_headers(user))
+        assert r.status_code == 200 and r.headers["X-Result-Cache"] == "miss"
+        responses.append(r.json())
+    assert responses[0] == responses[1]
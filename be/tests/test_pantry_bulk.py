@@ -0,0 +1,49 @@
+import pytest
+
+from app.models.enrichment import EnrichmentJob
+from app.models.pantry import PantryItem
+
+from conftest import auth_headers, usda_food
+
+OATS = usda_food("Oats, rolled", 380, 13, 7, 68, portion_gram=80)
+
+
+@pytest.fixture
+def known(fdc):
+    fdc.foods[1042] = OATS
+    return fdc
+
+
+def _rows(*fdc_ids):
+    return [{"fdc_id": i, "description": f"food {i}", "quantity": 2} for i in fdc_ids]
+
+
+def test_non_positive_fdc_id_is_invalid(api, db, user, known):
+    r = api.post("/pantry/bulk", json=_rows(-1, 0, 1042), headers=auth_headers(user))
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["created"], body["failed"]) == (1, 2)
+    assert [row["status"] for row in body["results"]] == ["invalid", "invalid", "created"]
+    assert "fdc_id" in body["results"][0]["errors"][0]
+    assert body["results"][2]["enrichment_status"] == "done"
+    assert [(i.fdc_id, i.description) for i in db.query(PantryItem)] == [(1042, "Oats, rolled")]
+
+
+def test_all_or_nothing_rejects_invalid_fdc_id(api, db, user, known):
+    r = api.post("/pantry/bulk?all_or_nothing=true", json=_rows(1042, -5), headers=auth_headers(user))
+    assert r.status_code == 422
+    assert db.query(PantryItem).count() == 0
+
+
+def test_usda_outage_queues_rows(api, db, user, known):
+    known.fail_status = 503
+    r = api.post("/pantry/bulk", json=_rows(1042, 2000), headers=auth_headers(user))
+    assert r.status_code == 200
+    assert [row["enrichment_status"] for row in r.json()["results"]] == ["pending", "pending"]
+    assert {j.fdc_id for j in db.query(EnrichmentJob)} == {1042, 2000}
+
+
+def test_unknown_food_fails_without_outage(api, db, user, known):
+    r = api.post("/pantry/bulk", json=_rows(1042, 2000), headers=auth_headers(user))
+    assert [row["enrichment_status"] for row in r.json()["results"]] == ["done", "failed"]
+    assert db.query(EnrichmentJob).count() == 0
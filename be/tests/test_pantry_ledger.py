@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import func
+
+from app.models.pantry import PantryEvent, PantryItem, PantryTotals
+from app.services import pantry_ledger
+from app.services.food_snapshots import load_snapshots, upsert_snapshots
+from app.services.nutrition_matrix import PantryMatrix, aggregate_matrix
+
+from conftest import usda_food
+
+FOODS = {
+    2001: usda_food("Oats", 380, 13, 7, 68, portion_gram=80),
+    2002: usda_food("Lentils", 116, 9, 0.4, 20, portion_gram=200),
+    2003: usda_food("Eggs", 143, 12.6, 9.5, 0.7, portion_gram=50),
+    2004: usda_food("Rice", 130, 2.7, 0.3, 28, portion_gram=150),
+}
+
+
+def _add(db, user_id, fdc_id, quantity):
+    """Insert an item the way the API does: the row, then its ledger entry."""
+    item = PantryItem(user_id=user_id, fdc_id=fdc_id, description=FOODS[fdc_id]["description"], quantity=quantity)
+    db.add(item)
+    db.flush()
+    pantry_ledger.items_added(db, user_id, [(fdc_id, quantity)], after_id=item.id - 1)
+    db.commit()
+    return item
+
+
+def _aggregate(db, user_id):
+    pantry = db.query(PantryItem).filter(PantryItem.user_id == user_id).order_by(PantryItem.id).all()
+    nutrients, _missing, _stale = load_snapshots(db, [p.fdc_id for p in pantry])
+    covered = [p for p in pantry if p.fdc_id in nutrients]
+    return aggregate_matrix(PantryMatrix.from_nutrients(covered, nutrients), breakdown=False)["totals"]
+
+
+def _stored(db, user_id):
+    return pantry_ledger.get_totals(db, user_id)["totals"]
+
+
+@pytest.fixture
+def ledger_pantry(db, user):
+    upsert_snapshots(db, {fdc_id: food for fdc_id, food in FOODS.items() if fdc_id != 2004})
+    items = [_add(db, user.id, 2001, 3.0), _add(db, user.id, 2002, 1.5), _add(db, user.id, 2003, 12.0),
+             _add(db, user.id, 2004, 2.0)]  # no snapshot yet
+    pantry_ledger.get_totals(db, user.id)  # the first item creates the row stale; materialize it
+    # a replayed history: restocks, partial and full consumption, a direct adjustment
+    for item, quantity, kind in [(items[0], 5.0, "restock"), (items[1], 0.25, "consume"),
+                                 (items[2], 7.0, "consume"), (items[0], 4.5, "consume"),
+                                 (items[2], 0.0, "consume"), (items[3], 3.0, "adjust"),
+                                 (items[1], 2.75, "adjust")]:
+        pantry_ledger.change_quantities(db, user.id, [(item, quantity)], kind)
+        db.commit()
+    return items
+
+
+def test_incremental_totals_match_aggregate(db, user, ledger_pantry):
+    row = db.get(PantryTotals, user.id)
+    assert row is not None and not row.stale
+    assert _stored(db, user.id) == pytest.approx(_aggregate(db, user.id), abs=1e-6)
+    out = pantry_ledger.get_totals(db, user.id)
+    assert out["items"] == 4
+    assert out["items_without_nutrients"] == 1
+
+
+def test_recompute_matches_incremental_totals(db, user, ledger_pantry):
+    incremental = _stored(db, user.id)
+    pantry_ledger.recompute_totals(db, user.id)
+    assert _stored(db, user.id) == pytest.approx(incremental, abs=1e-6)
+
+
+def test_new_snapshot_marks_totals_stale(db, user, ledger_pantry):
+    upsert_snapshots(db, {2004: FOODS[2004]})
+    assert db.get(PantryTotals, user.id).stale
+    out = pantry_ledger.get_totals(db, user.id)
+    assert "partial" not in out
+    assert out["totals"] == pytest.approx(_aggregate(db, user.id), abs=1e-6)
+
+
+def test_quantities_are_the_sum_of_events(db, user, ledger_pantry):
+    balances = dict(db.query(PantryEvent.item_id, func.sum(PantryEvent.quantity)).group_by(PantryEvent.item_id))
+    assert balances == pytest.approx({item.id: item.quantity for item in ledger_pantry})
+
+
+def test_rebuild_restores_quantities_from_events(db, user, ledger_pantry):
+    expected = {item.id: item.quantity for item in ledger_pantry}
+    totals = _stored(db, user.id)
+    # drift the stored quantities without recording events
+    for item in ledger_pantry:
+        item.quantity = 99.0
+    db.commit()
+
+    out = pantry_ledger.rebuild(db, user.id)
+    assert out == {"user_id": user.id, "items": 4, "opened": 0, "corrected": 4}
+    assert {item.id: item.quantity for item in ledger_pantry} == pytest.approx(expected)
+    assert _stored(db, user.id) == pytest.approx(totals, abs=1e-6)
+    assert _stored(db, user.id) == pytest.approx(_aggregate(db, user.id), abs=1e-6)
+
+
+def test_rebuild_opens_items_stocked_before_the_ledger(db, user, ledger_pantry):
+    legacy = PantryItem(user_id=user.id, fdc_id=2002, description="Lentils", quantity=4.0)
+    db.add(legacy)
+    db.commit()
+
+    out = pantry_ledger.rebuild(db, user.id)
+    assert out["opened"] == 1 and out["corrected"] == 0
+    assert legacy.quantity == 4.0
+    assert _stored(db, user.id) == pytest.approx(_aggregate(db, user.id), abs=1e-6)
+
+
+def test_negative_quantity_is_rejected(db, user, ledger_pantry):
+    item = ledger_pantry[0]
+    events = db.query(PantryEvent).count()
+    totals = _stored(db, user.id)
+
+    with pytest.raises(ValueError):
+        pantry_ledger.change_quantities(db, user.id, [(ledger_pantry[1], 1.0), (item, -0.5)], "adjust")
+    db.rollback()
+    assert db.query(PantryEvent).count() == events
+    assert _stored(db, user.id) == totals
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.pantry import PantryItem
+
+from conftest import auth_headers
+
+T0 = datetime(2026, 1, 5, 12, 0, 0)
+
+
+@pytest.fixture
+def pantry(db, user):
+    """Seven items; 2-5 were added in the same instant (e.g. one bulk import)."""
+    stamps = [T0, T0 + timedelta(seconds=1), *[T0 + timedelta(seconds=2)] * 4, T0 + timedelta(seconds=3)]
+    items = [PantryItem(user_id=user.id, fdc_id=5000 + i, description=f"food {i}", quantity=i, added_at=stamp,
+                        enrichment_status="done") for i, stamp in enumerate(stamps)]
+    db.add_all(items)
+    db.commit()
+    return [i.id for i in items]
+
+
+def _get(api, user, **params):
+    return api.get("/pantry/", params={"user_id": user.id, **params}, headers=auth_headers(user))
+
+
+def test_pages_cover_every_item_once_in_order(api, user, pantry):
+    seen, cursor, pages = [], None, 0
+    while True:
+        r = _get(api, user, limit=2, **({"cursor": cursor} if cursor else {}))
+        assert r.status_code == 200
+        seen += [item["id"] for item in r.json()]
+        pages += 1
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    # pages split the items that share an added_at without skipping or repeating one
+    assert seen == pantry
+    assert pages == 4
+
+
+def test_unpaged_list_and_last_page(api, user, pantry):
+    r = _get(api, user)
+    assert [item["id"] for item in r.json()] == pantry
+    assert "X-Next-Cursor" not in r.headers
+    r = _get(api, user, limit=7)
+    assert len(r.json()) == 7 and "X-Next-Cursor" not in r.headers
+
+
+def test_invalid_cursor(api, user, pantry):
+    assert _get(api, user, limit=2, cursor="not a cursor!").status_code == 400
+
+
+def test_fields_projection(api, user, pantry):
+    r = _get(api, user, fields="fdc_id, quantity,bogus", limit=1)
+    assert r.json() == [{"fdc_id": 5000, "quantity": 0.0}]
+    assert _get(api, user, fields="bogus").status_code == 400
+
+
+def test_etag_and_not_modified(api, user, pantry):
+    r = _get(api, user, limit=2)
+    etag = r.headers["ETag"]
+    r = api.get("/pantry/", params={"user_id": user.id, "limit": 2},
+                headers={**auth_headers(user), "If-None-Match": etag})
+    assert r.status_code == 304 and r.headers["ETag"] == etag and r.content == b""
+    # another page or projection is another representation
+    assert _get(api, user, limit=3).headers["ETag"] != etag
+    assert _get(api, user, limit=2, fields="id").headers["ETag"] != etag
+
+    # a pantry write changes the version, and so the ETag
+    api.patch(f"/pantry/{pantry[0]}", json={"quantity": 9}, headers=auth_headers(user))
+    r = api.get("/pantry/", params={"user_id": user.id, "limit": 2},
+                headers={**auth_headers(user), "If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+
+
+def test_only_the_owner_can_list(api, user, pantry):
+    assert api.get("/pantry/", params={"user_id": user.id + 1}, headers=auth_headers(user)).status_code == 403
@@ -0,0 +1,85 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services import pyhealthify as ph
+
+USERS = [
+    # weight_kg, height_cm, age, gender, activity_level
+    (80, 180, 30, "male", "light"),
+    (60, 165, 40, "female", "moderate"),
+    (95.5, 190.3, 52, "Male", "ACTIVE"),
+    (48.2, 151, 19, None, None),
+    (72, 0, 35, "female", "unknown"),  # no height: BMI 0
+    (70.05, 170.25, 33, "male", "sedentary"),
+]
+
+
+def _random_users(n, seed):
+    rnd = random.Random(seed)
+    return [(round(rnd.uniform(40, 150), 2), round(rnd.uniform(140, 210), 2), rnd.randint(16, 90),
+             rnd.choice(["male", "female"]), rnd.choice(ph.ACTIVITY_LEVELS)) for _ in range(n)]
+
+
+def _columns(users):
+    return [list(col) for col in zip(*users)]
+
+
+def _scalar(user, goal):
+    weight, height, age, gender, activity = user
+    return ph.nutrition_profile_from_user({"weight_kg": weight, "height_cm": height, "age": age, "gender": gender,
+                                           "activity_level": activity}, goal=goal)
+
+
+@pytest.mark.parametrize("users", [USERS, _random_users(300, 1)], ids=["edge", "random"])
+@pytest.mark.parametrize("goal", ph.GOALS)
+def test_nutrition_profiles_match_the_scalar_function(users, goal):
+    batch = ph.nutrition_profiles(*_columns(users), goal=goal)
+    for i, user in enumerate(users):
+        expected = _scalar(user, goal)
+        assert batch["bmi"][i] == expected["bmi"]
+        assert batch["bmr"][i] == expected["bmr"]
+        for key, value in expected["nutrition"].items():
+            assert batch[key][i] == value, (user, key)
+
+
+@pytest.mark.parametrize("users", [USERS, _random_users(100, 2)], ids=["edge", "random"])
+def test_building_blocks_match_the_scalar_functions(users):
+    weight, height, age, gender, activity = _columns(users)
+    assert ph.calc_bmi_batch(weight, height).tolist() == [ph.calc_bmi(w, h) for w, h in zip(weight, height)]
+    bmr = ph.bmr_mifflin_segor_batch(weight, height, age, gender)
+    assert bmr.tolist() == [ph.bmr_mifflin_segor(*u[:4]) for u in users]
+    assert ph.activity_multiplier_batch(activity).tolist() == [ph.activity_multiplier(a) for a in activity]
+    assert ph.calorie_target_batch(bmr, activity, "lose").tolist() == \
+        [ph.calorie_target(b, a, "lose") for b, a in zip(bmr.tolist(), activity)]
+
+
+@pytest.mark.parametrize("calories", [0, 1, 1234.25, 2018.75, 2500.05, 3333.333, 1e16])
+def test_macros_round_like_the_scalar_function(calories):
+    batch = ph.macros_from_calories_batch([calories])
+    assert {k: v[0] for k, v in batch.items()} == ph.macros_from_calories(calories)
+
+
+def test_single_labels_apply_to_every_row():
+    batch = ph.nutrition_profiles([60, 80], [165, 180], age=[30, 40], gender="female", activity_level="light")
+    expected = [_scalar(user, "maintain")["nutrition"]["calories"]
+                for user in [(60, 165, 30, "female", "light"), (80, 180, 40, "female", "light")]]
+    assert batch["calories"].tolist() == expected
+
+
+def test_scenario_grid_matches_the_scalar_function():
+    weight, height, age, gender, _activity = _columns(USERS)
+    grid = ph.scenario_grid(weight, height, age, gender)
+    assert grid["calories"].shape == (len(USERS), len(ph.GOALS), len(ph.ACTIVITY_LEVELS))
+    for i, user in enumerate(USERS):
+        assert grid["bmr"][i] == _scalar(user, "maintain")["bmr"]
+        for g, goal in enumerate(grid["goals"]):
+            for a, activity in enumerate(grid["activity_levels"]):
+                expected = _scalar(user[:4] + (activity,), goal)["nutrition"]
+                assert {k: grid[k][i, g, a] for k in expected} == expected
+
+
+def test_missing_numbers_give_nan():
+    batch = ph.nutrition_profiles([None, 70], [170, 170], age=[30, np.nan])
+    assert np.isnan(batch["calories"]).tolist() == [True, True]
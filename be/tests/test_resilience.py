@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+from app.config import settings
+from app.services.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, RetryBudget, backoff
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("foods", failure_threshold=3, reset_timeout=30, clock=clock)
+
+
+def test_breaker_opens_after_consecutive_failures(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # a success resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    clock.now += 10
+    assert breaker.retry_after() == 20
+
+
+def test_breaker_lets_one_probe_through_after_the_reset_timeout(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert breaker.retry_after() == 0
+    assert not breaker.allow()  # the probe is still out
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == 30
+    assert not breaker.allow()
+
+
+def test_lost_probe_does_not_block_the_circuit_forever(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()  # this probe never reports back
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_retry_budget_starts_with_a_tenth_of_its_tokens(clock):
+    budget = RetryBudget(ratio=0.2, min_per_sec=0, max_tokens=30, clock=clock)
+    assert [budget.withdraw() for _ in range(4)] == [True, True, True, False]
+
+
+def test_retry_budget_earns_a_ratio_of_first_attempts(clock):
+    budget = RetryBudget(ratio=0.25, min_per_sec=0, max_tokens=100, clock=clock)
+    while budget.withdraw():
+        pass
+    for _ in range(8):
+        budget.deposit()
+    assert [budget.withdraw() for _ in range(3)] == [True, True, False]
+
+
+def test_retry_budget_refills_over_time_up_to_its_cap(clock):
+    budget = RetryBudget(ratio=0.2, min_per_sec=0.5, max_tokens=5, clock=clock)
+    while budget.withdraw():
+        pass
+    clock.now += 4  # 2 tokens
+    assert [budget.withdraw() for _ in range(3)] == [True, True, False]
+    clock.now += 1000
+    assert sum(budget.withdraw() for _ in range(10)) == 5
+
+
+def test_backoff_is_jittered_below_an_exponential_cap(monkeypatch):
+    monkeypatch.setattr(settings, "USDA_RETRY_BACKOFF_BASE", 0.5)
+    monkeypatch.setattr(settings, "USDA_RETRY_BACKOFF_MAX", 3.0)
+
+    class Top:
+        """An rng that always draws the upper bound."""
+
+        def uniform(self, low, high):
+            return high
+
+    assert [backoff(attempt, rng=Top()) for attempt in range(5)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+    rng = random.Random(7)
+    delays = [backoff(3, rng=rng) for _ in range(200)]
+    assert all(0 <= d <= 3.0 for d in delays)
+    assert len(set(delays)) == 200  # full jitter: retries of concurrent callers spread out
+    rng = random.Random(7)
+    assert delays == [backoff(3, rng=rng) for _ in range(200)]
@@ -0,0 +1,53 @@
+import pytest
+
+from app.services.pantry_versions import bump_version, get_version
+
+from conftest import auth_headers, usda_food
+
+OATS = usda_food("Oats, rolled", 380, 13, 7, 68, portion_gram=80)
+EGGS = usda_food("Egg, whole", 143, 12.6, 9.5, 0.7, portion_gram=50)
+
+
+@pytest.fixture
+def stocked(api, fdc, user, stock_pantry):
+    fdc.foods.update({1042: OATS, 1043: EGGS})
+    return stock_pantry({1042: (5, OATS)})
+
+
+def _cache_status(api, user, path):
+    r = api.get(path, params={"user_id": user.id}, headers=auth_headers(user))
+    assert r.status_code == 200
+    return r.headers["X-Result-Cache"]
+
+
+@pytest.mark.parametrize("path", ["/pantry/aggregate", "/pantry/weekly-diet"])
+@pytest.mark.parametrize("write", ["add", "update", "stock"])
+def test_pantry_write_invalidates_cached_results(api, user, stocked, path, write):
+    assert _cache_status(api, user, path) == "miss"
+    assert _cache_status(api, user, path) == "hit"
+
+    item = stocked[0]
+    if write == "add":
+        r = api.post("/pantry/", json={"user_id": user.id, "fdc_id": 1043, "description": "eggs", "quantity": 6},
+                     headers=auth_headers(user))
+    elif write == "update":
+        r = api.patch(f"/pantry/{item.id}", json={"quantity": 2}, headers=auth_headers(user))
+    else:
+        r = api.post(f"/pantry/{item.id}/stock", json={"kind": "consume", "quantity": 1}, headers=auth_headers(user))
+    assert r.status_code == 200
+
+    assert _cache_status(api, user, path) == "miss"
+    assert _cache_status(api, user, path) == "hit"
+
+
+def test_bump_version_creates_the_row_once(db, user, session_factory):
+    assert get_version(db, user.id) == 0
+    bump_version(db, user.id)
+    db.commit()
+    # a second writer that also found no row on its first write
+    other = session_factory()
+    bump_version(other, user.id)
+    other.commit()
+    other.close()
+    db.expire_all()
+    assert get_version(db, user.id) == 2
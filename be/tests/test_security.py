@@ -0,0 +1,58 @@
+from app.config import settings
+from app.models.user import User
+from app.utils.security import principal_cache
+
+from conftest import auth_headers
+
+
+def _me(api, user):
+    return api.get("/users/me", headers=auth_headers(user, uid=False))
+
+
+def test_user_update_drops_the_cached_principal(api, db, user):
+    assert _me(api, user).json()["weight_kg"] == 80
+    assert principal_cache().get(user.email, count=False)[0] is not None
+
+    user.weight_kg = 75
+    db.commit()
+    assert principal_cache().get(user.email, count=False) == (None, False)
+    assert _me(api, user).json()["weight_kg"] == 75
+
+
+def test_email_change_drops_the_old_principal(api, db, user):
+    old = User(email=user.email)
+    assert _me(api, user).status_code == 200
+    user.email = "chef@example.com"
+    db.commit()
+    assert principal_cache().get(old.email, count=False) == (None, False)
+    # a token for the old address no longer resolves
+    assert _me(api, old).status_code == 404
+    assert _me(api, user).json()["email"] == "chef@example.com"
+
+
+def test_user_delete_drops_the_cached_principal(api, db, user):
+    assert _me(api, user).status_code == 200
+    db.delete(user)
+    db.commit()
+    assert _me(api, user).status_code == 404
+
+
+def test_rolled_back_update_keeps_serving_the_stored_row(api, db, user):
+    user.weight_kg = 70
+    db.flush()
+    db.rollback()
+    assert _me(api, user).json()["weight_kg"] == 80
+
+
+def test_admin_routes_reject_non_admins(api, user, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", "root@example.com")
+    assert api.get("/pantry/result-cache", headers=auth_headers(user)).status_code == 403
+    assert api.get("/admin/batch-plans/1", headers=auth_headers(user)).status_code == 403
+    assert api.get("/pantry/result-cache").status_code == 401
+
+
+def test_admin_routes_accept_listed_admins(api, user, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", "root@example.com, COOK@example.com")
+    r = api.get("/pantry/result-cache", headers=auth_headers(user))
+    assert r.status_code == 200
+    assert "hits" in r.json()
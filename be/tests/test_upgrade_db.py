@@ -0,0 +1,49 @@
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.db.upgrade import plan_upgrade, upgrade_schema
+
+
+def _old_database():
+    """pantry_items as created before enrichment, the pantry indexes and the newer tables."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE pantry_items (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, fdc_id INTEGER NOT NULL, "
+            "description VARCHAR(512) NOT NULL, category VARCHAR(255), quantity FLOAT, unit_name VARCHAR(64), "
+            "added_at DATETIME DEFAULT CURRENT_TIMESTAMP, extra TEXT)"
+        )
+        conn.exec_driver_sql("CREATE INDEX ix_pantry_items_user_id ON pantry_items (user_id)")
+        conn.exec_driver_sql("INSERT INTO pantry_items (user_id, fdc_id, description) VALUES (1, 1042, 'Oats')")
+    return engine
+
+
+def test_upgrade_adds_missing_tables_columns_and_indexes():
+    engine = _old_database()
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    assert set(Base.metadata.tables) <= set(inspector.get_table_names())
+    assert "enrichment_status" in {c["name"] for c in inspector.get_columns("pantry_items")}
+    indexes = {i["name"] for i in inspector.get_indexes("pantry_items")}
+    assert {"ix_pantry_items_user_fdc", "ix_pantry_items_user_added"} <= indexes
+    assert "ix_pantry_items_user_id" not in indexes
+    with engine.connect() as conn:
+        # existing items were enriched when they were added
+        assert conn.exec_driver_sql("SELECT enrichment_status FROM pantry_items").scalar() == "done"
+    # the dropped index stays out of the models
+    assert "ix_pantry_items_user_id" not in {i.name for i in Base.metadata.tables["pantry_items"].indexes}
+
+
+def test_upgrade_is_idempotent():
+    engine = _old_database()
+    assert plan_upgrade(engine)
+    upgrade_schema(engine)
+    assert plan_upgrade(engine) == []
+
+
+def test_current_schema_needs_no_upgrade():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    assert plan_upgrade(engine) == []
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.cache import MemoryCache
+from app.services.resilience import UpstreamUnavailable
+
+from conftest import usda_food
+
+FOODS = {i: usda_food(f"food {i}", 100 + i, 1, 1, 1) for i in range(1, 46)}
+
+
+@pytest.fixture(autouse=True)
+def _no_retries(monkeypatch):
+    monkeypatch.setattr(settings, "USDA_RETRIES", 0)
+
+
+def _batches(fdc):
+    return [json.loads(r.content)["fdcIds"] for r in fdc.requests if r.method == "POST"]
+
+
+@pytest.fixture(params=["sync", "async"])
+def get_foods_partial(request, fdc):
+    """get_foods_partial of a sync or async client on `fdc`, called synchronously; returns (client, lookup)."""
+    if request.param == "sync":
+        client = fdc.sync_client()
+        return client, client.get_foods_partial
+    client = fdc.async_client()
+    return client, lambda ids: asyncio.run(client.get_foods_partial(ids))
+
+
+def test_ids_go_out_in_chunks_of_20(fdc, get_foods_partial):
+    fdc.foods.update(FOODS)
+    _client, lookup = get_foods_partial
+    found, unavailable = lookup(list(FOODS))
+    assert sorted(found) == sorted(FOODS) and unavailable == []
+    assert sorted(map(len, _batches(fdc))) == [5, 20, 20]
+    assert sorted(i for batch in _batches(fdc) for i in batch) == sorted(FOODS)
+
+
+def test_duplicate_ids_are_fetched_once(fdc, get_foods_partial):
+    fdc.foods.update(FOODS)
+    _client, lookup = get_foods_partial
+    found, _unavailable = lookup([3, 1, 3, 2, 1])
+    assert sorted(found) == [1, 2, 3]
+    assert _batches(fdc) == [[3, 1, 2]]
+
+
+def test_unknown_ids_are_absent(fdc, get_foods_partial):
+    fdc.foods.update(FOODS)
+    _client, lookup = get_foods_partial
+    found, unavailable = lookup([1, 999])
+    assert list(found) == [1] and unavailable == []
+
+
+def test_invalid_ids_are_rejected(fdc, get_foods_partial):
+    _client, lookup = get_foods_partial
+    with pytest.raises(ValueError):
+        lookup([1, 0])
+    assert fdc.requests == []
+
+
+def test_failed_chunk_is_reported_and_the_rest_is_cached(fdc, get_foods_partial):
+    fdc.foods.update(FOODS)
+    fdc.fail_ids = {25}  # in the second chunk
+    client, lookup = get_foods_partial
+    found, unavailable = lookup(list(FOODS))
+    assert sorted(found) == [i for i in FOODS if not 21 <= i <= 40]
+    [(chunk, error)] = unavailable
+    assert chunk == list(range(21, 41))
+    assert isinstance(error, UpstreamUnavailable)
+    assert client._cache.get("food:1", count=False)[0]["description"] == "food 1"
+    assert client._cache.get("food:25", count=False) == (None, False)
+
+    # next lookup: cached foods are served locally, only the failed chunk goes out again
+    fdc.fail_ids = set()
+    fdc.requests.clear()
+    found, unavailable = lookup(list(FOODS))
+    assert len(found) == len(FOODS) and unavailable == []
+    assert _batches(fdc) == [list(range(21, 41))]
+
+
+def test_get_foods_raises_when_a_chunk_fails(fdc):
+    fdc.foods.update(FOODS)
+    fdc.fail_ids = {1}
+    with pytest.raises(UpstreamUnavailable):
+        fdc.sync_client().get_foods([1, 2])
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(fdc.async_client().get_foods([1, 2]))
+
+
+def test_cached_foods_are_not_fetched(fdc, get_foods_partial):
+    fdc.foods.update(FOODS)
+    client, lookup = get_foods_partial
+    client._cache.set("food:1", {"fdcId": 1, "description": "cached"})
+    found, _unavailable = lookup([1, 2])
+    assert found[1]["description"] == "cached"
+    assert _batches(fdc) == [[2]]
+
+
+@pytest.fixture
+def stale_cache():
+    """A cache whose food records are all stale (served for a minute while refreshed)."""
+    return MemoryCache(default_ttl=0, stale_ttl=60)
+
+
+def _wait_for_refresh(client, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while client._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not client._refreshing
+
+
+def test_stale_foods_are_refreshed_in_one_batch(fdc, stale_cache):
+    fdc.foods.update(FOODS)
+    client = fdc.sync_client(cache=stale_cache)
+    for i in FOODS:
+        stale_cache.set(f"food:{i}", {"fdcId": i, "description": "old"}, ttl=-1)
+
+    found, unavailable = client.get_foods_partial(list(FOODS))
+    assert {f["description"] for f in found.values()} == {"old"}
+    assert unavailable == []
+    _wait_for_refresh(client)
+    # 45 stale ids: three /foods chunks instead of 45 /food/{id} calls
+    assert fdc.paths() == [("POST", "/fdc/v1/foods")] * 3
+    assert stale_cache.get("food:7", count=False)[0]["description"] == "food 7"
+
+
+def test_async_stale_foods_are_refreshed_in_one_batch(fdc, stale_cache):
+    fdc.foods.update(FOODS)
+    for i in (1, 2, 3):
+        stale_cache.set(f"food:{i}", {"fdcId": i, "description": "old"}, ttl=-1)
+
+    async def lookup():
+        client = fdc.async_client(cache=stale_cache)
+        found, _unavailable = await client.get_foods_partial([1, 2, 3])
+        # a second lookup while the refresh is in flight doesn't start another
+        await client.get_foods_partial([1, 2, 3])
+        await asyncio.gather(*set(client._refreshing.values()))
+        return found
+
+    found = asyncio.run(lookup())
+    assert found[1]["description"] == "old"
+    assert fdc.paths() == [("POST", "/fdc/v1/foods")]
+    assert stale_cache.get("food:2", count=False)[0]["description"] == "food 2"
@@ -0,0 +1,191 @@
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.services.usda_fields import parse_fields, project
+from app.utils import compression
+from app.utils.compression import CompressionMiddleware
+
+FOOD = {
+    "fdcId": 171705,
+    "description": "Lentils, raw",
+    "dataType": "SR Legacy",
+    "foodCategory": {"description": "Legumes and Legume Products"},
+    "foodNutrients": [
+        {"nutrient": {"number": "208", "name": "Energy", "unitName": "kcal"}, "amount": 352},
+        {"nutrient": {"number": "203", "name": "Protein", "unitName": "g"}, "amount": 24.6},
+        {"nutrient": {"number": "606", "name": "Fatty acids, total saturated", "unitName": "g"}},
+    ],
+    "foodPortions": [{"gramWeight": 192, "amount": 1, "measureUnit": {"name": "cup"}, "modifier": ""}],
+    "inputFoods": [{"id": 1}],
+    "nutrientConversionFactors": [{"type": "protein", "value": 6.25}],
+}
+
+
+@pytest.fixture
+def lentils(fdc):
+    fdc.foods[171705] = FOOD
+    return fdc
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields("a, b.c,b.d") == {"a": {}, "b": {"c": {}, "d": {}}}
+    for bad in ("", " , ", "a..b", ",".join(f"f{i}" for i in range(65))):
+        with pytest.raises(ValueError):
+            parse_fields(bad)
+
+
+def test_project_keeps_requested_keys_through_lists():
+    tree = parse_fields("fdcId,foodNutrients.amount,foodNutrients.nutrient.name,missing")
+    assert project(dict(FOOD, fdcId=1), tree) == {
+        "fdcId": 1,
+        "foodNutrients": [{"amount": 352, "nutrient": {"name": "Energy"}},
+                          {"amount": 24.6, "nutrient": {"name": "Protein"}},
+                          {"nutrient": {"name": "Fatty acids, total saturated"}}],
+    }
+
+
+def test_food_fields(api, lentils):
+    r = api.get("/usda/food/171705", params={"fields": "fdcId,description"})
+    assert r.status_code == 200
+    assert r.json() == {"fdcId": 171705, "description": "Lentils, raw"}
+    assert api.get("/usda/food/171705", params={"fields": "a..b"}).status_code == 400
+
+
+def test_food_abridged(api, lentils):
+    r = api.get("/usda/food/171705", params={"format": "abridged"})
+    assert r.json() == {
+        "fdcId": 171705,
+        "description": "Lentils, raw",
+        "dataType": "SR Legacy",
+        "foodCategory": "Legumes and Legume Products",
+        # nutrients without an amount are dropped
+        "foodNutrients": [{"number": "208", "name": "Energy", "amount": 352, "unitName": "kcal"},
+                          {"number": "203", "name": "Protein", "amount": 24.6, "unitName": "g"}],
+        "foodPortions": [{"gramWeight": 192, "amount": 1, "description": "cup"}],
+    }
+    r = api.get("/usda/food/171705", params={"format": "abridged", "fields": "foodNutrients.number"})
+    assert r.json() == {"foodNutrients": [{"number": "208"}, {"number": "203"}]}
+
+
+def test_search_shaping_keeps_paging(api, lentils):
+    r = api.get("/usda/search", params={"q": "lentils", "format": "abridged", "fields": "fdcId"})
+    assert r.json() == {"totalHits": 1, "currentPage": 1, "totalPages": 1, "foods": [{"fdcId": 171705}]}
+
+
+def test_full_document_is_passed_through(api, lentils):
+    assert api.get("/usda/food/171705").json() == dict(FOOD, fdcId=171705)
+
+
+# -------------------------
+# Compression
+# -------------------------
+BIG = "nutrient " * 400  # 3600 bytes
+SMALL = "x" * 100
+
+
+async def big(request):
+    return PlainTextResponse(BIG)
+
+
+async def small(request):
+    return PlainTextResponse(SMALL)
+
+
+async def streamed(request):
+    async def body():
+        yield b""
+        for _ in range(10):
+            yield BIG[:500].encode()
+
+    return StreamingResponse(body(), media_type="text/plain")
+
+
+async def encoded(request):
+    return PlainTextResponse(BIG, headers={"Content-Encoding": "identity-ish"})
+
+
+@pytest.fixture
+def client():
+    app = Starlette(routes=[Route("/big", big), Route("/small", small), Route("/streamed", streamed),
+                            Route("/encoded", encoded)])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+def _get(client, path, accept):
+    # raw body: don't let the test client decode it
+    with client.stream("GET", path, headers={"Accept-Encoding": accept}) as r:
+        return r, b"".join(r.iter_raw())
+
+
+def test_gzip_above_the_threshold(client):
+    r, body = _get(client, "/big", "gzip, deflate")
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["Vary"]
+    assert int(r.headers["Content-Length"]) == len(body) < len(BIG)
+    assert gzip.decompress(body).decode() == BIG
+
+
+def test_small_bodies_are_not_compressed(client):
+    r, body = _get(client, "/small", "gzip")
+    assert "Content-Encoding" not in r.headers
+    assert body.decode() == SMALL
+
+
+@pytest.mark.parametrize("accept", ["", "identity", "gzip;q=0", "deflate"])
+def test_no_acceptable_encoding(client, accept):
+    r, body = _get(client, "/big", accept)
+    assert "Content-Encoding" not in r.headers
+    assert body.decode() == BIG
+
+
+def test_already_encoded_responses_pass_through(client):
+    r, body = _get(client, "/encoded", "gzip")
+    assert r.headers["Content-Encoding"] == "identity-ish"
+    assert body.decode() == BIG
+
+
+def test_streamed_body_is_compressed_in_chunks(client):
+    r, body = _get(client, "/streamed", "gzip")
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in r.headers
+    assert gzip.decompress(body).decode() == BIG[:500] * 10
+
+
+class FakeBrotli:
+    """Stands in for the optional brotli package: 'compresses' by tagging the bytes."""
+
+    class Compressor:
+        def __init__(self, quality):
+            self.quality = quality
+
+        def process(self, data):
+            return data
+
+        def flush(self):
+            return b""
+
+        def finish(self):
+            return b"<br>"
+
+
+def test_brotli_is_preferred_when_installed(client, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", FakeBrotli)
+    r, body = _get(client, "/big", "gzip, br")
+    assert r.headers["Content-Encoding"] == "br"
+    assert body == BIG.encode() + b"<br>"
+    # not accepted by the client: gzip
+    r, _body = _get(client, "/big", "gzip, br;q=0")
+    assert r.headers["Content-Encoding"] == "gzip"
+
+
+def test_gzip_when_brotli_is_missing(client, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    r, _body = _get(client, "/big", "br, gzip")
+    assert r.headers["Content-Encoding"] == "gzip"